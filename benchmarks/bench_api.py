@@ -0,0 +1,274 @@
+"""
+Load-test the activities API and report latency percentiles and throughput.
+
+Drives the ASGI app either in-process, through httpx's ASGI transport, or over
+a local socket served by uvicorn in a separate process. Each workload starts
+from the same seeded synthetic catalog (10k activities, rosters drawn from
+100k students by default) and runs a fixed number of requests from concurrent
+clients:
+
+- ``read-heavy``: single activities, filtered listing pages, student lookups
+  and the occasional full catalog
+- ``signup-storm``: nothing but signups, until activities fill up
+- ``mixed``: mostly reads, with signups and unregisters of earlier signups
+
+The report is JSON with p50/p99 latency and requests per second for each
+workload, overall and per operation, so runs can be diffed against a
+baseline before deploying.
+
+Run from the repository root:
+
+    python benchmarks/bench_api.py --transport inprocess --output before.json
+    python benchmarks/bench_api.py --transport uvicorn --workload mixed
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote
+
+import httpx
+
+SRC = Path(__file__).parent.parent / "src"
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(SRC))
+
+WORKLOADS = {
+    "read-heavy": {"activity": 80, "page": 15, "student": 4, "catalog": 1},
+    "signup-storm": {"signup": 100},
+    "mixed": {"activity": 55, "page": 10, "student": 5, "signup": 20, "unregister": 10}
+}
+
+WEEKDAYS = ["Mondays", "Tuesdays", "Wednesdays", "Thursdays", "Fridays", "Saturdays"]
+
+# Seconds to wait for the uvicorn server to start answering
+STARTUP_TIMEOUT = 120
+
+
+def _clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def make_catalog(activity_count, student_count, seed):
+    """Return a catalog whose rosters fill about half the seats"""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(activity_count):
+        start = rng.randrange(7 * 60, 20 * 60, 30)
+        capacity = rng.randrange(10, 31)
+        catalog[f"Activity {i:05d}"] = {
+            "description": f"Synthetic activity {i}",
+            "schedule": f"{rng.choice(WEEKDAYS)}, {_clock(start)} - {_clock(start + 60)}",
+            "max_participants": capacity,
+            "participants": [
+                student_email(number)
+                for number in rng.sample(range(student_count), rng.randrange(capacity + 1))
+            ]
+        }
+    return catalog
+
+
+def student_email(number):
+    return f"student{number:06d}@mergington.edu"
+
+
+class Traffic:
+    """Picks the requests of a workload, tracking signups to unregister later"""
+
+    def __init__(self, names, student_count, workload, seed):
+        self.names = names
+        self.student_count = student_count
+        self.operations = list(WORKLOADS[workload])
+        self.weights = list(WORKLOADS[workload].values())
+        self.rng = random.Random(seed)
+        self.signed_up = []
+
+    def next_request(self):
+        """Return (operation, method, path, query parameters)"""
+        rng = self.rng
+        operation = rng.choices(self.operations, self.weights)[0]
+        name = quote(rng.choice(self.names))
+        email = student_email(rng.randrange(self.student_count))
+        if operation == "activity":
+            return operation, "GET", f"/activities/{name}", None
+        if operation == "page":
+            return operation, "GET", "/activities", {
+                "weekday": rng.choice(WEEKDAYS), "limit": 50, "fields": "seats_left"
+            }
+        if operation == "student":
+            return operation, "GET", f"/students/{email}/activities", None
+        if operation == "catalog":
+            return operation, "GET", "/activities", None
+        if operation == "unregister" and self.signed_up:
+            name, email = self.signed_up.pop(rng.randrange(len(self.signed_up)))
+            return operation, "DELETE", f"/activities/{name}/unregister", {"email": email}
+        return "signup", "POST", f"/activities/{name}/signup", {"email": email}
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, seconds=None):
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3)
+    }
+    if seconds is not None:
+        summary["seconds"] = round(seconds, 3)
+        summary["requests_per_second"] = round(len(ordered) / seconds, 1)
+    return summary
+
+
+async def run_workload(client, traffic, requests, concurrency):
+    """Send the requests from concurrent clients and summarize their latencies"""
+    latencies = {}
+    statuses = Counter()
+
+    async def client_loop(count):
+        for _ in range(count):
+            operation, method, path, params = traffic.next_request()
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params)
+            latencies.setdefault(operation, []).append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if operation == "signup" and response.status_code == 200:
+                traffic.signed_up.append((path.split("/")[2], params["email"]))
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(count) for count in shares))
+    elapsed = time.perf_counter() - start
+
+    report = summarize([latency for values in latencies.values() for latency in values], elapsed)
+    report["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    report["operations"] = {
+        operation: summarize(values) for operation, values in sorted(latencies.items())
+    }
+    return report
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def wait_until_serving(base_url, server):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving")
+            try:
+                await client.get("/activities", params={"limit": 1})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+async def bench_inprocess(args, catalog, workload):
+    import app as api
+    api.load_activities(catalog)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        traffic = Traffic(list(catalog), args.students, workload, args.seed)
+        return await run_workload(client, traffic, args.requests, args.concurrency)
+
+
+async def bench_uvicorn(args, catalog, workload):
+    # A fresh server per workload, loaded by serve() from the same seed
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(port),
+         "--activities", str(args.activities), "--students", str(args.students),
+         "--seed", str(args.seed)],
+        env=os.environ.copy()
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_until_serving(base_url, server)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            traffic = Traffic(list(catalog), args.students, workload, args.seed)
+            return await run_workload(client, traffic, args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def serve(args):
+    """Load the synthetic catalog and serve the app with uvicorn"""
+    import uvicorn
+
+    import app as api
+    api.load_activities(make_catalog(args.activities, args.students, args.seed))
+    uvicorn.run(api.app, host="127.0.0.1", port=args.serve, log_level="warning",
+                access_log=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transport", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--workload", choices=(*WORKLOADS, "all"), default="all")
+    parser.add_argument("--requests", type=int, default=10_000, help="per workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--activities", type=int, default=10_000)
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="also write the JSON report here")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.backend == "sqlite":
+            # Read when the app is imported, here or in the uvicorn process
+            os.environ["ACTIVITIES_DB"] = str(Path(directory) / "bench.db")
+        catalog = make_catalog(args.activities, args.students, args.seed)
+        bench = bench_inprocess if args.transport == "inprocess" else bench_uvicorn
+        workloads = list(WORKLOADS) if args.workload == "all" else [args.workload]
+        report = {
+            "transport": args.transport,
+            "backend": args.backend,
+            "activities": args.activities,
+            "students": args.students,
+            "enrollments": sum(len(details["participants"]) for details in catalog.values()),
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "workloads": {}
+        }
+        for workload in workloads:
+            report["workloads"][workload] = asyncio.run(bench(args, catalog, workload))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output is not None:
+        args.output.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
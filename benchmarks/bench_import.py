@@ -0,0 +1,108 @@
+"""
+Measure enrollment import throughput and the importer's memory use.
+
+Writes CSV and NDJSON files of unique (activity, email) rows, then streams
+each into a fresh store on every backend. Import memory is measured
+separately on a store that rejects every row, so it excludes the rosters
+themselves, at a tenth of the rows and at the full size.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py --rows 1000000
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from importer import RosterImport
+from repository import MemoryRepository, SQLiteRepository
+from store import ActivityStore
+
+# Bytes read from the file per feed, like one chunk of an HTTP upload
+BLOCK_SIZE = 64 * 1024
+
+
+def make_catalog(activity_count, capacity):
+    # Schedules that don't parse keep conflict checks out of the measurement
+    return {
+        f"Activity {i}": {
+            "description": f"Benchmark activity {i}",
+            "schedule": "To be announced",
+            "max_participants": capacity,
+            "participants": []
+        }
+        for i in range(activity_count)
+    }
+
+
+def write_files(directory, rows, activity_count):
+    csv_path = directory / "enrollments.csv"
+    ndjson_path = directory / "enrollments.ndjson"
+    with open(csv_path, "w") as csv_file, open(ndjson_path, "w") as ndjson_file:
+        csv_file.write("activity,email\n")
+        for i in range(rows):
+            activity, email = f"Activity {i % activity_count}", f"student{i}@mergington.edu"
+            csv_file.write(f"{activity},{email}\n")
+            ndjson_file.write(json.dumps({"activity": activity, "email": email}) + "\n")
+    return {"csv": csv_path, "ndjson": ndjson_path}
+
+
+def run_import(store, path, file_format, max_rows=None):
+    """Stream a file into the store and return the report and elapsed seconds"""
+    roster_import = RosterImport(store, file_format)
+    start = time.perf_counter()
+    with open(path, "rb") as upload:
+        while block := upload.read(BLOCK_SIZE):
+            roster_import.feed(block)
+            if max_rows is not None and roster_import.rows >= max_rows:
+                break
+    report = roster_import.finish()
+    return report, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--activities", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        files = write_files(directory, args.rows, args.activities)
+        catalog = make_catalog(args.activities, args.rows)
+
+        print(f"{'backend':<12}{'format':<8}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        backends = [
+            ("memory", MemoryRepository),
+            ("sqlite-wal", lambda: SQLiteRepository(directory / f"bench-{time.time_ns()}.db"))
+        ]
+        for name, make_repository in backends:
+            for file_format, path in files.items():
+                store = ActivityStore(catalog, repository=make_repository())
+                report, seconds = run_import(store, path, file_format)
+                assert report["imported"] == args.rows, report["errors"][:5]
+                print(f"{name:<12}{file_format:<8}{report['rows']:>10,}"
+                      f"{seconds:>10.2f}{report['rows'] / seconds:>12,.0f}")
+
+        # Every row names an activity this store lacks, so nothing accumulates
+        # except what the importer itself holds on to
+        print(f"\n{'format':<8}{'rows':>10}{'peak import memory':>22}")
+        for file_format, path in files.items():
+            for rows in (args.rows // 10, args.rows):
+                tracemalloc.start()
+                report, _ = run_import(ActivityStore({}), path, file_format, max_rows=rows)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{file_format:<8}{report['rows']:>10,}{peak / 1024:>19,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measure journal write throughput per fsync policy and recovery time.
+
+Run from the repository root:
+
+    python benchmarks/bench_journal.py --operations 20000 --threads 8
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from journal import FSYNC_POLICIES, JournaledRepository
+from store import ActivityStore
+
+
+def make_catalog(activity_count, capacity):
+    return {
+        f"Activity {i}": {
+            "description": f"Benchmark activity {i}",
+            "schedule": "Mondays, 3:00 PM - 4:00 PM",
+            "max_participants": capacity,
+            "participants": []
+        }
+        for i in range(activity_count)
+    }
+
+
+def bench_writes(directory, fsync, operations, threads, activity_count, snapshot_every):
+    repository = JournaledRepository(directory, fsync=fsync, snapshot_every=snapshot_every)
+    store = ActivityStore(make_catalog(activity_count, operations), repository=repository)
+    per_thread = operations // threads
+
+    def signups(thread):
+        for i in range(per_thread):
+            store.signup(f"Activity {i % activity_count}", f"student{thread}-{i}@mergington.edu")
+
+    workers = [threading.Thread(target=signups, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    repository.close()
+    return per_thread * threads / elapsed
+
+
+def bench_recovery(directory):
+    started = time.perf_counter()
+    repository = JournaledRepository(directory)
+    elapsed = time.perf_counter() - started
+    enrollments = sum(len(a["participants"]) for a in repository.snapshot().values())
+    repository.close()
+    return elapsed, enrollments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--activities", type=int, default=50)
+    parser.add_argument("--snapshot-every", type=int, default=1_000_000,
+                        help="records between snapshots during the write benchmark")
+    args = parser.parse_args()
+
+    print(f"{'fsync':<10}{'signup/s':>14}")
+    for fsync in FSYNC_POLICIES:
+        with tempfile.TemporaryDirectory() as directory:
+            rate = bench_writes(directory, fsync, args.operations, args.threads,
+                                args.activities, args.snapshot_every)
+            print(f"{fsync:<10}{rate:>14,.0f}")
+
+    print()
+    print(f"{'recovery from':<18}{'enrollments':>12}{'seconds':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        bench_writes(directory, "off", args.operations, args.threads,
+                     args.activities, args.snapshot_every)
+        elapsed, enrollments = bench_recovery(directory)
+        print(f"{'journal replay':<18}{enrollments:>12,}{elapsed:>10.3f}")
+
+        repository = JournaledRepository(directory)
+        repository.compact()
+        repository.close()
+        elapsed, enrollments = bench_recovery(directory)
+        print(f"{'snapshot':<18}{enrollments:>12,}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measure closing a registration window: the lottery draw and its signups.
+
+Students rank activities drawn from a skewed popularity distribution, so the
+most popular activities are heavily oversubscribed. Times the allocation alone
+and a whole close_registration() on each backend.
+
+Run from the repository root:
+
+    python benchmarks/bench_lottery.py --students 50000 --activities 200
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from lottery import allocate
+from repository import MemoryRepository, SQLiteRepository
+from store import ActivityStore
+
+WEEKDAYS = ["Mondays", "Tuesdays", "Wednesdays", "Thursdays", "Fridays"]
+
+
+def make_catalog(activity_count, capacity):
+    # Neighbouring activities share a day and overlap, so conflicts are checked
+    return {
+        f"Activity {i}": {
+            "description": f"Benchmark activity {i}",
+            "schedule": f"{WEEKDAYS[i % 5]}, {3 + i % 3}:00 PM - {4 + i % 3}:30 PM",
+            "max_participants": capacity,
+            "participants": []
+        }
+        for i in range(activity_count)
+    }
+
+
+def make_preferences(names, student_count, ranked, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    preferences = {}
+    for i in range(student_count):
+        choices = dict.fromkeys(rng.choices(names, weights, k=ranked * 2))
+        preferences[f"student{i}@mergington.edu"] = list(choices)[:ranked]
+    return preferences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--activities", type=int, default=200)
+    parser.add_argument("--ranked", type=int, default=10, help="activities each student ranks")
+    parser.add_argument("--picks", type=int, default=1)
+    args = parser.parse_args()
+
+    # Enough seats for about three students in five
+    capacity = max(1, args.students * 3 // 5 // args.activities)
+    catalog = make_catalog(args.activities, capacity)
+    preferences = make_preferences(list(catalog), args.students, args.ranked, seed=1)
+
+    store = ActivityStore(catalog)
+    seats = {name: capacity for name in catalog}
+    start = time.perf_counter()
+    won = allocate(preferences, seats, picks=args.picks, schedules=store.schedules, seed=2)
+    print(f"allocate: {time.perf_counter() - start:.2f}s for {len(preferences):,} students,"
+          f" {sum(map(len, won.values())):,} seats won")
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [
+            ("memory", MemoryRepository),
+            ("sqlite-wal", lambda: SQLiteRepository(Path(directory) / "lottery.db"))
+        ]
+        print(f"\n{'backend':<12}{'submit s':>10}{'close s':>10}{'signups':>10}{'unplaced':>10}")
+        for name, make_repository in backends:
+            store = ActivityStore(catalog, repository=make_repository())
+            store.open_registration(picks=args.picks, seed=2)
+            start = time.perf_counter()
+            for email, ranked in preferences.items():
+                store.submit_preferences(email, ranked)
+            submitted = time.perf_counter() - start
+            start = time.perf_counter()
+            report = store.close_registration()
+            closed = time.perf_counter() - start
+            print(f"{name:<12}{submitted:>10.2f}{closed:>10.2f}"
+                  f"{report['signups']:>10,}{report['unplaced']:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compare the memory held by the in-memory store's activity layouts.
+
+Loads a generated catalog into the former layout, a dict of four fields and
+a waitlist per activity, and into the slotted, interned Activity records of
+MemoryRepository, whose waitlists are only created when first used, along
+with the student index both keep. Every email and
+name is a separate string object on the way in, as it is when parsed from a
+catalog file or taken from a request, so the interning is exercised. Reports
+the memory each layout retains, measured with tracemalloc, both for loading
+the catalog and for making the same enrollments one signup at a time.
+
+Run from the repository root:
+
+    python benchmarks/bench_memory.py --enrollments 100000
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from dataset import generate_catalog
+from repository import MemoryRepository
+from roster import Roster
+from waitlist import Waitlist
+
+
+class DictLayout:
+    """The former MemoryRepository layout, with nothing interned
+
+    Each activity is a dict and has its own waitlist from the start.
+    """
+
+    def __init__(self):
+        self.activities = {}
+        self.waitlists = {}
+        self.enrollments = {}
+
+    def load(self, catalog):
+        for name, details in catalog.items():
+            self.waitlists[name] = Waitlist()
+            self.activities[name] = {**details, "participants": Roster(details["participants"])}
+        for name, activity in self.activities.items():
+            for email in activity["participants"]:
+                self.enrollments.setdefault(email, Roster()).add(name)
+
+    def add_participant(self, activity_name, email):
+        activity = self.activities[activity_name]
+        if len(activity["participants"]) < activity["max_participants"]:
+            activity["participants"].add(email)
+            self.enrollments.setdefault(email, Roster()).add(activity_name)
+
+
+class SlottedLayout:
+    """MemoryRepository as it is"""
+
+    def __init__(self):
+        self.repository = MemoryRepository()
+
+    def load(self, catalog):
+        self.repository.load(catalog)
+
+    def add_participant(self, activity_name, email):
+        self.repository.add_participant(activity_name, email)
+
+
+LAYOUTS = {"dict": DictLayout, "slotted": SlottedLayout}
+
+
+def fresh(text):
+    # A new string object with the same value, as parsing a request makes
+    return text.encode("utf-8").decode("utf-8")
+
+
+def measure(build):
+    """Return the bytes still allocated once build() is done and its inputs freed"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--enrollments", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.enrollments, seed=args.seed)
+    encoded = json.dumps(catalog)
+    enrolled = [
+        (name, email) for name, details in catalog.items() for email in details["participants"]
+    ]
+    empty = {name: {**details, "participants": []} for name, details in catalog.items()}
+    students = len({email for _, email in enrolled})
+    print(f"{len(catalog):,} activities, {len(enrolled):,} enrollments, {students:,} students\n")
+
+    def loaded(layout):
+        def build():
+            store = LAYOUTS[layout]()
+            store.load(json.loads(encoded))
+            return store
+        return build
+
+    def signed_up(layout):
+        def build():
+            store = LAYOUTS[layout]()
+            store.load(json.loads(json.dumps(empty)))
+            for name, email in enrolled:
+                store.add_participant(fresh(name), fresh(email))
+            return store
+        return build
+
+    print(f"{'scenario':<10}{'layout':<10}{'MB':>8}{'bytes/enrollment':>18}")
+    for scenario, make_build in (("load", loaded), ("signups", signed_up)):
+        results = {}
+        for layout in LAYOUTS:
+            results[layout] = measure(make_build(layout))
+            print(f"{scenario:<10}{layout:<10}{results[layout] / 2 ** 20:>8.1f}"
+                  f"{results[layout] / len(enrolled):>18.0f}")
+        print(f"{'':<10}{'saved':<10}{1 - results['slotted'] / results['dict']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measure the per-request overhead of the metrics middleware.
+
+Drives ASGI apps directly, without a server or client, so the difference
+between the runs with and without the middleware is the middleware itself:
+first a bare ASGI app that does nothing, then a FastAPI app with one route
+like the real ones. Also times RequestMetrics.observe() alone and a scrape.
+
+Run from the repository root:
+
+    python benchmarks/bench_metrics.py --requests 200000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fastapi import FastAPI
+
+from metrics import MetricsMiddleware, RequestMetrics
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def fastapi_app(with_metrics):
+    app = FastAPI()
+
+    # Async, so threadpool scheduling doesn't drown out the difference
+    @app.get("/activities/{activity_name}")
+    async def get_activity(activity_name: str):
+        return {"name": activity_name}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware, metrics=RequestMetrics())
+    return app
+
+
+async def compare(plain, measured, requests, rounds=5):
+    """Return the best seconds per request of each app, alternating between them"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope():
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/activities/Chess Club",
+            "raw_path": b"/activities/Chess%20Club", "root_path": "", "query_string": b"",
+            "headers": [], "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000)
+        }
+
+    best = {plain: float("inf"), measured: float("inf")}
+    for app in best:
+        for _ in range(min(requests, 1000)):
+            await app(scope(), receive, send)
+    # Interleaved rounds, so drifting machine load affects both apps alike
+    for _ in range(rounds):
+        for app in best:
+            start = time.perf_counter()
+            for _ in range(requests):
+                await app(scope(), receive, send)
+            best[app] = min(best[app], (time.perf_counter() - start) / requests)
+    return best[plain], best[measured]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    metrics = RequestMetrics()
+    start = time.perf_counter()
+    for i in range(args.requests):
+        metrics.observe("GET", "/activities/{activity_name}", 200, i * 1e-6)
+    observe = (time.perf_counter() - start) / args.requests
+    print(f"observe(): {observe * 1e6:.2f} us")
+
+    for route in range(50):
+        metrics.observe("POST", f"/route/{route}", 200, 0.001)
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"scrape of {text.count(chr(10)):,} lines: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    print(f"\n{'app':<10}{'without':>12}{'with':>12}{'overhead':>12}")
+    runs = [
+        ("asgi", bare_app, MetricsMiddleware(bare_app, RequestMetrics()), args.requests),
+        ("fastapi", fastapi_app(False), fastapi_app(True), args.requests // 20)
+    ]
+    for name, plain, measured, requests in runs:
+        without, with_metrics = asyncio.run(compare(plain, measured, requests))
+        print(f"{name:<10}{without * 1e6:>10.2f}us{with_metrics * 1e6:>10.2f}us"
+              f"{(with_metrics - without) * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    main()
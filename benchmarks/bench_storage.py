@@ -0,0 +1,95 @@
+"""
+Compare signup, unregister and read throughput of the storage backends.
+
+Run from the repository root:
+
+    python benchmarks/bench_storage.py --operations 20000 --threads 8
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Make the app modules importable, as tests/conftest.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from repository import MemoryRepository, SQLiteRepository
+from store import ActivityStore
+
+
+def make_catalog(activity_count, capacity):
+    return {
+        f"Activity {i}": {
+            "description": f"Benchmark activity {i}",
+            "schedule": "Mondays, 3:00 PM - 4:00 PM",
+            "max_participants": capacity,
+            "participants": []
+        }
+        for i in range(activity_count)
+    }
+
+
+def run_threads(threads, work):
+    """Run work(thread_index) on each thread and return the elapsed seconds"""
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def bench_backend(name, repository, operations, threads, activity_count):
+    store = ActivityStore(make_catalog(activity_count, operations), repository=repository)
+    per_thread = operations // threads
+
+    def email(thread, i):
+        return f"student{thread}-{i}@mergington.edu"
+
+    def signups(thread):
+        for i in range(per_thread):
+            store.signup(f"Activity {i % activity_count}", email(thread, i))
+
+    def unregisters(thread):
+        for i in range(per_thread):
+            store.unregister(f"Activity {i % activity_count}", email(thread, i))
+
+    def reads(thread):
+        for i in range(per_thread // 10 or 1):
+            store.snapshot()
+
+    results = {"backend": name}
+    results["signup_ops_per_sec"] = per_thread * threads / run_threads(threads, signups)
+    results["snapshot_ops_per_sec"] = (per_thread // 10 or 1) * threads / run_threads(threads, reads)
+    results["unregister_ops_per_sec"] = per_thread * threads / run_threads(threads, unregisters)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operations", type=int, default=20000,
+                        help="signups (and unregisters) per backend")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--activities", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [
+            ("memory", MemoryRepository()),
+            ("sqlite-wal", SQLiteRepository(Path(directory) / "bench.db"))
+        ]
+        print(f"{'backend':<12}{'signup/s':>14}{'unregister/s':>14}{'snapshot/s':>14}")
+        for name, repository in backends:
+            results = bench_backend(name, repository, args.operations, args.threads, args.activities)
+            print(f"{results['backend']:<12}"
+                  f"{results['signup_ops_per_sec']:>14,.0f}"
+                  f"{results['unregister_ops_per_sec']:>14,.0f}"
+                  f"{results['snapshot_ops_per_sec']:>14,.1f}")
+
+
+if __name__ == "__main__":
+    main()
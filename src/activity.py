@@ -0,0 +1,51 @@
+"""
+Activity record of the in-memory backends.
+
+An activity was a dict with four string keys plus its roster. Across tens of
+thousands of activities the per-dict overhead dominated, so it is a slotted
+record instead, converted to a dict only for JSON at the edge.
+
+The strings it holds are interned. Schedules repeat across many activities,
+and each email appears in every roster, waitlist and student index entry of
+that student, so each distinct string is kept once however often, and through
+however many requests, it arrives.
+"""
+
+from sys import intern
+
+from roster import Roster
+
+
+class Activity:
+    """One activity: its details and its roster of participants"""
+
+    __slots__ = ("description", "schedule", "max_participants", "participants")
+
+    def __init__(self, description, schedule, max_participants, participants=()):
+        self.description = intern(description)
+        self.schedule = intern(schedule)
+        self.max_participants = max_participants
+        self.participants = Roster(intern(email) for email in participants)
+
+    @classmethod
+    def from_dict(cls, details):
+        """Return the record of an activity in the API's dict layout"""
+        return cls(
+            details["description"], details["schedule"], details["max_participants"],
+            details["participants"]
+        )
+
+    def details(self):
+        """Return the activity without its roster, as a dict"""
+        return {
+            "description": self.description,
+            "schedule": self.schedule,
+            "max_participants": self.max_participants
+        }
+
+    def to_dict(self):
+        """Return a JSON-ready copy of the activity, with a copy of its roster"""
+        return {**self.details(), "participants": self.participants.to_list()}
+
+    def seats_left(self):
+        return self.max_participants - len(self.participants)
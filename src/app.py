@@ -5,11 +5,27 @@ A super simple FastAPI application that allows students to view and sign up
 for extracurricular activities at Mergington High School.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 import os
 from pathlib import Path
+from typing import Literal
+
+from cache import VersionedBodies, VersionedBody, encode_json, etag_matches, make_etag
+from catalog import read_catalog
+from events import Broadcaster, RosterHub
+from exporter import EXPORT_MEDIA_TYPES, export_lines
+from importer import RosterImport, import_format
+from journal import JournaledRepository
+from lottery import MAX_PICKS
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, RequestMetrics, render_gauge
+)
+from repository import MemoryRepository, SQLiteRepository
+from store import MAX_PAGE_SIZE, PAGE_SIZE, ActivityStore, StoreError
 
 app = FastAPI(title="Mergington High School API",
               description="API for viewing and signing up for extracurricular activities")
@@ -19,63 +35,101 @@ current_dir = Path(__file__).parent
 app.mount("/static", StaticFiles(directory=os.path.join(Path(__file__).parent,
           "static")), name="static")
 
-# In-memory activity database
-activities = {
-    "Basketball Team": {
-        "description": "Join the basketball team and compete in local tournaments",
-        "schedule": "Mondays and Wednesdays, 4:00 PM - 6:00 PM",
-        "max_participants": 15,
-        "participants": []
-    },
-    "Soccer Club": {
-        "description": "Practice soccer skills and participate in matches",
-        "schedule": "Tuesdays and Thursdays, 5:00 PM - 7:00 PM",
-        "max_participants": 20,
-        "participants": []
-    },
-    "Art Club": {
-        "description": "Explore various art techniques and create projects",
-        "schedule": "Fridays, 3:00 PM - 5:00 PM",
-        "max_participants": 10,
-        "participants": []
-    },
-    "Drama Club": {
-        "description": "Participate in theater productions and improve acting skills",
-        "schedule": "Thursdays, 4:00 PM - 6:00 PM",
-        "max_participants": 25,
-        "participants": []
-    },
-    "Debate Team": {
-        "description": "Engage in debates and improve public speaking skills",
-        "schedule": "Wednesdays, 3:30 PM - 5:00 PM",
-        "max_participants": 12,
-        "participants": []
-    },
-    "Math Club": {
-        "description": "Solve challenging math problems and participate in competitions",
-        "schedule": "Tuesdays, 3:00 PM - 4:30 PM",
-        "max_participants": 15,
-        "participants": []
-    },
-    "Chess Club": {
-        "description": "Learn strategies and compete in chess tournaments",
-        "schedule": "Fridays, 3:30 PM - 5:00 PM",
-        "max_participants": 12,
-        "participants": ["michael@mergington.edu", "daniel@mergington.edu"]
-    },
-    "Programming Class": {
-        "description": "Learn programming fundamentals and build software projects",
-        "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
-        "max_participants": 20,
-        "participants": ["emma@mergington.edu", "sophia@mergington.edu"]
-    },
-    "Gym Class": {
-        "description": "Physical education and sports activities",
-        "schedule": "Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM",
-        "max_participants": 30,
-        "participants": ["john@mergington.edu", "olivia@mergington.edu"]
-    }
-}
+# Request counts and latency histograms, served at /metrics
+request_metrics = RequestMetrics()
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
+# Largest number of items accepted by one bulk request
+BULK_LIMIT = 5000
+
+
+class Enrollment(BaseModel):
+    activity: str
+    email: str
+
+
+class BulkSignupRequest(BaseModel):
+    signups: list[Enrollment] = Field(max_length=BULK_LIMIT)
+
+
+class BulkUnregisterRequest(BaseModel):
+    emails: list[str] = Field(max_length=BULK_LIMIT)
+
+
+class PreferencesRequest(BaseModel):
+    activities: list[str]
+
+
+class ActivityResponse(BaseModel):
+    """An activity as the API returns it
+
+    Only documents the response: the store keeps its own records, and bodies
+    are encoded from them directly rather than validated through this model.
+    """
+
+    description: str
+    schedule: str
+    max_participants: int
+    participants: list[str]
+
+
+# Catalog a new store is seeded with, unless ACTIVITIES_CATALOG names another file
+DEFAULT_CATALOG = current_dir / "activities.json"
+
+
+def catalog_path():
+    """Return the catalog file selected by the environment"""
+    return Path(os.environ.get("ACTIVITIES_CATALOG") or DEFAULT_CATALOG)
+
+
+def create_repository():
+    """Return the storage backend selected by the environment
+
+    ACTIVITIES_DB selects a SQLite database file, ACTIVITIES_JOURNAL a
+    journal directory for the in-memory store (with ACTIVITIES_FSYNC as its
+    fsync policy). Without either, data lives only in memory.
+    """
+    database = os.environ.get("ACTIVITIES_DB")
+    if database:
+        return SQLiteRepository(database)
+    journal = os.environ.get("ACTIVITIES_JOURNAL")
+    if journal:
+        return JournaledRepository(journal, fsync=os.environ.get("ACTIVITIES_FSYNC", "batch"))
+    return MemoryRepository()
+
+
+# Activity database, with per-activity locks for seat reservation
+store = ActivityStore(repository=create_repository())
+
+# A fresh database starts out with the catalog file, which isn't even read
+# when the database already has activities
+store.seed(lambda: read_catalog(catalog_path()))
+
+# Other workers sharing the database may reload the catalog; registered before
+# the listeners below, so clients told to resync find the new catalog
+store.follow_reloads()
+
+
+def load_activities(catalog):
+    """Replace the stored activities with a copy of the given catalog"""
+    store.load(catalog)
+    # Forget bodies of activities the new catalog may no longer have
+    activity_bodies.clear()
+
+
+# Encoded GET /activities body, rebuilt only when the store version changes
+activities_body = VersionedBody(store.snapshot)
+
+# Encoded GET /activities/{activity_name} bodies, rebuilt only when that activity changes
+activity_bodies = VersionedBodies(store.get)
+
+# Pushes every roster change to the clients listening on the SSE stream
+broadcaster = Broadcaster()
+store.add_listener(broadcaster.publish)
+
+# Sends per-activity deltas to WebSocket clients subscribed to those activities
+roster_hub = RosterHub(store)
+store.add_listener(roster_hub.publish)
 
 
 @app.get("/")
@@ -83,43 +137,337 @@ def root():
     return RedirectResponse(url="/static/index.html")
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Get request metrics and per-activity roster gauges in Prometheus text format"""
+    occupancy = store.occupancy()
+    body = (
+        request_metrics.render()
+        + render_gauge("activity_participants", "Students signed up for an activity",
+                       "activity", {name: counts[0] for name, counts in occupancy.items()})
+        + render_gauge("activity_seats_left", "Seats still free in an activity",
+                       "activity", {name: counts[1] for name, counts in occupancy.items()})
+    )
+    return Response(content=body, media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/activities")
-def get_activities():
-    return activities
+def get_activities(if_none_match: str | None = Header(default=None),
+                   limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+                   cursor: str | None = None,
+                   open_seats: bool | None = None,
+                   weekday: str | None = None,
+                   prefix: str | None = None,
+                   fields: str | None = None):
+    """Get every activity, or one page of them when paginating, filtering or projecting
 
+    A page is ``{"activities": {...}, "next_cursor": ...}``; pass next_cursor
+    back as ``cursor`` for the following page. ``fields`` is a comma-separated
+    list of description, schedule, max_participants, participants,
+    participant_count and seats_left.
+    """
+    version = store.version
+    headers = {
+        "ETag": make_etag(store.epoch, version),
+        "Cache-Control": "no-cache",
+        "X-Activities-Version": str(version)
+    }
 
-@app.post("/activities/{activity_name}/signup")
-# Validate student is not already signed up
+    # Answer a revalidation for an unchanged state without a body
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if all(value is None for value in (limit, cursor, open_seats, weekday, prefix, fields)):
+        return Response(
+            content=activities_body.get(version),
+            media_type="application/json",
+            headers=headers
+        )
+
+    try:
+        activities, next_cursor = store.list_activities(
+            limit=limit or PAGE_SIZE,
+            cursor=cursor,
+            open_seats=open_seats,
+            weekday=weekday,
+            prefix=prefix,
+            fields=None if fields is None else [
+                field.strip() for field in fields.split(",") if field.strip()
+            ]
+        )
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return Response(
+        content=encode_json({"activities": activities, "next_cursor": next_cursor}),
+        media_type="application/json",
+        headers=headers
+    )
+
+
+@app.get("/activities/export")
+def export_activities(format: Literal["ndjson", "csv"] = "ndjson"):
+    """Stream every activity as NDJSON, or every enrollment as CSV rows"""
+    return StreamingResponse(
+        export_lines(store, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="activities.{format}"',
+            # The state when the export started; later changes may be included too
+            "X-Activities-Version": str(store.version)
+        }
+    )
+
+
+@app.get("/activities/changes")
+def get_activity_changes(since: int):
+    """Get the signups and unregisters after a version, or a full snapshot"""
+    version, changes = store.changes_since(since)
 
+    # The change log no longer reaches back that far, resync from a snapshot
+    if changes is None:
+        snapshot = activities_body.get(version)
+        content = b'{"version":%d,"snapshot":%s}' % (version, snapshot)
+    else:
+        content = encode_json({
+            "version": version,
+            "changes": [change._asdict() for change in changes]
+        })
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/activities/stream")
+async def stream_activity_changes(since: int | None = None,
+                                  last_event_id: int | None = Header(default=None)):
+    """Stream signups and unregisters to the client as Server-Sent Events"""
+    # A reconnecting EventSource resumes from the last event it received
+    if last_event_id is not None:
+        since = last_event_id
+
+    return StreamingResponse(
+        broadcaster.stream(store, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/activities/{activity_name}", responses={200: {"model": ActivityResponse}})
+def get_activity(activity_name: str, if_none_match: str | None = Header(default=None)):
+    """Get one activity, cached until that activity changes"""
+    try:
+        version = store.activity_version(activity_name)
+        headers = {
+            "ETag": make_etag(store.epoch, version),
+            "Cache-Control": "no-cache",
+            "X-Activity-Version": str(version)
+        }
+        if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        content = activity_bodies.get(activity_name, version)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@app.websocket("/activities/live")
+async def live_roster(websocket: WebSocket):
+    """Send participant deltas and seat counts for the activities a client subscribes to"""
+    await websocket.accept()
+    await roster_hub.serve(websocket)
+
+
+@app.post("/activities/{activity_name}/signup")
 def signup_for_activity(activity_name: str, email: str):
     """Sign up a student for an activity"""
-    # Validate activity exists
-    if activity_name not in activities:
-        raise HTTPException(status_code=404, detail="Activity not found")
+    try:
+        store.signup(activity_name, email)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return {"message": f"Signed up {email} for {activity_name}"}
 
-    # Check if student is already signed up
-    if email in activities[activity_name]["participants"]:
-        raise HTTPException(status_code=400, detail="Student already signed up for this activity")
 
-    # Get the specific activity
-    activity = activities[activity_name]
+@app.post("/activities/signup")
+def bulk_signup(request: BulkSignupRequest):
+    """Sign up many students for activities, reporting a result per item"""
+    errors = store.signup_many([(item.activity, item.email) for item in request.signups])
+    results = []
+    for item, error in zip(request.signups, errors):
+        result = {"activity": item.activity, "email": item.email}
+        if error is None:
+            result.update(status_code=200, message=f"Signed up {item.email} for {item.activity}")
+        else:
+            result.update(status_code=error.status_code, detail=error.detail)
+        results.append(result)
+    return {
+        "succeeded": errors.count(None),
+        "failed": len(errors) - errors.count(None),
+        "results": results
+    }
+
+
+@app.post("/activities/import")
+async def import_enrollments(request: Request, format: str | None = None):
+    """Sign up the (activity, email) rows of a streamed CSV or NDJSON upload
+
+    The body is parsed as it arrives and imported in chunks, and every rejected
+    row is reported with its line number.
+    """
+    try:
+        roster_import = RosterImport(
+            store, import_format(format, request.headers.get("content-type"))
+        )
+        async for data in request.stream():
+            # Signups take locks and may wait for storage, so keep them off the loop
+            await run_in_threadpool(roster_import.feed, data)
+        return await run_in_threadpool(roster_import.finish)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
 
-    # Add student
-    activity["participants"].append(email)
-    return {"message": f"Signed up {email} for {activity_name}"}
+
+@app.post("/catalog/reload")
+async def reload_catalog():
+    """Replace every activity and roster with the catalog file's
+
+    The file is read and indexed off the event loop, and then swapped in
+    without waiting for requests in flight. A file that can't be read leaves
+    the current catalog in place.
+    """
+    try:
+        catalog = await run_in_threadpool(read_catalog, catalog_path())
+    except (OSError, ValueError) as error:
+        raise HTTPException(status_code=500, detail=f"Could not read the catalog: {error}")
+    await run_in_threadpool(load_activities, catalog)
+    return {
+        "activities": len(catalog),
+        "enrollments": sum(len(details["participants"]) for details in catalog.values())
+    }
 
 
 @app.delete("/activities/{activity_name}/unregister")
 def unregister_from_activity(activity_name: str, email: str):
     """Unregister a student from an activity"""
-    # Validate activity exists
-    if activity_name not in activities:
-        raise HTTPException(status_code=404, detail="Activity not found")
+    try:
+        promoted = store.unregister(activity_name, email)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    response = {"message": f"Unregistered {email} from {activity_name}"}
+    if promoted is not None:
+        response["promoted"] = promoted
+    return response
+
+
+@app.post("/activities/{activity_name}/unregister")
+def bulk_unregister(activity_name: str, request: BulkUnregisterRequest):
+    """Unregister many students from an activity as a single change"""
+    try:
+        removed = store.unregister_many(activity_name, request.emails)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    removed_emails = set(removed)
+    return {
+        "removed": removed,
+        "not_registered": [email for email in request.emails if email not in removed_emails]
+    }
+
+
+@app.delete("/activities/{activity_name}/participants")
+def clear_roster(activity_name: str):
+    """Remove every participant from an activity"""
+    try:
+        removed = store.clear(activity_name)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return {"message": f"Removed {len(removed)} participants from {activity_name}",
+            "removed": removed}
+
+
+@app.post("/activities/{activity_name}/waitlist")
+def join_waitlist(activity_name: str, email: str):
+    """Sign up a student if a seat is free, or else put them on the waitlist"""
+    try:
+        position = store.join_waitlist(activity_name, email)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    if position is None:
+        return {"message": f"Signed up {email} for {activity_name}", "position": None}
+    return {"message": f"Added {email} to the waitlist for {activity_name}",
+            "position": position}
+
+
+@app.get("/activities/{activity_name}/waitlist")
+def get_waitlist(activity_name: str, email: str | None = None):
+    """Get a student's waitlist position, or the whole waitlist in order"""
+    try:
+        if email is None:
+            return {"waitlist": store.waitlist(activity_name)}
+        return {"email": email, "position": store.waitlist_position(activity_name, email)}
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+
+
+@app.delete("/activities/{activity_name}/waitlist")
+def leave_waitlist(activity_name: str, email: str):
+    """Take a student off an activity's waitlist"""
+    try:
+        store.leave_waitlist(activity_name, email)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return {"message": f"Removed {email} from the waitlist for {activity_name}"}
+
+
+@app.get("/registration")
+def get_registration():
+    """Get whether a registration window is open, and its settings"""
+    settings = store.registration()
+    if settings is None:
+        return {"open": False}
+    return {"open": True, "picks": settings["picks"]}
+
+
+@app.post("/registration/open")
+def open_registration(picks: int = Query(default=1, ge=1, le=MAX_PICKS), seed: int | None = None):
+    """Open a registration window, during which seats are allocated by lottery"""
+    try:
+        store.open_registration(picks, seed)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return {"open": True, "picks": picks}
+
+
+@app.post("/registration/close")
+def close_registration():
+    """Close the registration window and allocate every seat by lottery"""
+    try:
+        return store.close_registration()
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+
+
+@app.get("/students/{email}/activities")
+def get_student_activities(email: str):
+    """Get the activities a student is signed up for"""
+    return {"email": email, "activities": store.student_activities(email)}
+
+
+@app.get("/students/{email}/conflicts")
+def get_student_conflicts(email: str):
+    """Get the pairs of a student's activities whose schedules overlap"""
+    return {"email": email, "conflicts": store.student_conflicts(email)}
+
+
+@app.put("/students/{email}/preferences")
+def submit_preferences(email: str, request: PreferencesRequest):
+    """Rank a student's activities for the open registration window"""
+    try:
+        store.submit_preferences(email, request.activities)
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
+    return {"email": email, "activities": request.activities}
 
-    # Check if student is registered
-    if email not in activities[activity_name]["participants"]:
-        raise HTTPException(status_code=400, detail="Student is not registered for this activity")
 
-    # Remove student
-    activities[activity_name]["participants"].remove(email)
-    return {"message": f"Unregistered {email} from {activity_name}"}
+@app.get("/students/{email}/preferences")
+def get_preferences(email: str):
+    """Get a student's ranked activities for the open registration window"""
+    try:
+        return {"email": email, "activities": store.preferences(email)}
+    except StoreError as error:
+        raise HTTPException(status_code=error.status_code, detail=error.detail)
@@ -0,0 +1,77 @@
+"""
+Pre-encoded response bodies keyed by state version.
+
+Reads vastly outnumber writes, so instead of running the JSON encoder on every
+GET the encoded body is kept until the store's version moves on. Bodies of
+single activities are keyed by the activity's own version instead, so a
+change to one activity leaves the others cached.
+"""
+
+import json
+import threading
+
+
+def encode_json(content):
+    """Encode content the same way FastAPI's JSONResponse does"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def make_etag(epoch, version):
+    """Return the strong ETag for a state version within a version epoch"""
+    return f'"{epoch}-{version}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Return whether an If-None-Match header value matches the given ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+class VersionedBody:
+    """A JSON body that is rebuilt only when the state version changes"""
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        # (version, body) pair, swapped as a whole so readers never see it torn
+        self._entry = (None, b"")
+
+    def get(self, version):
+        """Return the encoded body for the given state version"""
+        cached_version, body = self._entry
+        if cached_version == version:
+            return body
+        with self._lock:
+            cached_version, body = self._entry
+            if cached_version != version:
+                body = encode_json(self._build())
+                self._entry = (version, body)
+            return body
+
+
+class VersionedBodies:
+    """One VersionedBody per key, each rebuilt only when its own version changes"""
+
+    def __init__(self, build):
+        self._build = build
+        self._bodies = {}
+
+    def get(self, key, version):
+        """Return the encoded body for a key at the given version"""
+        body = self._bodies.get(key)
+        if body is None:
+            body = self._bodies.setdefault(key, VersionedBody(lambda: self._build(key)))
+        return body.get(version)
+
+    def clear(self):
+        """Drop every cached body, e.g. after the keys themselves changed"""
+        self._bodies = {}
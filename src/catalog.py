@@ -0,0 +1,81 @@
+"""
+Reading and writing activity catalog files.
+
+A catalog file is JSON in one of two layouts:
+
+- plain: activity names mapped to their details, exactly as the API returns
+  them from ``GET /activities``
+- compact: ``{"format": "compact-catalog/1", "students": [...],
+  "activities": [...]}``, where activities are listed in catalog order with a
+  ``name`` field, and participants are indices into ``students``
+
+The compact layout is for large catalogs. Each email is stored and parsed
+once however many activities the student is in, integers parse faster than
+strings, and the rosters read from it share one string object per student.
+"""
+
+import json
+import os
+from pathlib import Path
+
+COMPACT_FORMAT = "compact-catalog/1"
+
+
+# Fields every activity of a catalog has
+FIELDS = ("description", "schedule", "max_participants", "participants")
+
+
+def read_catalog(path):
+    """Return the catalog in a file of either layout, as a dict in catalog order
+
+    Raises ValueError if the file isn't a catalog.
+    """
+    data = json.loads(Path(path).read_bytes())
+    try:
+        if data.get("format") != COMPACT_FORMAT:
+            catalog = data
+        else:
+            students = data["students"]
+            catalog = {}
+            for activity in data["activities"]:
+                catalog[activity["name"]] = {
+                    "description": activity["description"],
+                    "schedule": activity["schedule"],
+                    "max_participants": activity["max_participants"],
+                    "participants": [students[number] for number in activity["participants"]]
+                }
+        for name, details in catalog.items():
+            missing = [field for field in FIELDS if field not in details]
+            if missing:
+                raise ValueError(f"Activity {name} has no {missing[0]}")
+    except (AttributeError, IndexError, KeyError, TypeError) as error:
+        raise ValueError(f"Not a catalog file: {path}") from error
+    return catalog
+
+
+def write_catalog(catalog, path, compact=True):
+    """Write a catalog file, replacing any existing one atomically"""
+    if compact:
+        numbers = {}
+        activities = []
+        for name, details in catalog.items():
+            activities.append({
+                "name": name,
+                "description": details["description"],
+                "schedule": details["schedule"],
+                "max_participants": details["max_participants"],
+                "participants": [
+                    numbers.setdefault(email, len(numbers)) for email in details["participants"]
+                ]
+            })
+        data = {"format": COMPACT_FORMAT, "students": list(numbers), "activities": activities}
+    else:
+        data = catalog
+
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as output:
+        output.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
@@ -0,0 +1,104 @@
+"""
+State version counter and bounded log of roster changes.
+
+Every signup and unregister produces a new version and a Change record, and so
+does every batch unregister, however many students it removes.
+Readers compare versions to tell whether what they cached is current, and
+clients catch up by replaying the changes after the version they last saw.
+
+ChangeLog keeps both in process memory. Storage backends shared between
+worker processes provide their own log with the same interface (see
+SQLiteChangeLog in repository.py).
+"""
+
+import itertools
+import threading
+import uuid
+from collections import deque, namedtuple
+
+# One signup or unregister, stamped with the version it produced. A batch
+# removal is a single "unregister_many" change whose email is the list removed.
+Change = namedtuple("Change", ["version", "activity", "op", "email"])
+
+# Op of the change listeners get when versions were skipped (a reload, or a
+# gap in a shared log), so the clients following them must resync from a
+# snapshot. It has no activity or email.
+RESYNC = "resync"
+
+# Number of changes kept for incremental catch-up
+CHANGE_LOG_SIZE = 1024
+
+
+class ChangeLog:
+    """Version counter and change log private to this process"""
+
+    def __init__(self, size=CHANGE_LOG_SIZE):
+        # Distinguishes this log's versions from those of an earlier run
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._lock = threading.Lock()
+        self._changes = deque(maxlen=size)
+        self._listeners = []
+        # Version of the last change per activity, and the version of the last
+        # reload for activities unchanged since
+        self._activity_versions = {}
+        self._loaded_version = 0
+
+    def record(self, activity_name, op, email):
+        """Bump the version for a change and notify listeners, in version order"""
+        with self._lock:
+            self.version += 1
+            change = Change(self.version, activity_name, op, email)
+            self._changes.append(change)
+            self._activity_versions[activity_name] = self.version
+            for listener in self._listeners:
+                listener(change)
+
+    def reset(self):
+        """Bump the version for a reload, which older versions cannot replay
+
+        Listeners are sent a RESYNC change with the new version.
+        """
+        with self._lock:
+            # Never reset the counter, so a stale cached version can't look current
+            self.version += 1
+            self._changes.clear()
+            self._activity_versions = {}
+            self._loaded_version = self.version
+            change = Change(self.version, None, RESYNC, None)
+            for listener in self._listeners:
+                listener(change)
+
+    def activity_version(self, activity_name):
+        """Return a version that changes exactly when the activity changes
+
+        It is the version of the activity's last change, or of the last reload
+        if it hasn't changed since.
+        """
+        return self._activity_versions.get(activity_name, self._loaded_version)
+
+    def add_listener(self, listener):
+        """Call listener with every change, in version order
+
+        A RESYNC change stands in for versions that can't be replayed.
+        Listeners run while the log's lock is held, so they must only hand the
+        change off (e.g. to an event loop) and never block.
+        """
+        self._listeners.append(listener)
+
+    def since(self, version):
+        """Return the current version and the changes after the given one
+
+        The change list is None when the log no longer covers the requested
+        version, in which case the caller has to resync from a full snapshot.
+        """
+        with self._lock:
+            current = self.version
+            if version == current:
+                return current, []
+            if version > current or not self._changes:
+                return current, None
+            first = self._changes[0].version
+            if version + 1 < first:
+                return current, None
+            return current, list(itertools.islice(self._changes, version + 1 - first, None))
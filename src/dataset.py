@@ -0,0 +1,262 @@
+"""
+Seeded generator of district-sized synthetic activity catalogs.
+
+Models a school district rather than one school: every school offers its own
+sections of the same subjects, and its students only join its activities.
+Within that:
+
+- Capacities follow the kind of activity (ensembles are large, workshops small)
+- Schedules are mostly after school on one to three weekdays, with some
+  morning sessions, so a student's activities can really conflict
+- Popularity varies by subject and section, so some activities are full and
+  others nearly empty, and the rosters are scaled to hit the requested total
+- Students are never enrolled in two activities at overlapping times, and in
+  at most MAX_ACTIVITIES_PER_STUDENT activities
+
+The same arguments and seed always produce the same catalog. It is written in
+the compact catalog format, which the app boots from when ACTIVITIES_CATALOG
+points to it:
+
+    python src/dataset.py catalog.json --enrollments 1000000 --seed 1
+    ACTIVITIES_CATALOG=catalog.json uvicorn app:app
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+from catalog import write_catalog
+from schedule import parse_schedule, schedules_overlap
+
+# (subject, kind, smallest and largest capacity, relative popularity)
+SUBJECTS = [
+    ("Basketball", "Team", 12, 20, 1.6),
+    ("Soccer", "Team", 18, 30, 1.8),
+    ("Volleyball", "Team", 12, 18, 1.2),
+    ("Swimming", "Team", 15, 40, 0.9),
+    ("Track and Field", "Team", 20, 60, 1.1),
+    ("Tennis", "Team", 8, 16, 0.8),
+    ("Chess", "Club", 10, 30, 0.9),
+    ("Debate", "Team", 8, 20, 0.8),
+    ("Drama", "Club", 15, 40, 1.3),
+    ("Art", "Club", 10, 25, 1.0),
+    ("Orchestra", "Ensemble", 30, 80, 0.9),
+    ("Choir", "Ensemble", 25, 70, 1.0),
+    ("Jazz Band", "Ensemble", 12, 25, 0.7),
+    ("Math", "Club", 10, 30, 0.8),
+    ("Robotics", "Team", 10, 25, 1.4),
+    ("Programming", "Class", 15, 30, 1.5),
+    ("Science Olympiad", "Team", 15, 25, 0.7),
+    ("Model UN", "Club", 15, 35, 0.8),
+    ("Photography", "Club", 8, 20, 0.9),
+    ("Yearbook", "Club", 10, 20, 0.6),
+    ("Dance", "Class", 15, 35, 1.2),
+    ("Gym", "Class", 20, 40, 1.0),
+    ("Creative Writing", "Workshop", 8, 16, 0.6),
+    ("Spanish", "Club", 10, 25, 0.7)
+]
+
+# Weekdays met on, by kind of activity
+MEETINGS = {
+    "Team": (["Mondays", "Wednesdays", "Fridays"], ["Tuesdays", "Thursdays"]),
+    "Club": (["Mondays"], ["Tuesdays"], ["Wednesdays"], ["Thursdays"], ["Fridays"]),
+    "Ensemble": (["Mondays", "Wednesdays"], ["Tuesdays", "Thursdays"]),
+    "Class": (["Tuesdays", "Thursdays"], ["Mondays", "Wednesdays"], ["Fridays"]),
+    "Workshop": (["Wednesdays"], ["Saturdays"])
+}
+
+# Start times in minutes after midnight, weighted towards right after school
+START_TIMES = [7 * 60, 15 * 60, 15 * 60 + 30, 16 * 60, 16 * 60 + 30, 17 * 60]
+START_WEIGHTS = [1, 6, 5, 4, 2, 1]
+DURATIONS = [60, 90, 120]
+
+TOWNS = [
+    "Mergington", "Lincoln", "Riverside", "Oakwood", "Hillcrest", "Maple Grove", "Westfield",
+    "Eastbrook", "Northgate", "Southport", "Cedar Falls", "Pinecrest", "Lakeside", "Fairview",
+    "Brookside", "Summit"
+]
+LEVELS = ["High", "Middle", "Academy", "Prep"]
+
+FIRST_NAMES = [
+    "emma", "liam", "olivia", "noah", "ava", "elijah", "sophia", "james", "mia", "lucas",
+    "amelia", "mateo", "harper", "ethan", "aria", "daniel", "maya", "michael", "zoe", "leo"
+]
+LAST_NAMES = [
+    "smith", "johnson", "garcia", "brown", "nguyen", "patel", "kim", "lopez", "wilson",
+    "martin", "lee", "clark", "lewis", "walker", "young", "hall", "allen", "wright"
+]
+
+# Subjects' sections per school before a second section is opened
+ACTIVITIES_PER_SCHOOL = 40
+
+# Most activities one generated student is enrolled in
+MAX_ACTIVITIES_PER_STUDENT = 6
+
+# Expected share of seats taken, used to size the catalog for a target
+TYPICAL_FILL = 0.7
+
+# Rounds of offering seats left empty by schedule conflicts to other students
+FILL_PASSES = 6
+
+
+def _clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def _days(days):
+    if len(days) == 1:
+        return days[0]
+    if len(days) == 2:
+        return f"{days[0]} and {days[1]}"
+    return ", ".join(days)
+
+
+def school_names(count):
+    """Return distinct school names, as many as asked for"""
+    names = [f"{town} {level}" for level in LEVELS for town in TOWNS]
+    for round_number in range(2, count // len(names) + 2):
+        names.extend(f"{town} {level} {round_number}" for level in LEVELS for town in TOWNS)
+    return names[:count]
+
+
+def student_email(number):
+    first = FIRST_NAMES[number % len(FIRST_NAMES)]
+    last = LAST_NAMES[number // len(FIRST_NAMES) % len(LAST_NAMES)]
+    return f"{first}.{last}{number}@mergington.edu"
+
+
+def _activities(rng, activity_count, school_count):
+    """Yield (school, name, details, popularity) for every activity"""
+    schools = school_names(school_count)
+    per_school = math.ceil(activity_count / school_count)
+    made = 0
+    for school_number, school in enumerate(schools):
+        for slot in range(min(per_school, activity_count - made)):
+            subject, kind, smallest, largest, popularity = SUBJECTS[slot % len(SUBJECTS)]
+            section = slot // len(SUBJECTS) + 1
+            name = f"{subject} {kind} - {school}"
+            if section > 1:
+                name += f" ({section})"
+            start = rng.choices(START_TIMES, START_WEIGHTS)[0]
+            end = start + rng.choice(DURATIONS)
+            details = {
+                "description": f"{subject} {kind.lower()} at {school}",
+                "schedule": f"{_days(rng.choice(MEETINGS[kind]))}, {_clock(start)} - {_clock(end)}",
+                "max_participants": rng.randint(smallest, largest),
+                "participants": []
+            }
+            # Sections vary around their subject's popularity
+            yield school_number, name, details, popularity * rng.lognormvariate(0, 0.5)
+            made += 1
+
+
+def _roster_sizes(capacities, demand, enrollments):
+    """Scale each activity's demand so the rosters add up to about the target"""
+    if enrollments >= sum(capacities):
+        return list(capacities)
+    low, high = 0.0, 1.0
+    while sum(min(c, d * high) for c, d in zip(capacities, demand)) < enrollments:
+        high *= 2
+    for _ in range(40):
+        scale = (low + high) / 2
+        if sum(min(c, d * scale) for c, d in zip(capacities, demand)) < enrollments:
+            low = scale
+        else:
+            high = scale
+    return [min(c, round(d * high)) for c, d in zip(capacities, demand)]
+
+
+def generate_catalog(enrollments=1_000_000, students=None, activities=None, seed=1):
+    """Return a synthetic district catalog with about the given number of enrollments
+
+    By default there are three enrollments per student, and enough activities
+    that about TYPICAL_FILL of their seats are taken.
+    """
+    rng = random.Random(seed)
+    if students is None:
+        students = max(1, enrollments // 3)
+    if activities is None:
+        average_capacity = sum((s[2] + s[3]) / 2 for s in SUBJECTS) / len(SUBJECTS)
+        activities = max(1, round(enrollments / (average_capacity * TYPICAL_FILL)))
+    school_count = max(1, math.ceil(activities / ACTIVITIES_PER_SCHOOL))
+
+    generated = list(_activities(rng, activities, school_count))
+    catalog = {name: details for _, name, details, _ in generated}
+
+    # Students are split evenly between the schools
+    per_school = students / school_count
+    held = [[] for _ in range(students)]
+    emails = {}
+
+    def enroll(school, details, count):
+        first, last = int(school * per_school), max(int((school + 1) * per_school), 1)
+        intervals = parse_schedule(details["schedule"])
+        participants = details["participants"]
+        chosen = set(participants)
+        wanted = len(participants) + count
+        # Give up on seats that stay empty after a few tries, as a nearly
+        # saturated school would leave them
+        for _ in range(count * 3):
+            if len(participants) == wanted:
+                break
+            number = rng.randrange(first, min(last, students))
+            email = emails.get(number)
+            if email is None:
+                email = emails[number] = student_email(number)
+            mine = held[number]
+            if email in chosen or len(mine) >= MAX_ACTIVITIES_PER_STUDENT:
+                continue
+            if any(schedules_overlap(intervals, other) for other in mine):
+                continue
+            chosen.add(email)
+            mine.append(intervals)
+            participants.append(email)
+
+    # Seats some students can't take for conflicts are offered again to
+    # others, in a few passes, until the rosters are close to the target
+    for _ in range(FILL_PASSES):
+        enrolled = sum(len(details["participants"]) for details in catalog.values())
+        if enrolled >= enrollments * 0.995:
+            break
+        open_seats = [
+            details["max_participants"] - len(details["participants"])
+            for _, _, details, _ in generated
+        ]
+        extra = _roster_sizes(
+            open_seats,
+            [seats * popularity for seats, (*_, popularity) in zip(open_seats, generated)],
+            enrollments - enrolled
+        )
+        for (school, _, details, _), count in zip(generated, extra):
+            if count:
+                enroll(school, details, count)
+    return catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic activity catalog")
+    parser.add_argument("output", type=Path, help="catalog file to write")
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, help="defaults to a third of the enrollments")
+    parser.add_argument("--activities", type=int,
+                        help=f"defaults to enough for {TYPICAL_FILL:.0%} of seats to be taken")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--plain", action="store_true",
+                        help="write the plain layout instead of the compact one")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = generate_catalog(args.enrollments, args.students, args.activities, args.seed)
+    write_catalog(catalog, args.output, compact=not args.plain)
+    enrolled = sum(len(details["participants"]) for details in catalog.values())
+    print(f"Wrote {len(catalog):,} activities with {enrolled:,} enrollments to {args.output}"
+          f" in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
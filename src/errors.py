@@ -0,0 +1,75 @@
+"""
+Errors raised by the activity store, its storage backends and imports.
+
+Each error carries the HTTP status code and detail message the API answers
+with, so endpoints can translate any of them the same way.
+"""
+
+
+class StoreError(Exception):
+    """Base class for signup and unregister failures"""
+
+    status_code = 400
+    detail = "Request could not be completed"
+
+    def __init__(self, detail=None):
+        super().__init__(detail or self.detail)
+        self.detail = detail or self.detail
+
+
+class ActivityNotFound(StoreError):
+    status_code = 404
+    detail = "Activity not found"
+
+
+class AlreadySignedUp(StoreError):
+    detail = "Student already signed up for this activity"
+
+
+class ActivityFull(StoreError):
+    detail = "Activity is full"
+
+
+class NotRegistered(StoreError):
+    detail = "Student is not registered for this activity"
+
+
+class ScheduleConflict(StoreError):
+    detail = "Activity schedule conflicts with another of the student's activities"
+
+
+class AlreadyWaitlisted(StoreError):
+    detail = "Student is already on the waitlist for this activity"
+
+
+class NotWaitlisted(StoreError):
+    status_code = 404
+    detail = "Student is not on the waitlist for this activity"
+
+
+class RegistrationOpen(StoreError):
+    status_code = 409
+    detail = "A registration window is already open"
+
+
+class RegistrationClosed(StoreError):
+    status_code = 409
+    detail = "No registration window is open"
+
+
+class SignupsByLottery(StoreError):
+    status_code = 409
+    detail = "Seats are allocated by lottery while the registration window is open"
+
+
+class InvalidPreferences(StoreError):
+    detail = "Preferences must rank distinct activities"
+
+
+class InvalidImport(StoreError):
+    detail = "Import file could not be read"
+
+
+class InvalidQuery(StoreError):
+    detail = "Invalid query"
+
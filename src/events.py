@@ -0,0 +1,391 @@
+"""
+Live fan-out of roster changes.
+
+Signups and unregisters run in the threadpool, so the store hands each change
+to the broadcaster, which encodes it once and schedules the delivery onto the
+event loop. Every connected client has its own bounded queue; a client that
+falls that far behind is dropped and resyncs when its browser reconnects. The
+changes a reconnecting client missed are read in the threadpool.
+
+The WebSocket hub does the same for clients that only follow a few
+activities: subscribers are grouped per activity, and changes are batched for
+a few milliseconds so a burst of signups costs one encode per activity. Rosters
+and seat counts are read in the threadpool, never on the event loop.
+
+When versions are skipped, by a reload or a gap in a shared change log, SSE
+clients get a "resync" event and WebSocket subscribers a fresh snapshot.
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+
+from fastapi.concurrency import run_in_threadpool
+
+from cache import encode_json
+from changes import RESYNC
+from errors import StoreError
+
+# Events buffered per client before it is considered too slow and dropped
+QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15
+
+# Seconds the WebSocket hub collects changes before sending a batch
+BATCH_INTERVAL = 0.005
+
+# Marks the end of a dropped client's stream
+_CLOSED = object()
+
+
+def format_event(event, data, event_id=None):
+    """Encode one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {encode_json(data).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscription:
+    """One client's queue of encoded events"""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, version, message):
+        """Queue a message, dropping the client if its queue is full"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait((version, message))
+        except asyncio.QueueFull:
+            self.dropped = True
+            # Make room for the sentinel so the stream ends promptly
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, _CLOSED))
+
+
+class Broadcaster:
+    """Fans store changes out to every connected SSE client"""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, change):
+        """Schedule delivery of a store change; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        if change.op == RESYNC:
+            message = format_event("resync", {"version": change.version}, event_id=change.version)
+        else:
+            message = format_event("change", change._asdict(), event_id=change.version)
+        try:
+            loop.call_soon_threadsafe(self._fan_out, change.version, message)
+        except RuntimeError:
+            # The loop has shut down, nobody is left to receive it
+            pass
+
+    def _fan_out(self, version, message):
+        for subscription in list(self._subscribers):
+            subscription.offer(version, message)
+            if subscription.dropped:
+                self._subscribers.discard(subscription)
+
+    def subscribe(self):
+        """Register a client on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    async def stream(self, store, since=None):
+        """Yield SSE messages for one client until it disconnects or is dropped
+
+        Changes after ``since`` are replayed from the store's change log first;
+        if the log no longer covers it the client is told to resync.
+        """
+        subscription = self.subscribe()
+        try:
+            # Subscribe before reading the log, so nothing falls in between
+            version, changes = await run_in_threadpool(self._replay, store, since)
+            if changes is None:
+                yield format_event("resync", {"version": version}, event_id=version)
+            else:
+                for change in changes:
+                    yield format_event("change", change._asdict(), event_id=change.version)
+            yield b": connected\n\n"
+
+            while True:
+                try:
+                    event_version, message = await asyncio.wait_for(
+                        subscription.queue.get(), KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is _CLOSED:
+                    return
+                # Already sent as part of the replay
+                if event_version <= version:
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def _replay(store, since):
+        # Runs in the threadpool
+        return store.changes_since(since if since is not None else store.version)
+
+
+class LiveConnection:
+    """One WebSocket client and its queue of encoded messages"""
+
+    def __init__(self, websocket, queue_size):
+        self.websocket = websocket
+        self.activities = set()
+        # Messages held back per activity until its snapshot has been sent
+        self.awaiting = {}
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, message):
+        """Queue a message, dropping the client if its queue is full"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_CLOSED)
+
+    async def send_forever(self):
+        while True:
+            message = await self.queue.get()
+            if message is _CLOSED:
+                await self.websocket.close(code=1013, reason="Client too slow")
+                return
+            await self.websocket.send_text(message)
+
+
+def parse_request(text):
+    """Return the activity names a client message subscribes to and unsubscribes from
+
+    Raises ValueError unless the message is ``{"subscribe": [names]}`` and/or
+    ``{"unsubscribe": [names]}``.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        raise ValueError("Messages must be JSON") from None
+    if not isinstance(message, dict):
+        raise ValueError("Messages must be JSON objects")
+    requested = []
+    for key in ("subscribe", "unsubscribe"):
+        names = message.get(key, [])
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise ValueError(f"{key} must be a list of activity names")
+        requested.append(names)
+    return requested
+
+
+class RosterHub:
+    """Sends batched participant deltas to WebSocket clients per activity"""
+
+    def __init__(self, store, batch_interval=BATCH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.store = store
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._pending = defaultdict(list)
+        self._resync_pending = False
+        # The timer for the next batch, or the task sending it
+        self._flush_handle = None
+        self._loop = None
+
+    def subscriber_count(self, activity_name):
+        return len(self._subscribers.get(activity_name, ()))
+
+    def publish(self, change):
+        """Schedule a store change for the next batch; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or (change.op != RESYNC and change.activity not in self._subscribers):
+            return
+        try:
+            loop.call_soon_threadsafe(self._collect, change)
+        except RuntimeError:
+            pass
+
+    def _collect(self, change):
+        if change.op == RESYNC:
+            # Skipped versions can't be sent as deltas, so the next batch sends
+            # every subscriber a fresh snapshot of what it follows instead
+            self._resync_pending = True
+        elif change.activity in self._subscribers:
+            self._pending[change.activity].append(change)
+        else:
+            return
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.batch_interval, self._start_flush)
+
+    def _start_flush(self):
+        # Keeps the slot until the batch is sent, so batches never overtake each other
+        self._flush_handle = self._loop.create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            pending, self._pending = self._pending, defaultdict(list)
+            resync, self._resync_pending = self._resync_pending, False
+            if resync:
+                # The snapshots are read after every pending change, so cover them
+                await self._send_snapshots()
+            else:
+                await self._send_deltas(pending)
+        finally:
+            self._flush_handle = None
+            if self._pending or self._resync_pending:
+                self._schedule_flush()
+
+    async def _send_deltas(self, pending):
+        seats_left = await run_in_threadpool(self._seats_left, list(pending))
+        for activity_name, changes in pending.items():
+            # Encoded once and shared by every subscriber of the activity
+            self._send(activity_name, encode_json({
+                "type": "delta",
+                "activity": activity_name,
+                "version": changes[-1].version,
+                "changes": [
+                    {"version": change.version, "op": change.op, "email": change.email}
+                    for change in changes
+                ],
+                "seats_left": seats_left[activity_name]
+            }).decode("utf-8"))
+
+    async def _send_snapshots(self):
+        snapshots = await run_in_threadpool(self._snapshots, list(self._subscribers))
+        for activity_name, snapshot in snapshots.items():
+            self._send(activity_name, encode_json(snapshot).decode("utf-8"))
+            if snapshot["type"] != "snapshot":
+                # Gone from the reloaded catalog
+                for connection in list(self._subscribers.get(activity_name, ())):
+                    self._unsubscribe(connection, activity_name)
+
+    def _send(self, activity_name, message):
+        for connection in list(self._subscribers.get(activity_name, ())):
+            held = connection.awaiting.get(activity_name)
+            if held is not None:
+                held.append(message)
+                continue
+            connection.offer(message)
+            if connection.dropped:
+                self._remove(connection)
+
+    def _seats_left(self, activity_names):
+        # Runs in the threadpool
+        seats_left = {}
+        for activity_name in activity_names:
+            try:
+                seats_left[activity_name] = self.store.seats_left(activity_name)
+            except StoreError:
+                seats_left[activity_name] = 0
+        return seats_left
+
+    def _snapshots(self, activity_names):
+        # Runs in the threadpool
+        return {activity_name: self._snapshot(activity_name) for activity_name in activity_names}
+
+    def _snapshot(self, activity_name):
+        version = self.store.version
+        try:
+            activity = self.store.get(activity_name)
+        except StoreError as error:
+            return {"type": "error", "activity": activity_name, "detail": error.detail}
+        participants = activity["participants"]
+        return {
+            "type": "snapshot",
+            "activity": activity_name,
+            "version": version,
+            "participants": participants,
+            "max_participants": activity["max_participants"],
+            "seats_left": activity["max_participants"] - len(participants)
+        }
+
+    async def _subscribe(self, connection, activity_name):
+        # Subscribed before the snapshot is read, so no later delta is missed.
+        # Deltas are held back until the snapshot is sent; clients skip those
+        # up to its version.
+        held = connection.awaiting[activity_name] = []
+        self._subscribers[activity_name].add(connection)
+        connection.activities.add(activity_name)
+        try:
+            snapshot = await run_in_threadpool(self._snapshot, activity_name)
+        finally:
+            del connection.awaiting[activity_name]
+        if snapshot["type"] != "snapshot":
+            self._unsubscribe(connection, activity_name)
+            held.clear()
+        connection.offer(encode_json(snapshot).decode("utf-8"))
+        for message in held:
+            connection.offer(message)
+
+    def _unsubscribe(self, connection, activity_name):
+        connection.activities.discard(activity_name)
+        subscribers = self._subscribers.get(activity_name)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._subscribers[activity_name]
+
+    def _remove(self, connection):
+        for activity_name in list(connection.activities):
+            self._unsubscribe(connection, activity_name)
+
+    async def serve(self, websocket):
+        """Handle subscribe and unsubscribe messages until the client leaves
+
+        Clients send ``{"subscribe": [names]}`` or ``{"unsubscribe": [names]}``;
+        anything else is answered with an error message.
+        """
+        self._loop = asyncio.get_running_loop()
+        connection = LiveConnection(websocket, self.queue_size)
+        sender = asyncio.create_task(connection.send_forever())
+        try:
+            while not connection.dropped:
+                received = await websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    break
+                try:
+                    subscribe, unsubscribe = parse_request(
+                        received.get("text") or received.get("bytes") or ""
+                    )
+                except ValueError as error:
+                    reply = {"type": "error", "detail": str(error)}
+                    connection.offer(encode_json(reply).decode("utf-8"))
+                    continue
+                for activity_name in subscribe:
+                    await self._subscribe(connection, activity_name)
+                for activity_name in unsubscribe:
+                    self._unsubscribe(connection, activity_name)
+        finally:
+            self._remove(connection)
+            sender.cancel()
@@ -0,0 +1,45 @@
+"""
+Streaming export of activities and enrollments.
+
+An export is generated one activity at a time straight from the store. The
+first bytes go out immediately, and the server never holds more than one
+roster of the export, however many activities and enrollments there are.
+
+- ``ndjson``: one JSON object per activity, including its participants
+- ``csv``: a header, then one ``activity,email`` row per enrollment, which
+  is the format the import accepts. Fields with a comma or quote are quoted
+  and round-trip; one with a line break is quoted too, as CSV allows, but the
+  import reads one row per line, so such rows can't be imported again.
+"""
+
+from cache import encode_json
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+_CSV_SPECIAL = frozenset(',"\r\n')
+
+
+def _csv_field(value):
+    if _CSV_SPECIAL.isdisjoint(value):
+        return value
+    return '"' + value.replace('"', '""') + '"'
+
+
+def export_lines(store, file_format):
+    """Yield the export as encoded chunks, one activity's lines per chunk"""
+    if file_format == "ndjson":
+        for name, activity in store.iter_activities():
+            yield encode_json({"name": name, **activity}) + b"\n"
+        return
+
+    yield b"activity,email\n"
+    for name, activity in store.iter_activities():
+        if not activity["participants"]:
+            continue
+        prefix = _csv_field(name) + ","
+        yield "".join(
+            prefix + _csv_field(email) + "\n" for email in activity["participants"]
+        ).encode("utf-8")
@@ -0,0 +1,225 @@
+"""
+Streaming import of enrollments from CSV or NDJSON files.
+
+Exports from the student information system can run to millions of rows, so
+an import never holds the file in memory. Data is fed in blocks as it
+arrives; complete lines are parsed and validated and collected into chunks,
+and each chunk is signed up with one ActivityStore.signup_many call. Only the
+first rejected rows are kept for the report, so memory use stays the same
+however large the file is.
+
+CSV files need a header row with ``activity`` and ``email`` columns; NDJSON
+files have one ``{"activity": ..., "email": ...}`` object per line. Every row
+is one line, so a quoted CSV field can't contain a line break.
+
+Run as a script to upload a file to a running server:
+
+    python src/importer.py enrollments.csv --url http://localhost:8000
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from errors import InvalidImport
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Rows signed up per call into the store
+CHUNK_SIZE = 1000
+
+# Rejected rows listed in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Longest line accepted, so a file without newlines can't exhaust memory
+MAX_LINE_LENGTH = 64 * 1024
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+
+_EMAIL = re.compile(r"[^@\s]+@[^@\s]+")
+
+
+def import_format(requested=None, content_type=None):
+    """Pick the import format from an explicit choice or the Content-Type"""
+    if requested is None and content_type:
+        requested = _CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if requested not in IMPORT_FORMATS:
+        raise InvalidImport(f"Import format must be one of {', '.join(IMPORT_FORMATS)}")
+    return requested
+
+
+class RosterImport:
+    """One import in progress, fed with blocks of the file as they arrive"""
+
+    def __init__(self, store, file_format="csv", chunk_size=CHUNK_SIZE,
+                 max_errors=MAX_REPORTED_ERRORS):
+        self.store = store
+        self.format = import_format(file_format)
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self._line = 0
+        self._partial = b""
+        self._pending = []
+        # Positions of the activity and email fields, read from the CSV header
+        self._columns = None
+
+    def feed(self, data):
+        """Import the complete lines in a block of the file"""
+        data = self._partial + data
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        if len(self._partial) > MAX_LINE_LENGTH:
+            line = self._line + data.count(b"\n", 0, end) + 1
+            raise InvalidImport(f"Line {line} is too long")
+        if end:
+            self._parse(data[:end].split(b"\n")[:-1])
+
+    def finish(self):
+        """Import whatever is left and return the report"""
+        if self._partial:
+            self._parse([self._partial])
+            self._partial = b""
+        self._flush()
+        if self.format == "csv" and self._columns is None:
+            raise InvalidImport("CSV file is empty")
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"])
+        }
+
+    def _parse(self, lines):
+        parse_row = self._parse_csv if self.format == "csv" else self._parse_ndjson
+        for raw in lines:
+            self._line += 1
+            try:
+                text = raw.decode("utf-8").rstrip("\r")
+            except UnicodeDecodeError:
+                self.rows += 1
+                self._reject(self._line, None, None, "Row is not valid UTF-8")
+                continue
+            if self._line == 1:
+                text = text.removeprefix("\ufeff")
+            if not text.strip():
+                continue
+            if self.format == "csv" and self._columns is None:
+                self._read_header(text)
+                continue
+
+            self.rows += 1
+            try:
+                activity, email = parse_row(text)
+            except ValueError as error:
+                self._reject(self._line, None, None, str(error))
+                continue
+            if not activity:
+                self._reject(self._line, activity, email, "Activity is missing")
+            elif not _EMAIL.fullmatch(email):
+                self._reject(self._line, activity, email, "Email is not valid")
+            else:
+                self._pending.append((self._line, activity, email))
+                if len(self._pending) >= self.chunk_size:
+                    self._flush()
+
+    @staticmethod
+    def _split_csv(text):
+        # Plain rows are split directly; only quoted ones need the csv module
+        if '"' not in text:
+            return text.split(",")
+        return next(csv.reader((text,)))
+
+    def _read_header(self, text):
+        names = [name.strip().lower() for name in self._split_csv(text)]
+        if "activity" not in names or "email" not in names:
+            raise InvalidImport("CSV header must have activity and email columns")
+        self._columns = (names.index("activity"), names.index("email"))
+
+    def _parse_csv(self, text):
+        fields = self._split_csv(text)
+        activity_column, email_column = self._columns
+        if len(fields) <= max(activity_column, email_column):
+            raise ValueError("Row has too few columns")
+        return fields[activity_column].strip(), fields[email_column].strip()
+
+    @staticmethod
+    def _parse_ndjson(text):
+        try:
+            row = json.loads(text)
+        except ValueError:
+            raise ValueError("Row is not valid JSON") from None
+        if not isinstance(row, dict):
+            raise ValueError("Row must be a JSON object")
+        activity, email = row.get("activity"), row.get("email")
+        if not isinstance(activity, str) or not isinstance(email, str):
+            raise ValueError("Row needs activity and email strings")
+        return activity.strip(), email.strip()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        results = self.store.signup_many([(activity, email) for _, activity, email in pending])
+        for (line, activity, email), error in zip(pending, results):
+            if error is None:
+                self.imported += 1
+            else:
+                self._reject(line, activity, email, error.detail)
+
+    def _reject(self, line, activity, email, detail):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "activity": activity, "email": email,
+                                "detail": detail})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload an enrollment file to a running server")
+    parser.add_argument("file", type=Path, help="CSV or NDJSON file of activity and email rows")
+    parser.add_argument("--format", choices=IMPORT_FORMATS,
+                        help="defaults to ndjson for .ndjson and .jsonl files, otherwise csv")
+    parser.add_argument("--url", default="http://localhost:8000")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or (
+        "ndjson" if args.file.suffix in (".ndjson", ".jsonl") else "csv"
+    )
+    content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    with open(args.file, "rb") as upload:
+        # urllib sends a file body in blocks, so the upload is streamed too
+        request = urllib.request.Request(
+            f"{args.url.rstrip('/')}/activities/import?format={file_format}",
+            data=upload,
+            method="POST",
+            headers={
+                "Content-Type": content_type,
+                "Content-Length": str(args.file.stat().st_size)
+            }
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                report = json.load(response)
+        except urllib.error.HTTPError as error:
+            print(f"Import failed: {error.read().decode('utf-8')}", file=sys.stderr)
+            return 1
+
+    print(json.dumps(report, indent=2))
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
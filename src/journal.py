@@ -0,0 +1,396 @@
+"""
+Durable in-memory storage using an append-only journal and snapshots.
+
+JournaledRepository keeps the in-memory rosters and appends every signup and
+unregister to a journal segment before acknowledging it. How often the journal
+is fsynced is configurable:
+
+- ``always``: every write fsyncs before it returns
+- ``batch``: group commit; a write waits for an fsync, but one fsync covers
+  every record appended while the previous one was in progress
+- ``interval``: fsync at most every ``fsync_interval`` seconds, without waiting;
+  a background thread makes sure no write stays unsynced for longer
+- ``off``: leave flushing to the operating system
+
+After ``snapshot_every`` records the state is written to a compact snapshot and
+a new journal segment is started. At startup the latest snapshot is loaded and
+the segments written after it are replayed.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from sys import intern
+
+from repository import MemoryRepository
+
+FSYNC_POLICIES = ("always", "batch", "interval", "off")
+
+# Records about the registration window rather than one activity
+REGISTRATION_OPS = ("registration", "open", "preferences", "close")
+
+# Journal records written between snapshots
+SNAPSHOT_EVERY = 100_000
+
+
+def _fsync_directory(directory):
+    # Makes a rename durable; not every platform can open a directory
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournaledRepository(MemoryRepository):
+    """MemoryRepository that survives restarts through a journal and snapshots"""
+
+    def __init__(self, directory, fsync="batch", fsync_interval=0.05,
+                 snapshot_every=SNAPSHOT_EVERY):
+        super().__init__()
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+
+        # Lock order is always compact -> sync -> write -> state. The state
+        # lock guards waitlists and the registration window while they change,
+        # so compaction copies them consistently.
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._last_sync = time.monotonic()
+        self._since_snapshot = 0
+        self._compacting = False
+
+        started = time.perf_counter()
+        self._segment = self._recover()
+        self.recovery_seconds = time.perf_counter() - started
+        self._file = open(self._segment_path(self._segment), "ab")
+
+        self._closing = threading.Event()
+        if fsync == "interval":
+            threading.Thread(target=self._flush_forever, daemon=True).start()
+
+    def _segment_path(self, number):
+        return self.directory / f"journal-{number:08d}.log"
+
+    def _snapshot_path(self, number):
+        return self.directory / f"snapshot-{number:08d}.json"
+
+    def _numbered(self, prefix):
+        numbers = []
+        for path in self.directory.glob(f"{prefix}-*"):
+            stem = path.name.split("-", 1)[1].split(".", 1)[0]
+            if stem.isdigit() and not path.name.endswith(".tmp"):
+                numbers.append(int(stem))
+        return sorted(numbers)
+
+    def _recover(self):
+        """Load the latest snapshot, replay later segments and return the next segment number"""
+        snapshots = self._numbered("snapshot")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            with open(self._snapshot_path(base), "rb") as snapshot:
+                super().load(json.load(snapshot))
+
+        segments = [number for number in self._numbered("journal") if number >= base]
+        for number in segments:
+            self._replay(self._segment_path(number))
+        self._state.reindex()
+        # Never append after a possibly torn tail; start a fresh segment instead
+        return max(segments + [base]) + 1
+
+    def _replay(self, path):
+        with open(path, "rb") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final write from a crash; nothing after it was acknowledged
+                    break
+                op = record["op"]
+                if op in REGISTRATION_OPS:
+                    self._replay_registration(record)
+                    continue
+                activity = self._state.activities.get(record["activity"])
+                if activity is None:
+                    continue
+                # Replay is idempotent and skips capacity checks, since records
+                # may already be reflected in the snapshot
+                if op == "signup":
+                    activity.participants.add(intern(record["email"]))
+                elif op == "unregister_many":
+                    for email in record["emails"]:
+                        activity.participants.discard(email)
+                elif op == "wait":
+                    self._waitlist(record["activity"]).add(intern(record["email"]))
+                elif op == "unwait":
+                    self._waitlist(record["activity"]).discard(record["email"])
+                else:
+                    activity.participants.discard(record["email"])
+
+    def _replay_registration(self, record):
+        op = record["op"]
+        if op == "registration":
+            # Written at the start of a segment with the whole open window
+            self._registration = record["settings"]
+            self._preferences = record["preferences"]
+        elif op == "open":
+            self._registration = record["settings"]
+            self._preferences = {}
+        elif op == "preferences":
+            self._preferences[record["email"]] = record["activities"]
+        else:
+            self._registration = None
+            self._preferences = {}
+
+    def _append(self, record):
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._write_lock:
+            self._file.write(line)
+            self._file.flush()
+            self._written += 1
+            sequence = self._written
+            self._since_snapshot += 1
+            # Still due after a failed compaction, so the next record retries it
+            compact = self._since_snapshot >= self.snapshot_every and not self._compacting
+            if compact:
+                self._compacting = True
+        self._sync(sequence)
+        if compact:
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except OSError:
+            # The journal still holds every record; a later append tries again
+            pass
+        finally:
+            with self._write_lock:
+                self._compacting = False
+
+    def _sync(self, sequence):
+        if self.fsync == "off":
+            return
+        if self.fsync == "interval" and time.monotonic() - self._last_sync < self.fsync_interval:
+            return
+        with self._sync_lock:
+            # Another writer's fsync already covered this record
+            if self.fsync != "always" and self._synced >= sequence:
+                return
+            self._fsync_written()
+
+    def _fsync_written(self):
+        # Called with the sync lock held, so the file can't be swapped or closed
+        with self._write_lock:
+            target = self._written
+            fd = self._file.fileno()
+        os.fsync(fd)
+        self._synced = target
+        self._last_sync = time.monotonic()
+
+    def _flush_forever(self):
+        # Writes under the interval policy don't wait for an fsync, so a quiet
+        # spell after one must not leave it unsynced
+        while not self._closing.wait(self.fsync_interval):
+            with self._sync_lock:
+                if self._file.closed or self._synced >= self._written:
+                    continue
+                try:
+                    self._fsync_written()
+                except OSError:
+                    # Tried again after the next interval
+                    pass
+
+    def add_participant(self, activity_name, email):
+        super().add_participant(activity_name, email)
+        try:
+            self._append({"op": "signup", "activity": activity_name, "email": email})
+        except OSError:
+            # Not durable, so it must not be acknowledged or stay visible
+            super().remove_participant(activity_name, email)
+            raise
+
+    def remove_participant(self, activity_name, email):
+        super().remove_participant(activity_name, email)
+        try:
+            self._append({"op": "unregister", "activity": activity_name, "email": email})
+        except OSError:
+            self._reinstate(activity_name, [email])
+            raise
+
+    def remove_participants(self, activity_name, emails):
+        removed = super().remove_participants(activity_name, emails)
+        self._append_removals(activity_name, removed)
+        return removed
+
+    def clear_participants(self, activity_name):
+        removed = super().clear_participants(activity_name)
+        self._append_removals(activity_name, removed)
+        return removed
+
+    def _append_removals(self, activity_name, removed):
+        if not removed:
+            return
+        try:
+            self._append(
+                {"op": "unregister_many", "activity": activity_name, "emails": removed}
+            )
+        except OSError:
+            self._reinstate(activity_name, removed)
+            raise
+
+    def _reinstate(self, activity_name, emails):
+        # Puts back seats whose removal wasn't journaled, bypassing the checks
+        # of add_participant, which may refuse while a window is open
+        state = self._state
+        participants = self._activity(activity_name, state).participants
+        for email in emails:
+            participants.add(email)
+            self._enroll(state, email, activity_name)
+
+    def add_to_waitlist(self, activity_name, email):
+        with self._state_lock:
+            position = super().add_to_waitlist(activity_name, email)
+        try:
+            self._append({"op": "wait", "activity": activity_name, "email": email})
+        except OSError:
+            with self._state_lock:
+                super().remove_from_waitlist(activity_name, email)
+            raise
+        return position
+
+    def remove_from_waitlist(self, activity_name, email):
+        with self._state_lock:
+            super().remove_from_waitlist(activity_name, email)
+        self._append_unwait(activity_name, email)
+
+    def pop_waitlist(self, activity_name):
+        with self._state_lock:
+            email = super().pop_waitlist(activity_name)
+        if email is not None:
+            self._append_unwait(activity_name, email)
+        return email
+
+    def _append_unwait(self, activity_name, email):
+        try:
+            self._append({"op": "unwait", "activity": activity_name, "email": email})
+        except OSError:
+            # Rejoining at the back is the closest a failed write can get to undoing it
+            with self._state_lock:
+                self._waitlist(activity_name).add(email)
+            raise
+
+    def open_registration(self, settings):
+        with self._state_lock:
+            super().open_registration(settings)
+        try:
+            self._append({"op": "open", "settings": self._registration})
+        except OSError:
+            with self._state_lock:
+                self._registration = None
+            raise
+
+    def set_preferences(self, email, activities):
+        with self._state_lock:
+            previous = self._preferences.get(email)
+            super().set_preferences(email, activities)
+        try:
+            self._append({"op": "preferences", "email": email, "activities": list(activities)})
+        except OSError:
+            with self._state_lock:
+                if previous is None:
+                    self._preferences.pop(email, None)
+                else:
+                    self._preferences[email] = previous
+            raise
+
+    def close_registration(self):
+        with self._state_lock:
+            settings, preferences = super().close_registration()
+        try:
+            self._append({"op": "close"})
+        except OSError:
+            with self._state_lock:
+                self._registration, self._preferences = settings, preferences
+            raise
+        return settings, preferences
+
+    def load(self, catalog):
+        super().load(catalog)
+        self.compact()
+
+    def compact(self):
+        """Write a snapshot of the current state and drop the journal before it"""
+        with self._compact_lock:
+            with self._sync_lock, self._write_lock:
+                if self._file.closed:
+                    return
+                # Records appended from here on go to the new segment. A few of
+                # them may already be in this state; replay tolerates that.
+                state = self.snapshot()
+                with self._state_lock:
+                    # Readers create empty waitlists on first use, even now
+                    for name, waitlist in self._state.waitlists.copy().items():
+                        if waitlist:
+                            state[name]["waitlist"] = waitlist.to_list()
+                    registration = self._registration
+                    preferences = dict(self._preferences)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._synced = self._written
+                self._last_sync = time.monotonic()
+                self._segment += 1
+                generation = self._segment
+                self._file = open(self._segment_path(generation), "ab")
+                self._since_snapshot = 0
+                if registration is not None:
+                    # The snapshot only holds activities, so the open window
+                    # starts the new segment instead
+                    self._file.write(json.dumps({
+                        "op": "registration",
+                        "settings": registration,
+                        "preferences": preferences
+                    }, separators=(",", ":")).encode("utf-8") + b"\n")
+                    # Durable before the segments holding the window are deleted
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+
+            path = self._snapshot_path(generation)
+            temporary = path.with_name(path.name + ".tmp")
+            with open(temporary, "wb") as snapshot:
+                snapshot.write(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, path)
+            _fsync_directory(self.directory)
+
+            for number in self._numbered("snapshot"):
+                if number < generation:
+                    self._snapshot_path(number).unlink(missing_ok=True)
+            for number in self._numbered("journal"):
+                if number < generation:
+                    self._segment_path(number).unlink(missing_ok=True)
+
+    def close(self):
+        """Flush and fsync the journal, then close it"""
+        self._closing.set()
+        with self._compact_lock, self._sync_lock, self._write_lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
@@ -0,0 +1,87 @@
+"""
+Lottery allocation of seats at the close of a registration window.
+
+While a registration window is open, students rank the activities they want
+instead of racing each other to sign up. When it closes, every seat is
+allocated at once by random serial dictatorship: the students are shuffled
+into a lottery order, and each in turn gets their highest-ranked activity that
+still has a free seat and fits their schedule. Ranking truthfully is the best
+strategy, and submitting early gains nothing.
+
+When students may win several activities, picks are made in rounds, one
+activity per student per round, with the lottery order reversed every round
+so the students drawn last in one round choose first in the next.
+
+Activities are mapped to integer indices up front, so the allocation loop only
+does list indexing, set membership tests on small ints, and overlap checks
+against the few activities a student already has.
+"""
+
+import random
+
+from schedule import schedules_overlap
+
+# Activities a student may rank
+MAX_PREFERENCES = 20
+
+# Activities a student may win in one window
+MAX_PICKS = 10
+
+
+def allocate(preferences, seats, picks=1, schedules=None, held=None, seed=None):
+    """Allocate free seats to students by their ranked preferences
+
+    ``preferences`` maps each email to activity names in order of preference,
+    and ``seats`` maps activity names to free seats. Activities a student
+    already ``held`` are never allocated again, and neither is any activity
+    whose parsed ``schedules`` overlap one they hold or win.
+
+    Returns a dict mapping each student who won anything to the activities
+    they won, in the order they won them.
+    """
+    schedules = schedules or {}
+    held = held or {}
+    # Held activities without free seats still count for schedule conflicts
+    names = list(dict.fromkeys([*seats, *(name for mine in held.values() for name in mine)]))
+    index = {name: i for i, name in enumerate(names)}
+    free = [seats.get(name, 0) for name in names]
+    intervals = [schedules.get(name, ()) for name in names]
+
+    # Sorting first makes the draw depend only on the seed, not on submission order
+    order = sorted(preferences)
+    random.Random(seed).shuffle(order)
+
+    rankings = {}
+    taken = {}
+    for email in order:
+        rankings[email] = [index[name] for name in preferences[email] if name in index]
+        taken[email] = {index[name] for name in held.get(email, ())}
+
+    won = {}
+    next_choice = dict.fromkeys(order, 0)
+    contenders = order
+    for _ in range(picks):
+        still_contending = []
+        for email in contenders:
+            ranking = rankings[email]
+            mine = taken[email]
+            position = next_choice[email]
+            while position < len(ranking):
+                choice = ranking[position]
+                position += 1
+                if free[choice] <= 0 or choice in mine:
+                    continue
+                times = intervals[choice]
+                if times and any(schedules_overlap(times, intervals[other]) for other in mine):
+                    continue
+                free[choice] -= 1
+                mine.add(choice)
+                won.setdefault(email, []).append(names[choice])
+                still_contending.append(email)
+                break
+            next_choice[email] = position
+        # Students who won nothing this round have run out of choices
+        contenders = still_contending[::-1]
+        if not contenders:
+            break
+    return won
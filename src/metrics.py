@@ -0,0 +1,164 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+Every request is counted in a fixed-bucket latency histogram per route
+template, method and status code. Recording takes no lock: each thread writes
+only to its own shard, and a scrape adds the shards together. Reading another
+thread's shard without a lock may miss an observation in flight, which only
+delays it to the next scrape.
+
+Gauges such as roster sizes are not updated on the request path at all; they
+are read from the store when ``/metrics`` is scraped.
+
+Each worker process keeps its own metrics, so scrape every worker.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Route label of requests that matched no route, so unknown paths can't add series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_gauge(name, help_text, label, values):
+    """Return the exposition lines of a gauge with one series per label value"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in values.items():
+        lines.append(f"{name}{_labels([(label, key)])} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Request counts and latency histograms, sharded per thread"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _new_shard(self):
+        shard = {}
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def observe(self, method, route, status, seconds):
+        """Record one request"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        key = (method, route, status)
+        series = shard.get(key)
+        if series is None:
+            # One count per bucket, the overflow count, then the sum of latencies
+            series = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def totals(self):
+        """Return the merged series of every thread, keyed by (method, route, status)"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            # dict.copy() is atomic, unlike iterating a dict another thread may grow
+            for key, series in shard.copy().items():
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(series)
+                else:
+                    for i, value in enumerate(series):
+                        total[i] += value
+        return merged
+
+    def render(self):
+        """Return the request counter and latency histogram in text format"""
+        # Grouped by route, then method and status
+        totals = sorted(
+            self.totals().items(), key=lambda item: (item[0][1], item[0][0], item[0][2])
+        )
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        counter = [
+            "# HELP http_requests_total Requests handled, by route, method and status code",
+            "# TYPE http_requests_total counter"
+        ]
+        histogram = [
+            "# HELP http_request_duration_seconds Time to handle a request, in seconds",
+            "# TYPE http_request_duration_seconds histogram"
+        ]
+        for (method, route, status), series in totals:
+            pairs = [("route", route), ("method", method), ("status", status)]
+            count = sum(series[:-1])
+            counter.append(f"http_requests_total{_labels(pairs)} {count}")
+            cumulative = 0
+            for bound, observed in zip(bounds, series):
+                cumulative += observed
+                histogram.append(
+                    f"http_request_duration_seconds_bucket{_labels(pairs + [('le', bound)])}"
+                    f" {cumulative}"
+                )
+            histogram.append(f"http_request_duration_seconds_sum{_labels(pairs)} {series[-1]!r}")
+            histogram.append(f"http_request_duration_seconds_count{_labels(pairs)} {count}")
+        return "\n".join(counter + histogram) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request into a RequestMetrics
+
+    A plain ASGI middleware rather than an HTTP one, so it adds no request or
+    response objects and streamed bodies pass straight through. Requests are
+    labelled with the path template of the route that handled them.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope it was given
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+                time.perf_counter() - start
+            )
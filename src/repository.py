@@ -0,0 +1,989 @@
+"""
+Storage backends for activities and their rosters.
+
+The store talks to an ActivityRepository, so the same endpoints can run on the
+in-memory dict or on a durable SQLite database. Mutations for one activity are
+always called while the store holds that activity's lock; a backend only has to
+make each individual signup or unregister atomic.
+
+A SQLite database can be shared by several worker processes. It then also
+holds the state version and change log, so every worker serves the same
+state, and each worker polls the log to push other workers' changes to its own
+live clients.
+"""
+
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from sys import intern
+
+from activity import Activity
+from changes import CHANGE_LOG_SIZE, RESYNC, Change
+from errors import (
+    ActivityFull, ActivityNotFound, AlreadySignedUp, AlreadyWaitlisted, NotRegistered,
+    NotWaitlisted, RegistrationClosed, RegistrationOpen, SignupsByLottery
+)
+from roster import Roster
+from waitlist import Waitlist
+
+# Seconds between checks for changes made by other worker processes
+POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityRepository:
+    """Interface every storage backend implements"""
+
+    def load(self, catalog):
+        """Replace all activities and rosters with the given catalog
+
+        An activity may also list a ``waitlist`` of emails, in queue order.
+        """
+        raise NotImplementedError
+
+    def seed(self, catalog):
+        """Load the catalog if there are no activities yet, returning whether it did
+
+        ``catalog`` may also be a function returning it, which is only called
+        when the catalog is going to be loaded.
+        """
+        if self.names():
+            return False
+        self.load(catalog() if callable(catalog) else catalog)
+        return True
+
+    def change_log(self):
+        """Return the backend's shared change log, or None to keep one per process"""
+        return None
+
+    def batch(self):
+        """Return a context manager grouping the writes made in it, where supported
+
+        Each write still succeeds or fails on its own; the backend only gets to
+        commit them together.
+        """
+        return contextlib.nullcontext()
+
+    def names(self):
+        """Return the activity names in catalog order"""
+        raise NotImplementedError
+
+    def get(self, activity_name):
+        """Return a JSON-ready copy of one activity"""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Return a JSON-ready copy of every activity, keyed by name"""
+        raise NotImplementedError
+
+    def details(self):
+        """Return every activity without its roster, keyed by name in catalog order"""
+        raise NotImplementedError
+
+    def iter_activities(self):
+        """Yield (name, activity) pairs in catalog order, copying one roster at a time"""
+        raise NotImplementedError
+
+    def seats_left(self, activity_name):
+        """Return how many seats are still free in an activity"""
+        raise NotImplementedError
+
+    def enrollment_counts(self):
+        """Return the number of participants of every activity, without reading rosters"""
+        raise NotImplementedError
+
+    def student_activities(self, email):
+        """Return the names of the activities a student is signed up for"""
+        raise NotImplementedError
+
+    def add_participant(self, activity_name, email):
+        """Add a student, raising if they are already signed up or it is full
+
+        While a registration window is open, raises SignupsByLottery instead.
+        """
+        raise NotImplementedError
+
+    def remove_participant(self, activity_name, email):
+        """Remove a student, raising NotRegistered if they are not signed up"""
+        raise NotImplementedError
+
+    def remove_participants(self, activity_name, emails):
+        """Remove the given students who are signed up, returning those removed
+
+        The removals are recorded as a single change rather than one per student.
+        """
+        raise NotImplementedError
+
+    def clear_participants(self, activity_name):
+        """Remove every student, returning them in signup order"""
+        raise NotImplementedError
+
+    def waitlist(self, activity_name):
+        """Return the emails on an activity's waitlist, in queue order"""
+        raise NotImplementedError
+
+    def waitlist_position(self, activity_name, email):
+        """Return a student's 1-based waitlist position, raising NotWaitlisted if absent"""
+        raise NotImplementedError
+
+    def add_to_waitlist(self, activity_name, email):
+        """Append a student to the waitlist and return their position
+
+        Raises AlreadySignedUp or AlreadyWaitlisted if they are already in.
+        """
+        raise NotImplementedError
+
+    def remove_from_waitlist(self, activity_name, email):
+        """Remove a student from the waitlist, raising NotWaitlisted if absent"""
+        raise NotImplementedError
+
+    def pop_waitlist(self, activity_name):
+        """Remove and return the first student on the waitlist, or None if empty"""
+        raise NotImplementedError
+
+    def registration(self):
+        """Return the settings of the open registration window, or None"""
+        raise NotImplementedError
+
+    def open_registration(self, settings):
+        """Open a registration window, raising RegistrationOpen if one already is"""
+        raise NotImplementedError
+
+    def set_preferences(self, email, activities):
+        """Store a student's ranked activities, replacing any earlier ranking
+
+        Raises RegistrationClosed if no window is open.
+        """
+        raise NotImplementedError
+
+    def preferences(self, email):
+        """Return a student's ranked activities, or None if they haven't ranked any"""
+        raise NotImplementedError
+
+    def close_registration(self):
+        """Close the window, returning its settings and every student's ranking
+
+        Raises RegistrationClosed if no window is open. Signups are allowed
+        again from here on, so the store calls this with every activity locked.
+        """
+        raise NotImplementedError
+
+
+class _State:
+    """The activities, their waitlists and the student index, swapped as one"""
+
+    __slots__ = ("activities", "waitlists", "enrollments")
+
+    def __init__(self, activities, waitlists):
+        self.activities = activities
+        self.waitlists = waitlists
+        self.reindex()
+
+    def reindex(self):
+        """Rebuild the student index from the rosters"""
+        enrollments = {}
+        for name, activity in self.activities.items():
+            for email in activity.participants:
+                enrollments.setdefault(email, Roster()).add(name)
+        self.enrollments = enrollments
+
+
+class MemoryRepository(ActivityRepository):
+    """Activity records held in a dict, with each roster as an indexed Roster
+
+    A reverse index from student email to the activities they are in is kept
+    alongside the rosters, so per-student lookups don't scan every roster.
+    Activity names and emails are interned on the way in, so the rosters,
+    the index and the waitlists all share one copy of each.
+    """
+
+    def __init__(self):
+        self._state = _State({}, {})
+        self._registration = None
+        self._preferences = {}
+
+    def load(self, catalog):
+        activities = {}
+        waitlists = {}
+        for name, details in catalog.items():
+            name = intern(name)
+            activities[name] = Activity.from_dict(details)
+            if details.get("waitlist"):
+                waitlists[name] = Waitlist(intern(email) for email in details["waitlist"])
+        # The store doesn't lock activities for a reload, so the rosters and
+        # the index built from them are swapped in together; a signup sees
+        # either the old catalog or the new one, never a roster of one
+        # indexed in the other
+        self._state = _State(activities, waitlists)
+        # Rankings may name activities the new catalog doesn't have
+        self._registration = None
+        self._preferences = {}
+
+    @staticmethod
+    def _enroll(state, email, activity_name):
+        activities = state.enrollments.get(email)
+        if activities is None:
+            activities = state.enrollments.setdefault(email, Roster())
+        activities.add(activity_name)
+
+    @staticmethod
+    def _unenroll(state, emails, activity_name):
+        for email in emails:
+            activities = state.enrollments.get(email)
+            if activities is not None:
+                activities.discard(activity_name)
+
+    def names(self):
+        return list(self._state.activities)
+
+    def _activity(self, activity_name, state=None):
+        if state is None:
+            state = self._state
+        try:
+            return state.activities[activity_name]
+        except KeyError:
+            raise ActivityNotFound() from None
+
+    def get(self, activity_name):
+        return self._activity(activity_name).to_dict()
+
+    def snapshot(self):
+        return {name: activity.to_dict() for name, activity in self._state.activities.items()}
+
+    def details(self):
+        return {name: activity.details() for name, activity in self._state.activities.items()}
+
+    def iter_activities(self):
+        activities = self._state.activities
+        for name in list(activities):
+            activity = activities.get(name)
+            if activity is not None:
+                yield name, activity.to_dict()
+
+    def seats_left(self, activity_name):
+        return self._activity(activity_name).seats_left()
+
+    def enrollment_counts(self):
+        return {
+            name: len(activity.participants)
+            for name, activity in self._state.activities.items()
+        }
+
+    def student_activities(self, email):
+        activities = self._state.enrollments.get(email)
+        return activities.to_list() if activities is not None else []
+
+    def add_participant(self, activity_name, email):
+        state = self._state
+        activity = self._activity(activity_name, state)
+        participants = activity.participants
+        if self._registration is not None:
+            raise SignupsByLottery()
+        if email in participants:
+            raise AlreadySignedUp()
+        if len(participants) >= activity.max_participants:
+            raise ActivityFull()
+        email = intern(email)
+        participants.add(email)
+        self._enroll(state, email, intern(activity_name))
+
+    def remove_participant(self, activity_name, email):
+        state = self._state
+        if not self._activity(activity_name, state).participants.discard(email):
+            raise NotRegistered()
+        # Emptied entries are kept, so a concurrent signup can't be lost
+        self._unenroll(state, [email], activity_name)
+
+    def remove_participants(self, activity_name, emails):
+        state = self._state
+        participants = self._activity(activity_name, state).participants
+        removed = [email for email in emails if participants.discard(email)]
+        self._unenroll(state, removed, activity_name)
+        return removed
+
+    def clear_participants(self, activity_name):
+        state = self._state
+        removed = self._activity(activity_name, state).participants.clear()
+        self._unenroll(state, removed, activity_name)
+        return removed
+
+    def _waitlist(self, activity_name):
+        state = self._state
+        waitlist = state.waitlists.get(activity_name)
+        if waitlist is None:
+            self._activity(activity_name, state)
+            # Created on first use, since most activities never fill up
+            waitlist = state.waitlists.setdefault(activity_name, Waitlist())
+        return waitlist
+
+    def waitlist(self, activity_name):
+        return self._waitlist(activity_name).to_list()
+
+    def waitlist_position(self, activity_name, email):
+        position = self._waitlist(activity_name).position(email)
+        if position is None:
+            raise NotWaitlisted()
+        return position
+
+    def add_to_waitlist(self, activity_name, email):
+        waitlist = self._waitlist(activity_name)
+        if email in self._activity(activity_name).participants:
+            raise AlreadySignedUp()
+        position = waitlist.add(intern(email))
+        if position is None:
+            raise AlreadyWaitlisted()
+        return position
+
+    def remove_from_waitlist(self, activity_name, email):
+        if not self._waitlist(activity_name).discard(email):
+            raise NotWaitlisted()
+
+    def pop_waitlist(self, activity_name):
+        return self._waitlist(activity_name).pop()
+
+    def registration(self):
+        return self._registration
+
+    def open_registration(self, settings):
+        if self._registration is not None:
+            raise RegistrationOpen()
+        self._preferences = {}
+        self._registration = dict(settings)
+
+    def set_preferences(self, email, activities):
+        if self._registration is None:
+            raise RegistrationClosed()
+        self._preferences[email] = list(activities)
+
+    def preferences(self, email):
+        if self._registration is None:
+            raise RegistrationClosed()
+        return self._preferences.get(email)
+
+    def close_registration(self):
+        if self._registration is None:
+            raise RegistrationClosed()
+        settings, preferences = self._registration, self._preferences
+        self._registration = None
+        self._preferences = {}
+        return settings, preferences
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    max_participants INTEGER NOT NULL,
+    enrolled INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity TEXT NOT NULL REFERENCES activities (name) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    UNIQUE (activity, email)
+);
+
+CREATE INDEX IF NOT EXISTS participants_by_email ON participants (email);
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity TEXT NOT NULL REFERENCES activities (name) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    UNIQUE (activity, email)
+);
+
+CREATE INDEX IF NOT EXISTS waitlist_order ON waitlist (activity, id);
+
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity TEXT,
+    op TEXT NOT NULL,
+    email TEXT
+);
+
+CREATE INDEX IF NOT EXISTS changes_by_activity ON changes (activity, version);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- Ranked activities, as a JSON list, of students in the open registration window
+CREATE TABLE IF NOT EXISTS preferences (
+    email TEXT PRIMARY KEY,
+    activities TEXT NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS participant_added AFTER INSERT ON participants
+BEGIN
+    UPDATE activities SET enrolled = enrolled + 1 WHERE name = NEW.activity;
+    INSERT INTO changes (activity, op, email) VALUES (NEW.activity, 'signup', NEW.email);
+END;
+
+-- Batch removals set the 'batch' flag and record one change for all of them
+CREATE TRIGGER IF NOT EXISTS participant_removed AFTER DELETE ON participants
+BEGIN
+    UPDATE activities SET enrolled = enrolled - 1 WHERE name = OLD.activity;
+    INSERT INTO changes (activity, op, email)
+    SELECT OLD.activity, 'unregister', OLD.email
+    WHERE NOT EXISTS (SELECT 1 FROM meta WHERE key = 'batch');
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_pruned AFTER INSERT ON changes
+WHEN NEW.version % {size} = 0
+BEGIN
+    DELETE FROM changes WHERE version <= NEW.version - {size};
+END;
+""".format(size=CHANGE_LOG_SIZE)
+
+# Only inserts while a seat is free and no registration window is open; the
+# triggers keep the enrolled count and record the change, all within this one
+# statement
+SIGNUP_SQL = """
+INSERT INTO participants (activity, email)
+SELECT name, ? FROM activities WHERE name = ? AND enrolled < max_participants
+AND NOT EXISTS (SELECT 1 FROM meta WHERE key = 'registration')
+"""
+
+UNREGISTER_SQL = "DELETE FROM participants WHERE activity = ? AND email = ?"
+
+ROSTER_SQL = "SELECT email FROM participants WHERE activity = ? ORDER BY id"
+
+
+class SQLiteRepository(ActivityRepository):
+    """Activities stored in a SQLite database in WAL mode
+
+    Every thread gets its own connection. Connections run in autocommit mode,
+    and the seat check and insert of a signup are one cached prepared
+    statement. The store wraps multi-statement operations in batch(): a signup
+    to a scheduled activity checks the student's other activities and inserts
+    in one BEGIN IMMEDIATE transaction, and an unregister commits together with
+    the waitlist promotion it triggers. Since SQLite serializes those
+    transactions across processes, signups stay linearizable per activity and
+    free of schedule conflicts even when several workers share the database.
+    """
+
+    def __init__(self, path, poll_interval=POLL_INTERVAL):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._change_log = None
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        connection.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],)
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False, timeout=30
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Stop polling for changes and close this thread's connection"""
+        if self._change_log is not None:
+            self._change_log.close()
+        self._disconnect()
+
+    def _disconnect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def change_log(self):
+        if self._change_log is None:
+            self._change_log = SQLiteChangeLog(self, self.poll_interval)
+        return self._change_log
+
+    @contextlib.contextmanager
+    def batch(self):
+        # One transaction and one WAL commit instead of one per statement; a
+        # failed statement only rolls back itself, not the others
+        connection = self._connection()
+        if connection.in_transaction:
+            # Part of an enclosing batch, which commits or rolls back for us
+            yield
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _replace(self, connection, catalog):
+        connection.execute("DELETE FROM preferences")
+        connection.execute("DELETE FROM meta WHERE key = 'registration'")
+        connection.execute("DELETE FROM waitlist")
+        connection.execute("DELETE FROM participants")
+        connection.execute("DELETE FROM activities")
+        connection.executemany(
+            "INSERT INTO activities (name, position, description, schedule, max_participants)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (name, position, details["description"], details["schedule"],
+                 details["max_participants"])
+                for position, (name, details) in enumerate(catalog.items())
+            )
+        )
+        connection.executemany(
+            "INSERT INTO participants (activity, email) VALUES (?, ?)",
+            (
+                (name, email)
+                for name, details in catalog.items()
+                for email in details["participants"]
+            )
+        )
+        connection.executemany(
+            "INSERT INTO waitlist (activity, email) VALUES (?, ?)",
+            (
+                (name, email)
+                for name, details in catalog.items()
+                for email in details.get("waitlist", ())
+            )
+        )
+        # A reload can't be replayed as deltas; this marker makes clients resync
+        connection.execute("DELETE FROM changes")
+        connection.execute("INSERT INTO changes (op) VALUES ('reload')")
+
+    def load(self, catalog):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._replace(connection, catalog)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def seed(self, catalog):
+        connection = self._connection()
+        # Taking the write lock first means only one worker can seed
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            seeded = connection.execute("SELECT 1 FROM activities LIMIT 1").fetchone() is None
+            if seeded:
+                self._replace(connection, catalog() if callable(catalog) else catalog)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return seeded
+
+    def names(self):
+        rows = self._connection().execute("SELECT name FROM activities ORDER BY position")
+        return [name for (name,) in rows]
+
+    def get(self, activity_name):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT description, schedule, max_participants FROM activities WHERE name = ?",
+            (activity_name,)
+        ).fetchone()
+        if row is None:
+            raise ActivityNotFound()
+        participants = connection.execute(ROSTER_SQL, (activity_name,))
+        return {
+            "description": row[0],
+            "schedule": row[1],
+            "max_participants": row[2],
+            "participants": [email for (email,) in participants]
+        }
+
+    def snapshot(self):
+        connection = self._connection()
+        # Read activities and rosters from one consistent view of the database
+        connection.execute("BEGIN")
+        try:
+            activities = {
+                name: {
+                    "description": description,
+                    "schedule": schedule,
+                    "max_participants": max_participants,
+                    "participants": []
+                }
+                for name, description, schedule, max_participants in connection.execute(
+                    "SELECT name, description, schedule, max_participants"
+                    " FROM activities ORDER BY position"
+                )
+            }
+            for activity_name, email in connection.execute(
+                "SELECT activity, email FROM participants ORDER BY id"
+            ):
+                activities[activity_name]["participants"].append(email)
+        finally:
+            connection.execute("COMMIT")
+        return activities
+
+    def details(self):
+        rows = self._connection().execute(
+            "SELECT name, description, schedule, max_participants FROM activities ORDER BY position"
+        )
+        return {
+            name: {
+                "description": description,
+                "schedule": schedule,
+                "max_participants": max_participants
+            }
+            for name, description, schedule, max_participants in rows
+        }
+
+    def iter_activities(self):
+        # A connection of its own: the caller may resume the generator on other
+        # threads, and its read transaction must not mix with their writes
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        try:
+            connection.execute("BEGIN")
+            activities = connection.execute(
+                "SELECT name, description, schedule, max_participants"
+                " FROM activities ORDER BY position"
+            ).fetchall()
+            for name, description, schedule, max_participants in activities:
+                yield name, {
+                    "description": description,
+                    "schedule": schedule,
+                    "max_participants": max_participants,
+                    "participants": [
+                        email for (email,) in connection.execute(ROSTER_SQL, (name,))
+                    ]
+                }
+        finally:
+            connection.close()
+
+    def seats_left(self, activity_name):
+        row = self._connection().execute(
+            "SELECT max_participants - enrolled FROM activities WHERE name = ?", (activity_name,)
+        ).fetchone()
+        if row is None:
+            raise ActivityNotFound()
+        return row[0]
+
+    def enrollment_counts(self):
+        # The triggers keep the enrolled column current
+        return dict(self._connection().execute("SELECT name, enrolled FROM activities"))
+
+    def student_activities(self, email):
+        rows = self._connection().execute(
+            "SELECT activity FROM participants WHERE email = ? ORDER BY id", (email,)
+        )
+        return [activity for (activity,) in rows]
+
+    def add_participant(self, activity_name, email):
+        connection = self._connection()
+        try:
+            cursor = connection.execute(SIGNUP_SQL, (email, activity_name))
+        except sqlite3.IntegrityError:
+            raise AlreadySignedUp() from None
+        if cursor.rowcount == 1:
+            return
+
+        # Nothing was inserted; work out why only on this slow path
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        if self._registration(connection) is not None:
+            raise SignupsByLottery()
+        if self._is_participant(connection, activity_name, email):
+            raise AlreadySignedUp()
+        raise ActivityFull()
+
+    def remove_participant(self, activity_name, email):
+        connection = self._connection()
+        cursor = connection.execute(UNREGISTER_SQL, (activity_name, email))
+        if cursor.rowcount == 1:
+            return
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        raise NotRegistered()
+
+    def remove_participants(self, activity_name, emails):
+        def remove(connection):
+            return [
+                email for email in dict.fromkeys(emails)
+                if connection.execute(UNREGISTER_SQL, (activity_name, email)).rowcount == 1
+            ]
+        return self._remove_batch(activity_name, remove)
+
+    def clear_participants(self, activity_name):
+        def remove(connection):
+            removed = [email for (email,) in connection.execute(ROSTER_SQL, (activity_name,))]
+            connection.execute("DELETE FROM participants WHERE activity = ?", (activity_name,))
+            return removed
+        return self._remove_batch(activity_name, remove)
+
+    def _remove_batch(self, activity_name, remove):
+        connection = self._connection()
+        with self.batch():
+            if not self._exists(connection, activity_name):
+                raise ActivityNotFound()
+            # Other connections never see the flag, it is gone before COMMIT
+            connection.execute("INSERT INTO meta (key, value) VALUES ('batch', '1')")
+            removed = remove(connection)
+            connection.execute("DELETE FROM meta WHERE key = 'batch'")
+            if removed:
+                connection.execute(
+                    "INSERT INTO changes (activity, op, email) VALUES (?, 'unregister_many', ?)",
+                    (activity_name, json.dumps(removed))
+                )
+        return removed
+
+    def waitlist(self, activity_name):
+        connection = self._connection()
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        rows = connection.execute(
+            "SELECT email FROM waitlist WHERE activity = ? ORDER BY id", (activity_name,)
+        )
+        return [email for (email,) in rows]
+
+    def waitlist_position(self, activity_name, email):
+        connection = self._connection()
+        # Counts along the (activity, id) index up to the student's entry
+        position = connection.execute(
+            "SELECT COUNT(*) FROM waitlist WHERE activity = ?"
+            " AND id <= (SELECT id FROM waitlist WHERE activity = ? AND email = ?)",
+            (activity_name, activity_name, email)
+        ).fetchone()[0]
+        if position:
+            return position
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        raise NotWaitlisted()
+
+    def add_to_waitlist(self, activity_name, email):
+        connection = self._connection()
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        if self._is_participant(connection, activity_name, email):
+            raise AlreadySignedUp()
+        try:
+            connection.execute(
+                "INSERT INTO waitlist (activity, email) VALUES (?, ?)", (activity_name, email)
+            )
+        except sqlite3.IntegrityError:
+            raise AlreadyWaitlisted() from None
+        return self.waitlist_position(activity_name, email)
+
+    def remove_from_waitlist(self, activity_name, email):
+        connection = self._connection()
+        cursor = connection.execute(
+            "DELETE FROM waitlist WHERE activity = ? AND email = ?", (activity_name, email)
+        )
+        if cursor.rowcount == 1:
+            return
+        if not self._exists(connection, activity_name):
+            raise ActivityNotFound()
+        raise NotWaitlisted()
+
+    def pop_waitlist(self, activity_name):
+        # One statement, so two workers can never pop the same student
+        rows = self._connection().execute(
+            "DELETE FROM waitlist WHERE id ="
+            " (SELECT id FROM waitlist WHERE activity = ? ORDER BY id LIMIT 1)"
+            " RETURNING email",
+            (activity_name,)
+        ).fetchall()
+        return rows[0][0] if rows else None
+
+    def registration(self):
+        return self._registration(self._connection())
+
+    def open_registration(self, settings):
+        connection = self._connection()
+        with self.batch():
+            if self._registration(connection) is not None:
+                raise RegistrationOpen()
+            connection.execute("DELETE FROM preferences")
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('registration', ?)", (json.dumps(settings),)
+            )
+
+    def set_preferences(self, email, activities):
+        # Only stored while the window is open, checked in the same statement
+        cursor = self._connection().execute(
+            "INSERT OR REPLACE INTO preferences (email, activities)"
+            " SELECT ?, ? WHERE EXISTS (SELECT 1 FROM meta WHERE key = 'registration')",
+            (email, json.dumps(list(activities)))
+        )
+        if cursor.rowcount != 1:
+            raise RegistrationClosed()
+
+    def preferences(self, email):
+        connection = self._connection()
+        if self._registration(connection) is None:
+            raise RegistrationClosed()
+        row = connection.execute(
+            "SELECT activities FROM preferences WHERE email = ?", (email,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close_registration(self):
+        connection = self._connection()
+        with self.batch():
+            settings = self._registration(connection)
+            if settings is None:
+                raise RegistrationClosed()
+            preferences = {
+                email: json.loads(activities)
+                for email, activities in connection.execute(
+                    "SELECT email, activities FROM preferences"
+                )
+            }
+            connection.execute("DELETE FROM preferences")
+            connection.execute("DELETE FROM meta WHERE key = 'registration'")
+        return settings, preferences
+
+    @staticmethod
+    def _registration(connection):
+        row = connection.execute("SELECT value FROM meta WHERE key = 'registration'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _exists(connection, activity_name):
+        return connection.execute(
+            "SELECT 1 FROM activities WHERE name = ?", (activity_name,)
+        ).fetchone() is not None
+
+    @staticmethod
+    def _is_participant(connection, activity_name, email):
+        return connection.execute(
+            "SELECT 1 FROM participants WHERE activity = ? AND email = ?", (activity_name, email)
+        ).fetchone() is not None
+
+
+class SQLiteChangeLog:
+    """Version counter and change log kept in the database itself
+
+    The database triggers record every change, so this log only reads them.
+    Listeners are fed by a background thread that polls for new changes, which
+    also delivers changes made by other worker processes. The thread runs until
+    the repository is closed.
+    """
+
+    def __init__(self, repository, poll_interval=POLL_INTERVAL):
+        self.repository = repository
+        self.poll_interval = poll_interval
+        self.epoch = repository._connection().execute(
+            "SELECT value FROM meta WHERE key = 'epoch'"
+        ).fetchone()[0]
+        self._listeners = []
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._poller = None
+
+    @property
+    def version(self):
+        return self._version(self.repository._connection())
+
+    @staticmethod
+    def _version(connection):
+        row = connection.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def activity_version(self, activity_name):
+        # When the activity's last change has been pruned from the log, the
+        # oldest version still logged stands in for it. That version is newer
+        # than any the activity had before, so at worst a cached copy of an
+        # unchanged activity is refreshed; a changed one is never served stale.
+        row = self.repository._connection().execute(
+            "SELECT COALESCE("
+            "(SELECT MAX(version) FROM changes WHERE activity = ?),"
+            " (SELECT MIN(version) FROM changes), 0)",
+            (activity_name,)
+        ).fetchone()
+        return row[0]
+
+    def record(self, activity_name, op, email):
+        # The triggers already wrote it; just deliver it without waiting a poll
+        self._wake.set()
+
+    def reset(self):
+        # load() and seed() write a reload marker in their own transaction
+        self._wake.set()
+
+    def since(self, version):
+        connection = self.repository._connection()
+        # Read the version and the log from one consistent view of the database
+        connection.execute("BEGIN")
+        try:
+            current = self._version(connection)
+            if version == current:
+                return current, []
+            if version > current:
+                return current, None
+            rows = connection.execute(
+                "SELECT version, activity, op, email FROM changes WHERE version > ? ORDER BY version",
+                (version,)
+            ).fetchall()
+        finally:
+            connection.execute("COMMIT")
+        if not rows or rows[0][0] != version + 1 or any(row[2] == "reload" for row in rows):
+            return current, None
+        return current, [
+            Change(version, activity, op, json.loads(email) if op == "unregister_many" else email)
+            for version, activity, op, email in rows
+        ]
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+        if self._poller is None:
+            # Start from the version at registration, so nothing after it is missed
+            self._poller = threading.Thread(
+                target=self._poll_forever, args=(self.version,), daemon=True
+            )
+            self._poller.start()
+
+    def close(self):
+        """Stop the poller; listeners get no further changes"""
+        self._closing.set()
+        self._wake.set()
+        poller = self._poller
+        if poller is not None and poller is not threading.current_thread():
+            poller.join()
+
+    def _poll_forever(self, last):
+        try:
+            while True:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                if self._closing.is_set():
+                    return
+                last = self._deliver(last)
+        finally:
+            self.repository._disconnect()
+
+    def _deliver(self, last):
+        # A failure must not end the thread, or this worker's live clients
+        # would silently stop getting updates; the next poll tries again
+        try:
+            current, changes = self.since(last)
+        except Exception:
+            logger.exception("Failed to read changes since version %d", last)
+            return last
+        if changes is None:
+            # A reload or a pruned log has nothing to replay
+            changes = [Change(current, None, RESYNC, None)]
+        for change in changes:
+            for listener in self._listeners:
+                try:
+                    listener(change)
+                except Exception:
+                    logger.exception("Change listener failed on version %d", change.version)
+        return current
@@ -0,0 +1,63 @@
+"""
+Participant roster for an activity.
+
+A roster is an ordered set of student emails. It is backed by a dict, which
+gives a hash index for O(1) membership checks, insertion and removal while
+preserving signup order for serialization.
+"""
+
+
+class Roster:
+    """Ordered, indexed collection of participant emails"""
+
+    __slots__ = ("_index",)
+
+    def __init__(self, emails=()):
+        self._index = dict.fromkeys(emails)
+
+    def __contains__(self, email):
+        return email in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __eq__(self, other):
+        if isinstance(other, Roster):
+            return list(self._index) == list(other._index)
+        if isinstance(other, list):
+            return list(self._index) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Roster({list(self._index)!r})"
+
+    def add(self, email):
+        """Append an email to the roster, returning False if already present"""
+        if email in self._index:
+            return False
+        self._index[email] = None
+        return True
+
+    def remove(self, email):
+        """Remove an email from the roster, raising KeyError if absent"""
+        del self._index[email]
+
+    def discard(self, email):
+        """Remove an email if present, returning whether it was removed"""
+        if email not in self._index:
+            return False
+        del self._index[email]
+        return True
+
+    def clear(self):
+        """Remove every email, returning them in signup order"""
+        emails = list(self._index)
+        self._index.clear()
+        return emails
+
+    def to_list(self):
+        """Return the participants as a list in signup order"""
+        return list(self._index)
@@ -0,0 +1,74 @@
+"""
+Parsing of activity schedules and detection of time conflicts.
+
+Schedules are free text such as "Tuesdays and Thursdays, 3:30 PM - 4:30 PM".
+They are parsed once when the catalog is loaded into weekly intervals. Two
+activities conflict when any of their intervals share a weekday and overlap;
+a student only ever holds a few activities, so they are compared pairwise.
+"""
+
+import re
+from collections import namedtuple
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_WEEKDAY_NUMBERS = {name.lower(): number for number, name in enumerate(WEEKDAYS)}
+
+_TIME_RANGE = re.compile(
+    r"(\d{1,2}):(\d{2})\s*([AP]M)\s*-\s*(\d{1,2}):(\d{2})\s*([AP]M)", re.IGNORECASE
+)
+
+# A weekly time slot; start and end are minutes after midnight, end exclusive
+Interval = namedtuple("Interval", ["weekday", "start", "end"])
+
+
+def parse_weekday(text):
+    """Return the number of a weekday name such as "Tuesday" or "tuesdays", or None"""
+    return _WEEKDAY_NUMBERS.get(text.strip().lower().removesuffix("s"))
+
+
+def _minutes(hour, minute, meridiem):
+    hour = int(hour) % 12
+    if meridiem.upper() == "PM":
+        hour += 12
+    return hour * 60 + int(minute)
+
+
+def parse_schedule(text):
+    """Return the weekly intervals of a schedule, or () if it can't be parsed"""
+    match = _TIME_RANGE.search(text)
+    if match is None:
+        return ()
+    start = _minutes(*match.group(1, 2, 3))
+    end = _minutes(*match.group(4, 5, 6))
+    if end <= start:
+        return ()
+
+    weekdays = []
+    for part in re.split(r",|\band\b", text[:match.start()]):
+        day = part.strip().lower()
+        if not day:
+            continue
+        number = parse_weekday(day)
+        if number is None:
+            return ()
+        weekdays.append(number)
+    return tuple(Interval(weekday, start, end) for weekday in weekdays)
+
+
+def schedules_overlap(first, second):
+    """Return whether two interval lists share any time"""
+    return any(
+        a.weekday == b.weekday and a.start < b.end and b.start < a.end
+        for a in first for b in second
+    )
+
+
+def overlapping_weekdays(first, second):
+    """Return the weekday names on which two interval lists overlap"""
+    days = set()
+    for a in first:
+        for b in second:
+            if a.weekday == b.weekday and a.start < b.end and b.start < a.end:
+                days.add(a.weekday)
+    return [WEEKDAYS[day] for day in sorted(days)]
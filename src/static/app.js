@@ -4,96 +4,215 @@ document.addEventListener("DOMContentLoaded", () => {
   const signupForm = document.getElementById("signup-form");
   const messageDiv = document.getElementById("message");
 
+  // How often to poll for roster changes when Server-Sent Events are unavailable
+  const POLL_INTERVAL_MS = 5000;
+
+  // Last activities payload, the ETag it was served with and its state version
+  let cachedActivities = null;
+  let activitiesETag = null;
+  let activitiesVersion = null;
+
   // Function to fetch activities from API
   async function fetchActivities() {
     try {
-      const response = await fetch("/activities");
-      const activities = await response.json();
+      const headers = {};
+      if (activitiesETag && cachedActivities) {
+        headers["If-None-Match"] = activitiesETag;
+      }
 
-      // Clear loading message
-      activitiesList.innerHTML = "";
+      const response = await fetch("/activities", { headers, cache: "no-store" });
 
-      // Clear select dropdown options (except the default one)
-      while (activitySelect.options.length > 1) {
-        activitySelect.remove(1);
+      // Nothing changed since the last fetch, keep what is rendered
+      if (response.status === 304) {
+        return;
       }
 
-      // Populate activities list
-      Object.entries(activities).forEach(([name, details]) => {
-        const activityCard = document.createElement("div");
-        activityCard.className = "activity-card";
-
-        const spotsLeft = details.max_participants - details.participants.length;
-
-        const participantsList = details.participants.length > 0
-          ? `<ul class="participants-list">${details.participants.map(p => `<li><span>${p}</span><button class="delete-icon" data-activity="${name}" data-email="${p}" title="Remove participant">×</button></li>`).join("")}</ul>`
-          : "<p class=\"no-participants\"><em>No participants yet</em></p>";
-
-        activityCard.innerHTML = `
-          <h4>${name}</h4>
-          <p>${details.description}</p>
-          <p><strong>Schedule:</strong> ${details.schedule}</p>
-          <p><strong>Availability:</strong> ${spotsLeft} spots left</p>
-          <div class="participants-section">
-            <strong>Participants (${details.participants.length}/${details.max_participants}):</strong>
-            ${participantsList}
-          </div>
-        `;
-
-        activitiesList.appendChild(activityCard);
-
-        // Add option to select dropdown
-        const option = document.createElement("option");
-        option.value = name;
-        option.textContent = name;
-        activitySelect.appendChild(option);
-      });
+      cachedActivities = await response.json();
+      activitiesETag = response.headers.get("ETag");
+      activitiesVersion = Number(response.headers.get("X-Activities-Version"));
+      renderActivities(cachedActivities);
+    } catch (error) {
+      activitiesList.innerHTML = "<p>Failed to load activities. Please try again later.</p>";
+      console.error("Error fetching activities:", error);
+    }
+  }
+
+  // Function to fetch only the roster changes since the last known version
+  async function refreshActivities() {
+    if (cachedActivities === null || activitiesVersion === null) {
+      return fetchActivities();
+    }
 
-      // Add event listeners to delete buttons
-      document.querySelectorAll(".delete-icon").forEach(button => {
-        button.addEventListener("click", async (event) => {
-          event.preventDefault();
-          const activityName = button.getAttribute("data-activity");
-          const email = button.getAttribute("data-email");
-          
-          try {
-            const response = await fetch(
-              `/activities/${encodeURIComponent(activityName)}/unregister?email=${encodeURIComponent(email)}`,
-              {
-                method: "DELETE",
-              }
-            );
-
-            const result = await response.json();
-
-            if (response.ok) {
-              messageDiv.textContent = result.message;
-              messageDiv.className = "success";
-              // Refresh activities list
-              fetchActivities();
-            } else {
-              messageDiv.textContent = result.detail || "An error occurred";
-              messageDiv.className = "error";
+    try {
+      const response = await fetch(
+        `/activities/changes?since=${activitiesVersion}`,
+        { cache: "no-store" }
+      );
+      const result = await response.json();
+
+      if (result.snapshot) {
+        // Too far behind for deltas, take the full snapshot instead
+        cachedActivities = result.snapshot;
+        activitiesETag = null;
+      } else if (result.changes.length > 0) {
+        result.changes.forEach(applyChange);
+      } else {
+        activitiesVersion = result.version;
+        return;
+      }
+
+      activitiesVersion = result.version;
+      renderActivities(cachedActivities);
+    } catch (error) {
+      console.error("Error fetching activity changes:", error);
+    }
+  }
+
+  // Function to apply one signup or unregister to the cached activities
+  function applyChange(change) {
+    const details = cachedActivities[change.activity];
+    if (!details) {
+      return;
+    }
+
+    const index = details.participants.indexOf(change.email);
+    if (change.op === "signup" && index === -1) {
+      details.participants.push(change.email);
+    } else if (change.op === "unregister" && index !== -1) {
+      details.participants.splice(index, 1);
+    } else if (change.op === "unregister_many") {
+      const removed = new Set(change.email);
+      details.participants = details.participants.filter((email) => !removed.has(email));
+    }
+  }
+
+  // Function to follow roster changes pushed by the server
+  function subscribeToChanges() {
+    // Fall back to polling where Server-Sent Events are unavailable
+    if (!window.EventSource) {
+      setInterval(refreshActivities, POLL_INTERVAL_MS);
+      return;
+    }
+
+    const query = activitiesVersion === null ? "" : `?since=${activitiesVersion}`;
+    const source = new EventSource(`/activities/stream${query}`);
+
+    source.addEventListener("change", (event) => {
+      const change = JSON.parse(event.data);
+      if (cachedActivities === null || change.version <= activitiesVersion) {
+        return;
+      }
+      // A version was skipped, so the cache can't be patched, reload everything
+      if (change.version !== activitiesVersion + 1) {
+        fetchActivities();
+        return;
+      }
+      applyChange(change);
+      activitiesVersion = change.version;
+      scheduleRender();
+    });
+
+    // The server could not replay what we missed, reload everything
+    source.addEventListener("resync", () => {
+      fetchActivities();
+    });
+  }
+
+  // Function to re-render at most once per frame during bursts of changes
+  let renderPending = false;
+  function scheduleRender() {
+    if (renderPending) {
+      return;
+    }
+    renderPending = true;
+    requestAnimationFrame(() => {
+      renderPending = false;
+      renderActivities(cachedActivities);
+    });
+  }
+
+  // Function to render activities into the list and dropdown
+  function renderActivities(activities) {
+    // Clear loading message
+    activitiesList.innerHTML = "";
+
+    // Clear select dropdown options (except the default one)
+    while (activitySelect.options.length > 1) {
+      activitySelect.remove(1);
+    }
+
+    // Populate activities list
+    Object.entries(activities).forEach(([name, details]) => {
+      const activityCard = document.createElement("div");
+      activityCard.className = "activity-card";
+
+      const spotsLeft = details.max_participants - details.participants.length;
+
+      const participantsList = details.participants.length > 0
+        ? `<ul class="participants-list">${details.participants.map(p => `<li><span>${p}</span><button class="delete-icon" data-activity="${name}" data-email="${p}" title="Remove participant">×</button></li>`).join("")}</ul>`
+        : "<p class=\"no-participants\"><em>No participants yet</em></p>";
+
+      activityCard.innerHTML = `
+        <h4>${name}</h4>
+        <p>${details.description}</p>
+        <p><strong>Schedule:</strong> ${details.schedule}</p>
+        <p><strong>Availability:</strong> ${spotsLeft} spots left</p>
+        <div class="participants-section">
+          <strong>Participants (${details.participants.length}/${details.max_participants}):</strong>
+          ${participantsList}
+        </div>
+      `;
+
+      activitiesList.appendChild(activityCard);
+
+      // Add option to select dropdown
+      const option = document.createElement("option");
+      option.value = name;
+      option.textContent = name;
+      activitySelect.appendChild(option);
+    });
+
+    // Add event listeners to delete buttons
+    document.querySelectorAll(".delete-icon").forEach(button => {
+      button.addEventListener("click", async (event) => {
+        event.preventDefault();
+        const activityName = button.getAttribute("data-activity");
+        const email = button.getAttribute("data-email");
+        
+        try {
+          const response = await fetch(
+            `/activities/${encodeURIComponent(activityName)}/unregister?email=${encodeURIComponent(email)}`,
+            {
+              method: "DELETE",
             }
+          );
 
-            messageDiv.classList.remove("hidden");
+          const result = await response.json();
 
-            // Hide message after 5 seconds
-            setTimeout(() => {
-              messageDiv.classList.add("hidden");
-            }, 5000);
-          } catch (error) {
-            messageDiv.textContent = "Failed to unregister. Please try again.";
+          if (response.ok) {
+            messageDiv.textContent = result.message;
+            messageDiv.className = "success";
+            // Refresh activities list
+            refreshActivities();
+          } else {
+            messageDiv.textContent = result.detail || "An error occurred";
             messageDiv.className = "error";
-            messageDiv.classList.remove("hidden");
-            console.error("Error unregistering:", error);
           }
-        });
+
+          messageDiv.classList.remove("hidden");
+
+          // Hide message after 5 seconds
+          setTimeout(() => {
+            messageDiv.classList.add("hidden");
+          }, 5000);
+        } catch (error) {
+          messageDiv.textContent = "Failed to unregister. Please try again.";
+          messageDiv.className = "error";
+          messageDiv.classList.remove("hidden");
+          console.error("Error unregistering:", error);
+        }
       });
-    } catch (error) {
-      activitiesList.innerHTML = "<p>Failed to load activities. Please try again later.</p>";
-      console.error("Error fetching activities:", error);
-    }
+    });
   }
 
   // Handle form submission
@@ -118,7 +237,7 @@ document.addEventListener("DOMContentLoaded", () => {
         messageDiv.className = "success";
         signupForm.reset();
         // Refresh activities list
-        fetchActivities();
+        refreshActivities();
       } else {
         messageDiv.textContent = result.detail || "An error occurred";
         messageDiv.className = "error";
@@ -139,5 +258,5 @@ document.addEventListener("DOMContentLoaded", () => {
   });
 
   // Initialize app
-  fetchActivities();
+  fetchActivities().then(subscribeToChanges);
 });
@@ -0,0 +1,560 @@
+"""
+Activity store and seat reservation engine.
+
+The store sits between the endpoints and a storage backend. Every activity
+gets its own lock, so the capacity check and the roster update of a signup
+happen atomically without serializing signups for unrelated activities behind
+a single global lock.
+
+Each change also bumps a monotonically increasing state version, which readers
+use to tell whether anything they cached is still current, and is recorded in
+a bounded change log so clients can catch up with deltas instead of
+re-fetching every roster. Backends shared between worker processes keep the
+version and change log themselves, so every worker agrees on them.
+"""
+
+import base64
+import binascii
+import contextlib
+import secrets
+import threading
+
+# Re-exported so callers can import them alongside the store
+from changes import CHANGE_LOG_SIZE, RESYNC, Change, ChangeLog  # noqa: F401
+from errors import (  # noqa: F401
+    ActivityFull, ActivityNotFound, AlreadySignedUp, AlreadyWaitlisted, InvalidPreferences,
+    InvalidQuery, NotRegistered, NotWaitlisted, RegistrationClosed, RegistrationOpen,
+    ScheduleConflict, SignupsByLottery, StoreError
+)
+from lottery import MAX_PICKS, MAX_PREFERENCES, allocate
+from repository import MemoryRepository
+from schedule import overlapping_weekdays, parse_schedule, parse_weekday, schedules_overlap
+
+# Striped locks serializing one student's signups to conflicting activities
+STUDENT_LOCK_STRIPES = 64
+
+# Fields a listing can project, and those it returns when none are chosen
+LISTING_FIELDS = (
+    "description", "schedule", "max_participants", "participants", "participant_count",
+    "seats_left"
+)
+DEFAULT_LISTING_FIELDS = ("description", "schedule", "max_participants", "participants")
+
+# Activities per listing page by default, and at most
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class CatalogIndex:
+    """What the store derives from the catalog, replaced whole by a reload
+
+    Readers take ``store.catalog_index`` once, so a reload running alongside
+    them can't show them the locks of one catalog and the schedules of another.
+    """
+
+    __slots__ = ("locks", "schedules", "summaries", "positions")
+
+    def __init__(self, details, previous=None):
+        # Activities kept by a reload keep their locks, so a signup still
+        # holding one from before the swap excludes those taking it after
+        locks = previous.locks if previous is not None else {}
+        self.locks = {name: locks.get(name) or threading.Lock() for name in details}
+        # Large catalogs repeat a few hundred schedules, so each distinct one
+        # is parsed once and its intervals shared
+        parsed = {}
+        for activity in details.values():
+            text = activity["schedule"]
+            if text not in parsed:
+                intervals = parse_schedule(text)
+                parsed[text] = (intervals, frozenset(interval.weekday for interval in intervals))
+        self.schedules = {
+            name: parsed[activity["schedule"]][0] for name, activity in details.items()
+        }
+        # What listings filter and project on, so they never read the rosters
+        self.summaries = {
+            name: {
+                "description": activity["description"],
+                "schedule": activity["schedule"],
+                "max_participants": activity["max_participants"],
+                "weekdays": parsed[activity["schedule"]][1],
+                "folded_name": name.casefold()
+            }
+            for name, activity in details.items()
+        }
+        self.positions = {name: position for position, name in enumerate(details)}
+
+
+class ActivityStore:
+    """Activities in a storage backend, guarded by one lock per activity
+
+    Schedules are parsed once when the catalog is loaded, so a signup only
+    compares the intervals of the student's few current activities with those
+    of the new one. No activity-to-activity conflict graph is built: in a
+    large catalog, where hundreds of activities share each after-school slot,
+    it would grow quadratically.
+    """
+
+    def __init__(self, catalog=None, change_log_size=CHANGE_LOG_SIZE, repository=None):
+        self.repository = repository if repository is not None else MemoryRepository()
+        self._student_locks = [threading.Lock() for _ in range(STUDENT_LOCK_STRIPES)]
+        # Serializes replacing the catalog index
+        self._index_lock = threading.Lock()
+        self.catalog_index = CatalogIndex({})
+        self.changes = self.repository.change_log()
+        if self.changes is None:
+            self.changes = ChangeLog(change_log_size)
+        if catalog is not None:
+            self.load(catalog)
+        else:
+            self._reindex()
+
+    @property
+    def version(self):
+        """The current state version"""
+        return self.changes.version
+
+    @property
+    def epoch(self):
+        """Identifies the version sequence, which restarts with a new epoch"""
+        return self.changes.epoch
+
+    @property
+    def schedules(self):
+        """Parsed schedule intervals of every activity, keyed by name"""
+        return self.catalog_index.schedules
+
+    @property
+    def summaries(self):
+        """Every activity's details without its roster, keyed by name"""
+        return self.catalog_index.summaries
+
+    def load(self, catalog):
+        """Replace all activities with a copy of the given catalog
+
+        Doesn't wait for requests in flight. The backend swaps in the new
+        catalog in one step, and the store its index, built beforehand; a
+        request caught between the two may find an activity missing. An
+        activity in both catalogs keeps its lock, so it is never guarded by
+        two at once.
+        """
+        with self._index_lock:
+            index = CatalogIndex(catalog, self.catalog_index)
+            self.repository.load(catalog)
+            self.catalog_index = index
+        self.changes.reset()
+
+    def seed(self, catalog):
+        """Load the catalog only if there are no activities yet
+
+        Safe to call from every worker process at startup; at most one of them
+        loads the catalog. ``catalog`` may also be a function returning it, so
+        a backend that already has activities never reads the catalog at all.
+        """
+        if self.repository.seed(catalog):
+            self.changes.reset()
+        self._reindex()
+
+    def follow_reloads(self):
+        """Rebuild the catalog index whenever another worker reloads the catalog
+
+        Only backends shared between worker processes need this; their change
+        log reports reloads made through any worker. Other backends can only
+        be reloaded through this store, so it does nothing for them.
+        """
+        if not isinstance(self.changes, ChangeLog):
+            self.changes.add_listener(self._follow_reload)
+
+    def _follow_reload(self, change):
+        # Runs on the change log's poller thread. A resync may also stand for
+        # a gap in the log; rebuilding then costs no more than checking would.
+        if change.op == RESYNC:
+            self._reindex()
+
+    def _reindex(self):
+        with self._index_lock:
+            self.catalog_index = CatalogIndex(self.repository.details(), self.catalog_index)
+
+    def activity_version(self, activity_name):
+        """Return a version of one activity, which only its own changes move on
+
+        Raises ActivityNotFound for an unknown activity.
+        """
+        self.lock(activity_name)
+        return self.changes.activity_version(activity_name)
+
+    def add_listener(self, listener):
+        """Call listener with every change, in version order
+
+        Listeners must only hand the change off (e.g. to an event loop) and
+        never block.
+        """
+        self.changes.add_listener(listener)
+
+    def changes_since(self, version):
+        """Return the current version and the changes after the given one
+
+        The change list is None when the log no longer covers the requested
+        version, in which case the caller has to resync from a full snapshot.
+        """
+        return self.changes.since(version)
+
+    def names(self):
+        """Return the activity names in catalog order"""
+        return list(self.catalog_index.locks)
+
+    def get(self, activity_name):
+        """Return a JSON-ready copy of an activity, raising ActivityNotFound if missing"""
+        return self.repository.get(activity_name)
+
+    def snapshot(self):
+        """Return a JSON-ready copy of every activity"""
+        return self.repository.snapshot()
+
+    def list_activities(self, limit=PAGE_SIZE, cursor=None, open_seats=None, weekday=None,
+                        prefix=None, fields=None):
+        """Return one page of activities matching the filters, and the next page's cursor
+
+        Activities are listed in catalog order, projected onto ``fields``.
+        Filtering and every field except participants come from the catalog
+        summaries and the backend's enrollment counts, so only the rosters
+        of activities on the page are read, and only if asked for. The cursor
+        is None on the last page.
+        """
+        if limit < 1:
+            raise InvalidQuery("Limit must be at least 1")
+        fields = DEFAULT_LISTING_FIELDS if fields is None else tuple(fields)
+        unknown = [field for field in fields if field not in LISTING_FIELDS]
+        if unknown:
+            raise InvalidQuery(f"Unknown field: {unknown[0]}")
+        if weekday is not None:
+            weekday_number = parse_weekday(weekday)
+            if weekday_number is None:
+                raise InvalidQuery(f"Unknown weekday: {weekday}")
+        if prefix is not None:
+            prefix = prefix.casefold()
+
+        index = self.catalog_index
+        names = list(index.summaries)
+        start = 0 if cursor is None else self._cursor_position(index, cursor) + 1
+        counts = None
+        if open_seats is not None or "participant_count" in fields or "seats_left" in fields:
+            counts = self.repository.enrollment_counts()
+
+        page = {}
+        for name in names[start:]:
+            summary = index.summaries[name]
+            if prefix and not summary["folded_name"].startswith(prefix):
+                continue
+            if weekday is not None and weekday_number not in summary["weekdays"]:
+                continue
+            if open_seats is not None and (
+                counts.get(name, 0) < summary["max_participants"]
+            ) != open_seats:
+                continue
+            if len(page) == limit:
+                # Another match remains, so there is a next page
+                return page, self._encode_cursor(next(reversed(page)))
+            page[name] = self._project(name, summary, counts, fields)
+        return page, None
+
+    def _project(self, name, summary, counts, fields):
+        activity = {}
+        for field in fields:
+            if field == "participants":
+                activity[field] = self.repository.get(name)["participants"]
+            elif field == "participant_count":
+                activity[field] = counts.get(name, 0)
+            elif field == "seats_left":
+                activity[field] = summary["max_participants"] - counts.get(name, 0)
+            else:
+                activity[field] = summary[field]
+        return activity
+
+    @staticmethod
+    def _encode_cursor(name):
+        return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _cursor_position(index, cursor):
+        try:
+            name = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        except (binascii.Error, UnicodeError):
+            raise InvalidQuery("Invalid cursor") from None
+        position = index.positions.get(name)
+        if position is None:
+            raise InvalidQuery("Invalid cursor")
+        return position
+
+    def iter_activities(self):
+        """Yield (name, activity) pairs one activity at a time
+
+        Unlike snapshot(), only one roster is copied at a time. Each activity
+        is consistent, but changes made while iterating may show up in later
+        activities and not in earlier ones.
+        """
+        return self.repository.iter_activities()
+
+    def seats_left(self, activity_name):
+        """Return how many seats are still free in an activity"""
+        return self.repository.seats_left(activity_name)
+
+    def occupancy(self):
+        """Return (participants, seats left) for every activity, without reading rosters"""
+        counts = self.repository.enrollment_counts()
+        return {
+            name: (counts.get(name, 0), summary["max_participants"] - counts.get(name, 0))
+            for name, summary in self.summaries.items()
+        }
+
+    def student_activities(self, email):
+        """Return the names of the activities a student is signed up for"""
+        return self.repository.student_activities(email)
+
+    def lock(self, activity_name):
+        """Return the lock guarding the given activity's roster"""
+        lock = self.catalog_index.locks.get(activity_name)
+        if lock is None:
+            raise ActivityNotFound()
+        return lock
+
+    @contextlib.contextmanager
+    def _lock_all(self):
+        # Always taken in catalog order, and nothing else holds two activity
+        # locks at once, so this can't deadlock
+        with contextlib.ExitStack() as stack:
+            for lock in list(self.catalog_index.locks.values()):
+                stack.enter_context(lock)
+            yield
+
+    def student_conflicts(self, email):
+        """Return the pairs of a student's activities whose schedules overlap"""
+        activities = self.student_activities(email)
+        schedules = self.schedules
+        conflicts = []
+        for i, first in enumerate(activities):
+            for second in activities[i + 1:]:
+                days = overlapping_weekdays(schedules[first], schedules[second])
+                if days:
+                    conflicts.append({"activities": [first, second], "days": days})
+        return conflicts
+
+    def signup(self, activity_name, email):
+        """Reserve a seat for a student, enforcing capacity atomically"""
+        with self.lock(activity_name):
+            self._signup_locked(activity_name, email)
+
+    def signup_many(self, enrollments):
+        """Sign up many (activity, email) pairs, returning a result per pair
+
+        Pairs are grouped by activity so each activity's lock is taken once,
+        and the backend can commit each group's signups together.
+        Each result is None on success or the StoreError that rejected it, in
+        the order the pairs were given; one failure doesn't stop the rest.
+        """
+        results = [None] * len(enrollments)
+        by_activity = {}
+        for i, (activity_name, email) in enumerate(enrollments):
+            by_activity.setdefault(activity_name, []).append((i, email))
+
+        for activity_name, items in by_activity.items():
+            try:
+                lock = self.lock(activity_name)
+            except StoreError as error:
+                # Without its traceback the error can't keep this frame, and
+                # so the results, alive in a reference cycle
+                error = error.with_traceback(None)
+                for i, _ in items:
+                    results[i] = error
+                continue
+            with lock, self.repository.batch():
+                for i, email in items:
+                    try:
+                        self._signup_locked(activity_name, email)
+                    except StoreError as error:
+                        results[i] = error.with_traceback(None)
+        return results
+
+    def _signup_locked(self, activity_name, email):
+        schedules = self.schedules
+        intervals = schedules.get(activity_name)
+        if not intervals:
+            # An unparsed schedule can't conflict with anything
+            self._add(activity_name, email)
+            return
+        # Both sides of a conflict take the student's lock, so two
+        # concurrent signups can't each miss the other. Worker processes
+        # sharing a database don't share these locks, so the check and the
+        # signup also run in one write transaction, which the database
+        # serializes; it is begun first so every thread takes both in order.
+        with self.repository.batch(), self._student_locks[hash(email) % STUDENT_LOCK_STRIPES]:
+            for other in self.repository.student_activities(email):
+                # Signing up twice is reported as such by the repository
+                if other != activity_name and schedules_overlap(
+                    intervals, schedules.get(other, ())
+                ):
+                    raise ScheduleConflict(f"Schedule conflicts with {other}")
+            self._add(activity_name, email)
+
+    def _add(self, activity_name, email):
+        self.repository.add_participant(activity_name, email)
+        self.changes.record(activity_name, "signup", email)
+
+    def unregister(self, activity_name, email):
+        """Release a student's seat in an activity, returning who was promoted to it
+
+        The first student on the waitlist who can take the seat gets it in the
+        same critical section, so no other signup can take it first. Returns
+        their email, or None if nobody was waiting.
+        """
+        with self.lock(activity_name), self.repository.batch():
+            self.repository.remove_participant(activity_name, email)
+            self.changes.record(activity_name, "unregister", email)
+            promoted = self._promote(activity_name)
+        return promoted[0] if promoted else None
+
+    def unregister_many(self, activity_name, emails):
+        """Release the seats of many students, returning those who were removed
+
+        Students not signed up are skipped. However many are removed, this is
+        one change and one version bump, so caches are invalidated only once.
+        Freed seats then go to the waitlist, as with unregister().
+        """
+        with self.lock(activity_name), self.repository.batch():
+            removed = self.repository.remove_participants(activity_name, emails)
+            if removed:
+                self.changes.record(activity_name, "unregister_many", removed)
+                self._promote(activity_name)
+        return removed
+
+    def clear(self, activity_name):
+        """Remove every participant from an activity as a single change
+
+        Students on the waitlist are then promoted to the freed seats.
+        """
+        with self.lock(activity_name), self.repository.batch():
+            removed = self.repository.clear_participants(activity_name)
+            if removed:
+                self.changes.record(activity_name, "unregister_many", removed)
+                self._promote(activity_name)
+        return removed
+
+    def _promote(self, activity_name):
+        promoted = []
+        if self.repository.registration() is not None:
+            # Freed seats go to the lottery; the waitlist keeps its order
+            return promoted
+        while self.repository.seats_left(activity_name) > 0:
+            email = self.repository.pop_waitlist(activity_name)
+            if email is None:
+                break
+            try:
+                self._signup_locked(activity_name, email)
+            except StoreError:
+                # E.g. they have since signed up for a conflicting activity;
+                # they lose their place and the seat goes to the next student
+                continue
+            promoted.append(email)
+        return promoted
+
+    def join_waitlist(self, activity_name, email):
+        """Sign a student up if a seat is free, or else add them to the waitlist
+
+        Returns None if they got a seat, or else their waitlist position.
+        """
+        with self.lock(activity_name), self.repository.batch():
+            try:
+                self._signup_locked(activity_name, email)
+            except ActivityFull:
+                return self.repository.add_to_waitlist(activity_name, email)
+        return None
+
+    def leave_waitlist(self, activity_name, email):
+        """Take a student off an activity's waitlist"""
+        with self.lock(activity_name):
+            self.repository.remove_from_waitlist(activity_name, email)
+
+    def waitlist(self, activity_name):
+        """Return the emails on an activity's waitlist, in queue order"""
+        return self.repository.waitlist(activity_name)
+
+    def waitlist_position(self, activity_name, email):
+        """Return a student's 1-based waitlist position, raising NotWaitlisted if absent"""
+        return self.repository.waitlist_position(activity_name, email)
+
+    def registration(self):
+        """Return the settings of the open registration window, or None"""
+        return self.repository.registration()
+
+    def open_registration(self, picks=1, seed=None):
+        """Open a registration window, during which seats are only allocated by lottery
+
+        Students may win up to ``picks`` activities. A ``seed`` makes the draw
+        reproducible; without one, a random seed is drawn at close.
+        """
+        if not 1 <= picks <= MAX_PICKS:
+            raise InvalidQuery(f"picks must be between 1 and {MAX_PICKS}")
+        # No signup or promotion is halfway through while the window opens
+        with self._lock_all():
+            self.repository.open_registration({"picks": picks, "seed": seed})
+
+    def submit_preferences(self, email, activities):
+        """Rank a student's activities for the lottery, replacing any earlier ranking"""
+        if not activities:
+            raise InvalidPreferences("Rank at least one activity")
+        if len(activities) > MAX_PREFERENCES:
+            raise InvalidPreferences(f"Rank at most {MAX_PREFERENCES} activities")
+        if len(set(activities)) != len(activities):
+            raise InvalidPreferences()
+        for name in activities:
+            if name not in self.catalog_index.locks:
+                raise ActivityNotFound(f"Activity not found: {name}")
+        self.repository.set_preferences(email, activities)
+
+    def preferences(self, email):
+        """Return a student's ranked activities in the open window"""
+        return self.repository.preferences(email) or []
+
+    def close_registration(self):
+        """Close the registration window and allocate its seats by lottery
+
+        Runs with every activity locked and in one repository batch, so no
+        other signup can take a seat before the lottery winners get it.
+        Seats the lottery leaves free then go to the waitlists. Returns a
+        report of the draw.
+        """
+        with self._lock_all(), self.repository.batch():
+            settings, preferences = self.repository.close_registration()
+            seed = settings["seed"]
+            if seed is None:
+                seed = secrets.randbits(32)
+            counts = self.repository.enrollment_counts()
+            seats = {
+                name: summary["max_participants"] - counts.get(name, 0)
+                for name, summary in self.summaries.items()
+            }
+            held = {email: self.repository.student_activities(email) for email in preferences}
+            won = allocate(preferences, seats, picks=settings["picks"],
+                           schedules=self.schedules, held=held, seed=seed)
+
+            signups = failed = placed = 0
+            for email, names in won.items():
+                signed_up = False
+                for name in names:
+                    try:
+                        self._signup_locked(name, email)
+                    except StoreError:
+                        failed += 1
+                        continue
+                    signups += 1
+                    signed_up = True
+                placed += signed_up
+            promoted = sum(len(self._promote(name)) for name in self.summaries)
+        return {
+            "seed": seed,
+            "students": len(preferences),
+            "placed": placed,
+            "unplaced": len(preferences) - placed,
+            "signups": signups,
+            "failed": failed,
+            "promoted": promoted
+        }
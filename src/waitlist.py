@@ -0,0 +1,121 @@
+"""
+Waitlist for a full activity.
+
+A waitlist is a first-come-first-served queue of student emails. Every
+student who joins gets an increasing ticket. The queue is a deque of
+(ticket, email) pairs, and a dict maps each waiting email to its ticket, so
+leaving is a dict deletion and the deque entry is skipped lazily when it
+reaches the front.
+
+A student's position is the number of students still waiting with a ticket up
+to theirs. A Fenwick tree over the tickets counts them in O(log n), which
+stays exact however many students left from the middle of the queue.
+"""
+
+from collections import deque
+
+# Tickets the tree has room for before the first rebuild
+INITIAL_CAPACITY = 16
+
+
+class Waitlist:
+    """Ordered queue of waiting students with O(log n) positions"""
+
+    __slots__ = ("_entries", "_tickets", "_tree", "_next_ticket")
+
+    def __init__(self, emails=()):
+        self._entries = deque()
+        self._tickets = {}
+        self._tree = [0] * (INITIAL_CAPACITY + 1)
+        self._next_ticket = 0
+        for email in emails:
+            self.add(email)
+
+    def __contains__(self, email):
+        return email in self._tickets
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __iter__(self):
+        tickets = self._tickets
+        return (email for ticket, email in self._entries if tickets.get(email) == ticket)
+
+    def __repr__(self):
+        return f"Waitlist({self.to_list()!r})"
+
+    def add(self, email):
+        """Append a student, returning their position, or None if already waiting"""
+        if email in self._tickets:
+            return None
+        if self._next_ticket == len(self._tree) - 1:
+            self._rebuild()
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._tickets[email] = ticket
+        self._entries.append((ticket, email))
+        self._update(ticket, 1)
+        return self._count_through(ticket)
+
+    def discard(self, email):
+        """Remove a student if waiting, returning whether they were"""
+        ticket = self._tickets.pop(email, None)
+        if ticket is None:
+            return False
+        self._update(ticket, -1)
+        return True
+
+    def pop(self):
+        """Remove and return the student at the front, or None if nobody waits"""
+        while self._entries:
+            ticket, email = self._entries.popleft()
+            if self._tickets.get(email) == ticket:
+                del self._tickets[email]
+                self._update(ticket, -1)
+                return email
+        return None
+
+    def position(self, email):
+        """Return a student's 1-based position, or None if they aren't waiting"""
+        ticket = self._tickets.get(email)
+        if ticket is None:
+            return None
+        return self._count_through(ticket)
+
+    def to_list(self):
+        """Return the waiting students in queue order"""
+        return list(self)
+
+    def _update(self, ticket, delta):
+        tree = self._tree
+        i = ticket + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _count_through(self, ticket):
+        tree = self._tree
+        count = 0
+        i = ticket + 1
+        while i:
+            count += tree[i]
+            i -= i & -i
+        return count
+
+    def _rebuild(self):
+        # Renumber the students still waiting from 0, with room for as many
+        # again, so rebuilds cost O(1) amortized per join
+        emails = self.to_list()
+        capacity = max(INITIAL_CAPACITY, 2 * len(emails))
+        tree = [0] * (capacity + 1)
+        # Linear-time construction of a tree with a 1 for every waiting ticket
+        for i in range(1, capacity + 1):
+            if i <= len(emails):
+                tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._entries = deque(enumerate(emails))
+        self._tickets = {email: ticket for ticket, email in self._entries}
+        self._next_ticket = len(emails)
@@ -9,7 +9,22 @@ from pathlib import Path
 src_path = Path(__file__).parent.parent / "src"
 path.insert(0, str(src_path))
 
-from app import app, activities
+from app import DEFAULT_CATALOG, app, load_activities
+from catalog import read_catalog
+from store import ActivityStore
+
+# The activities of the small catalog unit tests start from; capacities and
+# rosters are up to each test
+TEST_ACTIVITIES = {
+    "Chess Club": {
+        "description": "Learn strategies and compete in chess tournaments",
+        "schedule": "Fridays, 3:30 PM - 5:00 PM"
+    },
+    "Gym Class": {
+        "description": "Physical education and sports activities",
+        "schedule": "Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM"
+    }
+}
 
 
 @pytest.fixture
@@ -19,74 +34,53 @@ def client():
 
 
 @pytest.fixture
-def reset_activities():
-    """Reset activities to initial state before each test."""
-    # Store original state
-    original_state = {
-        "Basketball Team": {
-            "description": "Join the basketball team and compete in local tournaments",
-            "schedule": "Mondays and Wednesdays, 4:00 PM - 6:00 PM",
-            "max_participants": 15,
-            "participants": []
-        },
-        "Soccer Club": {
-            "description": "Practice soccer skills and participate in matches",
-            "schedule": "Tuesdays and Thursdays, 5:00 PM - 7:00 PM",
-            "max_participants": 20,
-            "participants": []
-        },
-        "Art Club": {
-            "description": "Explore various art techniques and create projects",
-            "schedule": "Fridays, 3:00 PM - 5:00 PM",
-            "max_participants": 10,
-            "participants": []
-        },
-        "Drama Club": {
-            "description": "Participate in theater productions and improve acting skills",
-            "schedule": "Thursdays, 4:00 PM - 6:00 PM",
-            "max_participants": 25,
-            "participants": []
-        },
-        "Debate Team": {
-            "description": "Engage in debates and improve public speaking skills",
-            "schedule": "Wednesdays, 3:30 PM - 5:00 PM",
-            "max_participants": 12,
-            "participants": []
-        },
-        "Math Club": {
-            "description": "Solve challenging math problems and participate in competitions",
-            "schedule": "Tuesdays, 3:00 PM - 4:30 PM",
-            "max_participants": 15,
-            "participants": []
-        },
-        "Chess Club": {
-            "description": "Learn strategies and compete in chess tournaments",
-            "schedule": "Fridays, 3:30 PM - 5:00 PM",
-            "max_participants": 12,
-            "participants": ["michael@mergington.edu", "daniel@mergington.edu"]
-        },
-        "Programming Class": {
-            "description": "Learn programming fundamentals and build software projects",
-            "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
-            "max_participants": 20,
-            "participants": ["emma@mergington.edu", "sophia@mergington.edu"]
-        },
-        "Gym Class": {
-            "description": "Physical education and sports activities",
-            "schedule": "Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM",
-            "max_participants": 30,
-            "participants": ["john@mergington.edu", "olivia@mergington.edu"]
+def make_catalog():
+    """Return a factory for the small Chess Club and Gym Class test catalog.
+
+    It takes one capacity for both activities or a dict of capacities by
+    name, and a dict of starting rosters by name.
+    """
+    def make(max_participants=2, participants=None):
+        if not isinstance(max_participants, dict):
+            max_participants = dict.fromkeys(TEST_ACTIVITIES, max_participants)
+        participants = participants or {}
+        return {
+            name: {
+                **details,
+                "max_participants": max_participants[name],
+                "participants": list(participants.get(name, ()))
+            }
+            for name, details in TEST_ACTIVITIES.items()
         }
-    }
-    
-    # Clear current activities
-    activities.clear()
-    
-    # Restore original state
-    activities.update(original_state)
-    
+
+    return make
+
+
+@pytest.fixture
+def make_store(make_catalog):
+    """Return a factory for a store over the test catalog.
+
+    It takes the arguments of make_catalog, and passes any others on to
+    ActivityStore.
+    """
+    def make(max_participants=2, participants=None, **options):
+        return ActivityStore(make_catalog(max_participants, participants), **options)
+
+    return make
+
+
+@pytest.fixture
+def initial_activities():
+    """Return the built-in catalog the server starts with."""
+    return read_catalog(DEFAULT_CATALOG)
+
+
+@pytest.fixture
+def reset_activities(initial_activities):
+    """Reset activities to initial state before each test."""
+    load_activities(initial_activities)
+
     yield
-    
+
     # Reset after test
-    activities.clear()
-    activities.update(original_state)
+    load_activities(initial_activities)
@@ -0,0 +1,63 @@
+"""Tests for the activity record of the in-memory backends."""
+
+import pytest
+
+from activity import Activity
+from repository import MemoryRepository
+
+CHESS_CLUB = {
+    "description": "Learn strategies and compete in chess tournaments",
+    "schedule": "Fridays, 3:30 PM - 5:00 PM",
+    "max_participants": 12,
+    "participants": ["michael@mergington.edu", "daniel@mergington.edu"]
+}
+
+
+def fresh(text):
+    """Return an equal string that is a different object."""
+    return text.encode("utf-8").decode("utf-8")
+
+
+class TestActivity:
+    """Tests for the slotted activity record."""
+
+    def test_round_trip(self):
+        """Test that a record converts back to the API's dict layout."""
+        activity = Activity.from_dict(CHESS_CLUB)
+        assert activity.to_dict() == CHESS_CLUB
+        assert activity.details() == {
+            key: value for key, value in CHESS_CLUB.items() if key != "participants"
+        }
+        assert activity.seats_left() == 10
+
+    def test_has_no_instance_dict(self):
+        """Test that records only have their slots."""
+        activity = Activity.from_dict(CHESS_CLUB)
+        with pytest.raises(AttributeError):
+            activity.website = "https://example.com"
+
+    def test_interns_strings(self):
+        """Test that equal schedules and emails share one string object."""
+        first = Activity("Chess", fresh("Fridays, 3:30 PM - 5:00 PM"), 12,
+                         [fresh("a@mergington.edu")])
+        second = Activity("Go", fresh("Fridays, 3:30 PM - 5:00 PM"), 12,
+                          [fresh("a@mergington.edu")])
+        assert first.schedule is second.schedule
+        assert first.participants.to_list()[0] is second.participants.to_list()[0]
+
+
+class TestMemoryRepositoryInterning:
+    """Tests that the in-memory backend keeps one copy of each email."""
+
+    def test_signups_share_emails(self):
+        """Test that rosters and the student index hold the same email object."""
+        repository = MemoryRepository()
+        repository.load({
+            "Chess Club": CHESS_CLUB,
+            "Gym Class": {**CHESS_CLUB, "participants": []}
+        })
+        repository.add_participant(fresh("Gym Class"), fresh("michael@mergington.edu"))
+        chess = repository.get("Chess Club")["participants"][0]
+        gym = repository.get("Gym Class")["participants"][0]
+        assert chess is gym
+        assert repository.student_activities("michael@mergington.edu")[1] is repository.names()[1]
@@ -1,8 +1,13 @@
 """Tests for the Mergington High School API."""
 
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
+from app import BULK_LIMIT, load_activities
+from catalog import write_catalog
+
 
 class TestGetActivities:
     """Tests for getting the list of activities."""
@@ -43,6 +48,42 @@ class TestGetActivities:
         assert "daniel@mergington.edu" in chess_participants
 
 
+class TestActivityListing:
+    """Tests for paginating, filtering and projecting the activity list."""
+
+    def test_paginates_with_cursor(self, client, reset_activities, initial_activities):
+        """Test that following next_cursor returns every activity once."""
+        names = []
+        cursor = None
+        while True:
+            url = "/activities?limit=4" + (f"&cursor={cursor}" if cursor else "")
+            data = client.get(url).json()
+            assert len(data["activities"]) <= 4
+            names.extend(data["activities"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert names == list(initial_activities)
+
+    def test_projects_fields(self, client, reset_activities):
+        """Test that only the requested fields are returned."""
+        data = client.get("/activities?fields=seats_left,max_participants").json()
+        assert data["activities"]["Chess Club"] == {"seats_left": 10, "max_participants": 12}
+
+    def test_filters(self, client, reset_activities):
+        """Test filtering by weekday, name prefix and open seats."""
+        data = client.get("/activities?weekday=Friday&prefix=g&fields=schedule").json()
+        assert list(data["activities"]) == ["Gym Class"]
+        data = client.get("/activities?open_seats=true&fields=seats_left").json()
+        assert all(activity["seats_left"] > 0 for activity in data["activities"].values())
+
+    def test_invalid_field(self, client, reset_activities):
+        """Test that an unknown field is rejected."""
+        response = client.get("/activities?fields=emails")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown field: emails"
+
+
 class TestSignupForActivity:
     """Tests for signing up for activities."""
 
@@ -118,12 +159,16 @@ class TestSignupForActivity:
             )
             assert response.status_code == 200
         
-        # Try to sign up one more (should still work - we don't prevent overfilling)
+        # Try to sign up one more
         response = client.post(
             "/activities/Art Club/signup?email=overflow@mergington.edu"
         )
-        # Note: The current API doesn't prevent overfilling, so this will succeed
-        assert response.status_code == 200
+        assert response.status_code == 400
+        assert "full" in response.json()["detail"]
+        
+        # Verify the roster was not overfilled
+        response = client.get("/activities")
+        assert len(response.json()["Art Club"]["participants"]) == 10
 
 
 class TestUnregisterFromActivity:
@@ -195,6 +240,423 @@ class TestUnregisterFromActivity:
         assert response3.status_code == 200
 
 
+class TestExportActivities:
+    """Tests for the streaming export endpoint."""
+
+    def test_export_ndjson(self, client, reset_activities, initial_activities):
+        """Test that the default export is one activity per line."""
+        response = client.get("/activities/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert len(lines) == len(initial_activities)
+        assert [json.loads(line)["name"] for line in lines] == list(initial_activities)
+
+    def test_export_csv(self, client, reset_activities):
+        """Test that the CSV export lists one enrollment per line."""
+        response = client.get("/activities/export?format=csv")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.splitlines()
+        assert lines[:3] == [
+            "activity,email",
+            "Chess Club,michael@mergington.edu",
+            "Chess Club,daniel@mergington.edu"
+        ]
+
+    def test_export_unknown_format(self, client, reset_activities):
+        """Test that an unsupported export format is rejected."""
+        response = client.get("/activities/export?format=xml")
+        assert response.status_code == 422
+
+
+class TestActivityChanges:
+    """Tests for the incremental change feed."""
+
+    def test_changes_since_version(self, client, reset_activities):
+        """Test that only the deltas after a version are returned."""
+        response = client.get("/activities")
+        version = int(response.headers["x-activities-version"])
+        
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        client.delete("/activities/Chess Club/unregister?email=michael@mergington.edu")
+        
+        response = client.get(f"/activities/changes?since={version}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["version"] == version + 2
+        assert [(c["activity"], c["op"], c["email"]) for c in data["changes"]] == [
+            ("Chess Club", "signup", "new@mergington.edu"),
+            ("Chess Club", "unregister", "michael@mergington.edu")
+        ]
+    
+    def test_changes_up_to_date(self, client, reset_activities):
+        """Test that an up-to-date client receives no changes."""
+        version = int(client.get("/activities").headers["x-activities-version"])
+        data = client.get(f"/activities/changes?since={version}").json()
+        assert data == {"version": version, "changes": []}
+    
+    def test_unknown_version_returns_snapshot(self, client, reset_activities):
+        """Test that a version outside the log falls back to a full snapshot."""
+        data = client.get("/activities/changes?since=0").json()
+        assert "changes" not in data
+        assert data["snapshot"]["Chess Club"]["participants"] == [
+            "michael@mergington.edu", "daniel@mergington.edu"
+        ]
+
+
+class TestBulkUnregister:
+    """Tests for removing many students at once."""
+
+    def test_bulk_unregister(self, client, reset_activities):
+        """Test that listed students are removed and others are reported."""
+        version = int(client.get("/activities").headers["x-activities-version"])
+        response = client.post("/activities/Chess Club/unregister", json={
+            "emails": ["michael@mergington.edu", "nobody@mergington.edu"]
+        })
+        assert response.status_code == 200
+        assert response.json() == {
+            "removed": ["michael@mergington.edu"],
+            "not_registered": ["nobody@mergington.edu"]
+        }
+
+        response = client.get("/activities")
+        assert int(response.headers["x-activities-version"]) == version + 1
+        assert response.json()["Chess Club"]["participants"] == ["daniel@mergington.edu"]
+
+    def test_bulk_unregister_nonexistent_activity(self, client, reset_activities):
+        """Test batch unregister from an activity that doesn't exist."""
+        response = client.post("/activities/Nonexistent Activity/unregister", json={
+            "emails": ["michael@mergington.edu"]
+        })
+        assert response.status_code == 404
+
+    def test_clear_roster(self, client, reset_activities):
+        """Test that clearing a roster is a single change in the feed."""
+        version = int(client.get("/activities").headers["x-activities-version"])
+        response = client.delete("/activities/Chess Club/participants")
+        assert response.status_code == 200
+        assert response.json()["removed"] == ["michael@mergington.edu", "daniel@mergington.edu"]
+
+        data = client.get(f"/activities/changes?since={version}").json()
+        assert data["version"] == version + 1
+        assert [(c["op"], c["email"]) for c in data["changes"]] == [
+            ("unregister_many", ["michael@mergington.edu", "daniel@mergington.edu"])
+        ]
+        assert client.get("/activities").json()["Chess Club"]["participants"] == []
+
+
+class TestWaitlist:
+    """Tests for joining, leaving and being promoted from a waitlist."""
+
+    def fill(self, client, activity_name):
+        activity = client.get(f"/activities/{activity_name}").json()
+        for i in range(activity["max_participants"] - len(activity["participants"])):
+            client.post(f"/activities/{activity_name}/signup?email=filler{i}@mergington.edu")
+
+    def test_join_open_activity_signs_up(self, client, reset_activities):
+        """Test that joining while seats are free is an ordinary signup."""
+        response = client.post("/activities/Chess Club/waitlist?email=new@mergington.edu")
+        assert response.status_code == 200
+        assert response.json()["position"] is None
+        assert "new@mergington.edu" in client.get("/activities/Chess Club").json()["participants"]
+
+    def test_waitlist_and_promotion(self, client, reset_activities):
+        """Test that the first student waiting gets the next freed seat."""
+        self.fill(client, "Chess Club")
+        for i, email in enumerate(["a@mergington.edu", "b@mergington.edu"], start=1):
+            response = client.post(f"/activities/Chess Club/waitlist?email={email}")
+            assert response.json()["position"] == i
+
+        response = client.post("/activities/Chess Club/waitlist?email=a@mergington.edu")
+        assert response.status_code == 400
+
+        response = client.delete("/activities/Chess Club/unregister?email=michael@mergington.edu")
+        assert response.json()["promoted"] == "a@mergington.edu"
+        assert "a@mergington.edu" in client.get("/activities/Chess Club").json()["participants"]
+
+        response = client.get("/activities/Chess Club/waitlist?email=b@mergington.edu")
+        assert response.json() == {"email": "b@mergington.edu", "position": 1}
+        response = client.get("/activities/Chess Club/waitlist")
+        assert response.json() == {"waitlist": ["b@mergington.edu"]}
+
+    def test_leave_waitlist(self, client, reset_activities):
+        """Test leaving a waitlist, and the errors for students not on it."""
+        self.fill(client, "Chess Club")
+        client.post("/activities/Chess Club/waitlist?email=a@mergington.edu")
+        response = client.delete("/activities/Chess Club/waitlist?email=a@mergington.edu")
+        assert response.status_code == 200
+        response = client.delete("/activities/Chess Club/waitlist?email=a@mergington.edu")
+        assert response.status_code == 404
+        response = client.get("/activities/Chess Club/waitlist?email=a@mergington.edu")
+        assert response.status_code == 404
+        response = client.get("/activities/Nonexistent Activity/waitlist")
+        assert response.status_code == 404
+
+    def test_unregister_without_waitlist(self, client, reset_activities):
+        """Test that nobody is reported as promoted when nobody waits."""
+        response = client.delete("/activities/Chess Club/unregister?email=michael@mergington.edu")
+        assert "promoted" not in response.json()
+
+
+class TestRegistrationWindow:
+    """Tests for the lottery registration window."""
+
+    def test_lottery_round_trip(self, client, reset_activities):
+        """Test opening a window, ranking activities and closing it."""
+        assert client.get("/registration").json() == {"open": False}
+        response = client.post("/registration/open?picks=2&seed=5")
+        assert response.status_code == 200
+        assert client.get("/registration").json() == {"open": True, "picks": 2}
+        assert client.post("/registration/open").status_code == 409
+
+        response = client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        assert response.status_code == 409
+
+        response = client.put("/students/new@mergington.edu/preferences",
+                              json={"activities": ["Chess Club", "Math Club"]})
+        assert response.status_code == 200
+        response = client.get("/students/new@mergington.edu/preferences")
+        assert response.json()["activities"] == ["Chess Club", "Math Club"]
+
+        report = client.post("/registration/close").json()
+        assert report["seed"] == 5
+        assert report["signups"] == 2
+        assert client.get("/students/new@mergington.edu/activities").json()["activities"] == [
+            "Chess Club", "Math Club"
+        ]
+        assert client.post("/registration/close").status_code == 409
+
+    def test_preferences_need_open_window(self, client, reset_activities):
+        """Test that rankings are refused while no window is open."""
+        response = client.put("/students/new@mergington.edu/preferences",
+                              json={"activities": ["Chess Club"]})
+        assert response.status_code == 409
+
+    def test_invalid_preferences(self, client, reset_activities):
+        """Test that unknown activities and bad picks are rejected."""
+        assert client.post("/registration/open?picks=0").status_code == 422
+        client.post("/registration/open")
+        response = client.put("/students/new@mergington.edu/preferences",
+                              json={"activities": ["Unknown Club"]})
+        assert response.status_code == 404
+
+
+class TestMetrics:
+    """Tests for the Prometheus metrics endpoint."""
+
+    def test_requests_are_counted_by_route(self, client, reset_activities):
+        """Test that requests are labelled with their route template and status."""
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        client.get("/no-such-page")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert 'route="/activities/{activity_name}/signup",method="POST",status="200"' in text
+        assert 'route="/activities/{activity_name}/signup",method="POST",status="400"' in text
+        assert 'route="unmatched",method="GET",status="404"' in text
+        assert "new@mergington.edu" not in text
+
+    def test_roster_gauges(self, client, reset_activities):
+        """Test that participants and free seats are reported per activity."""
+        text = client.get("/metrics").text
+        assert 'activity_participants{activity="Chess Club"} 2' in text
+        assert 'activity_seats_left{activity="Chess Club"} 10' in text
+
+
+class TestImportEnrollments:
+    """Tests for importing enrollments from an uploaded file."""
+
+    def test_import_csv(self, client, reset_activities):
+        """Test that an uploaded CSV file is imported with a report."""
+        response = client.post(
+            "/activities/import",
+            content=(
+                b"activity,email\n"
+                b"Chess Club,a@mergington.edu\n"
+                b"Chess Club,michael@mergington.edu\n"
+            ),
+            headers={"Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["imported"] == 1
+        assert data["errors"] == [{
+            "line": 3,
+            "activity": "Chess Club",
+            "email": "michael@mergington.edu",
+            "detail": "Student already signed up for this activity"
+        }]
+        participants = client.get("/activities").json()["Chess Club"]["participants"]
+        assert "a@mergington.edu" in participants
+
+    def test_import_ndjson(self, client, reset_activities):
+        """Test that the format can be chosen with a query parameter."""
+        response = client.post(
+            "/activities/import?format=ndjson",
+            content=b'{"activity": "Gym Class", "email": "a@mergington.edu"}\n'
+        )
+        assert response.json()["imported"] == 1
+
+    def test_import_unknown_format(self, client, reset_activities):
+        """Test that an upload in an unknown format is refused."""
+        response = client.post("/activities/import?format=xml", content=b"<rows/>")
+        assert response.status_code == 400
+
+
+class TestCatalogReload:
+    """Tests for reloading the catalog file."""
+
+    def test_reload_replaces_catalog(self, client, reset_activities, tmp_path, monkeypatch):
+        """Test that the catalog file replaces every activity and roster."""
+        path = tmp_path / "catalog.json"
+        write_catalog({"Robotics Club": {
+            "description": "Build robots",
+            "schedule": "Mondays, 3:30 PM - 5:00 PM",
+            "max_participants": 8,
+            "participants": ["a@mergington.edu"]
+        }}, path)
+        monkeypatch.setenv("ACTIVITIES_CATALOG", str(path))
+        response = client.post("/catalog/reload")
+        assert response.status_code == 200
+        assert response.json() == {"activities": 1, "enrollments": 1}
+        assert list(client.get("/activities").json()) == ["Robotics Club"]
+        assert client.get("/activities/Chess Club").status_code == 404
+
+    def test_reload_builtin_catalog(self, client, reset_activities, initial_activities):
+        """Test that without ACTIVITIES_CATALOG the built-in catalog is restored."""
+        client.post("/activities/Chess Club/signup?email=a@mergington.edu")
+        response = client.post("/catalog/reload")
+        assert response.status_code == 200
+        assert client.get("/activities").json() == initial_activities
+
+    def test_unreadable_catalog_keeps_current(self, client, reset_activities, tmp_path,
+                                              monkeypatch):
+        """Test that a broken catalog file leaves the current catalog in place."""
+        path = tmp_path / "catalog.json"
+        path.write_text('{"Chess Club": {')
+        monkeypatch.setenv("ACTIVITIES_CATALOG", str(path))
+        response = client.post("/catalog/reload")
+        assert response.status_code == 500
+        assert "Chess Club" in client.get("/activities").json()
+
+
+class TestStudentActivities:
+    """Tests for looking up a student's activities."""
+
+    def test_lists_student_activities(self, client, reset_activities):
+        """Test that a student's activities are listed in signup order."""
+        client.post("/activities/Art Club/signup?email=emma@mergington.edu")
+        response = client.get("/students/emma@mergington.edu/activities")
+        assert response.status_code == 200
+        assert response.json() == {
+            "email": "emma@mergington.edu",
+            "activities": ["Programming Class", "Art Club"]
+        }
+    
+    def test_unregister_removes_activity(self, client, reset_activities):
+        """Test that unregistering drops the activity from the student's list."""
+        client.delete("/activities/Chess Club/unregister?email=michael@mergington.edu")
+        response = client.get("/students/michael@mergington.edu/activities")
+        assert response.json()["activities"] == []
+    
+    def test_unknown_student_has_no_activities(self, client, reset_activities):
+        """Test that a student with no signups gets an empty list."""
+        response = client.get("/students/new@mergington.edu/activities")
+        assert response.status_code == 200
+        assert response.json()["activities"] == []
+
+
+class TestScheduleConflicts:
+    """Tests for rejecting and reporting schedule conflicts."""
+
+    def test_signup_rejects_conflict(self, client, reset_activities):
+        """Test that signing up for an overlapping activity is rejected."""
+        # Programming Class and Math Club overlap on Tuesdays
+        response = client.post("/activities/Math Club/signup?email=emma@mergington.edu")
+        assert response.status_code == 400
+        assert "conflicts with Programming Class" in response.json()["detail"]
+    
+    def test_signup_allows_adjacent_activities(self, client, reset_activities):
+        """Test that back-to-back activities don't conflict."""
+        # Gym Class ends on Fridays when Art Club starts
+        response = client.post("/activities/Art Club/signup?email=john@mergington.edu")
+        assert response.status_code == 200
+    
+    def test_lists_student_conflicts(self, client, reset_activities, initial_activities):
+        """Test that existing conflicts of a student are reported."""
+        catalog = {name: dict(details) for name, details in initial_activities.items()}
+        catalog["Math Club"]["participants"] = ["emma@mergington.edu"]
+        load_activities(catalog)
+        
+        response = client.get("/students/emma@mergington.edu/conflicts")
+        assert response.status_code == 200
+        assert response.json()["conflicts"] == [
+            {"activities": ["Math Club", "Programming Class"], "days": ["Tuesday"]}
+        ]
+    
+    def test_no_conflicts(self, client, reset_activities):
+        """Test that a student without overlaps has no conflicts."""
+        response = client.get("/students/michael@mergington.edu/conflicts")
+        assert response.json() == {"email": "michael@mergington.edu", "conflicts": []}
+
+
+class TestBulkSignup:
+    """Tests for signing up many students in one request."""
+
+    def test_bulk_signup_successful(self, client, reset_activities):
+        """Test that every student in the batch is signed up."""
+        response = client.post("/activities/signup", json={"signups": [
+            {"activity": "Chess Club", "email": "a@mergington.edu"},
+            {"activity": "Gym Class", "email": "b@mergington.edu"}
+        ]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 0
+
+        activities = client.get("/activities").json()
+        assert "a@mergington.edu" in activities["Chess Club"]["participants"]
+        assert "b@mergington.edu" in activities["Gym Class"]["participants"]
+
+    def test_bulk_signup_reports_failures_per_item(self, client, reset_activities):
+        """Test that failed items are reported without failing the batch."""
+        response = client.post("/activities/signup", json={"signups": [
+            {"activity": "Chess Club", "email": "michael@mergington.edu"},
+            {"activity": "Unknown Club", "email": "a@mergington.edu"},
+            {"activity": "Chess Club", "email": "a@mergington.edu"}
+        ]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 1
+        assert data["failed"] == 2
+        assert [result["status_code"] for result in data["results"]] == [400, 404, 200]
+        assert data["results"][0]["detail"] == "Student already signed up for this activity"
+        assert data["results"][2]["email"] == "a@mergington.edu"
+
+    def test_bulk_signup_stops_at_capacity(self, client, reset_activities):
+        """Test that a batch larger than the free seats fills the activity exactly."""
+        response = client.post("/activities/signup", json={"signups": [
+            {"activity": "Chess Club", "email": f"student{i}@mergington.edu"}
+            for i in range(15)
+        ]})
+        data = response.json()
+        # Chess Club holds 12 and starts with 2 participants
+        assert data["succeeded"] == 10
+        assert data["failed"] == 5
+        assert all(result["detail"] == "Activity is full" for result in data["results"][10:])
+
+    def test_bulk_signup_too_large(self, client, reset_activities):
+        """Test that batches over the limit are rejected."""
+        response = client.post("/activities/signup", json={"signups": [
+            {"activity": "Chess Club", "email": f"student{i}@mergington.edu"}
+            for i in range(BULK_LIMIT + 1)
+        ]})
+        assert response.status_code == 422
+
+
 class TestIntegration:
     """Integration tests combining multiple operations."""
 
@@ -0,0 +1,147 @@
+"""Tests for the versioned response cache and conditional GET."""
+
+import json
+
+from app import activities_body, load_activities, store
+from cache import VersionedBodies, VersionedBody, etag_matches
+
+
+class TestVersionedBody:
+    """Tests for rebuilding encoded bodies only on version changes."""
+
+    def test_reuses_body_for_same_version(self):
+        """Test that the body is built once per version."""
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {"count": len(calls)}
+
+        body = VersionedBody(build)
+        assert body.get(1) is body.get(1)
+        assert len(calls) == 1
+
+    def test_rebuilds_when_version_changes(self):
+        """Test that a new version triggers a rebuild."""
+        state = {"value": "a"}
+        body = VersionedBody(lambda: dict(state))
+        assert json.loads(body.get(1)) == {"value": "a"}
+        state["value"] = "b"
+        assert json.loads(body.get(2)) == {"value": "b"}
+
+    def test_encodes_like_json_response(self):
+        """Test that bodies are compact UTF-8 JSON."""
+        body = VersionedBody(lambda: {"name": "Café", "items": [1, 2]})
+        assert body.get(1) == '{"name":"Café","items":[1,2]}'.encode("utf-8")
+
+
+class TestActivitiesCache:
+    """Tests for the cached GET /activities body."""
+
+    def test_signup_bumps_version(self, client, reset_activities):
+        """Test that a signup moves the store to a new version."""
+        version = store.version
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        assert store.version > version
+
+    def test_failed_signup_keeps_version(self, client, reset_activities):
+        """Test that a rejected signup does not invalidate the cache."""
+        version = store.version
+        client.post("/activities/Chess Club/signup?email=michael@mergington.edu")
+        assert store.version == version
+
+    def test_cached_body_reflects_signup(self, client, reset_activities):
+        """Test that GET /activities is rebuilt after a signup."""
+        client.get("/activities")
+        cached = activities_body.get(store.version)
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        response = client.get("/activities")
+        assert response.content != cached
+        assert "new@mergington.edu" in response.json()["Chess Club"]["participants"]
+        assert response.headers["content-type"] == "application/json"
+
+
+class TestActivitiesETag:
+    """Tests for conditional GET /activities."""
+
+    def test_response_has_strong_etag(self, client, reset_activities):
+        """Test that GET /activities returns a strong ETag."""
+        response = client.get("/activities")
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert not etag.startswith("W/")
+
+    def test_matching_etag_returns_304(self, client, reset_activities):
+        """Test that an unchanged state is answered with 304 and no body."""
+        etag = client.get("/activities").headers["etag"]
+        response = client.get("/activities", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_stale_etag_returns_full_body(self, client, reset_activities):
+        """Test that a changed state invalidates the client's ETag."""
+        etag = client.get("/activities").headers["etag"]
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+        response = client.get("/activities", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert "new@mergington.edu" in response.json()["Chess Club"]["participants"]
+
+    def test_etag_list_and_weak_forms_match(self):
+        """Test If-None-Match parsing of lists, weak tags and wildcards."""
+        assert etag_matches('"a", "b"', '"b"')
+        assert etag_matches('W/"b"', '"b"')
+        assert etag_matches("*", '"b"')
+        assert not etag_matches('"a"', '"b"')
+
+
+class TestActivityCache:
+    """Tests for the per-activity GET /activities/{activity_name} cache."""
+
+    def test_bodies_are_cached_per_key(self):
+        """Test that each key is rebuilt only when its own version changes."""
+        calls = []
+
+        def build(key):
+            calls.append(key)
+            return {"key": key}
+
+        bodies = VersionedBodies(build)
+        bodies.get("a", 1)
+        bodies.get("b", 1)
+        bodies.get("a", 1)
+        bodies.get("b", 2)
+        assert calls == ["a", "b", "b"]
+
+    def test_get_activity(self, client, reset_activities):
+        """Test that one activity is returned with its own ETag."""
+        response = client.get("/activities/Chess Club")
+        assert response.status_code == 200
+        assert response.json() == store.get("Chess Club")
+        assert response.headers["etag"].startswith('"')
+
+    def test_get_unknown_activity(self, client, reset_activities):
+        """Test that an unknown activity is not found."""
+        response = client.get("/activities/Nonexistent Activity")
+        assert response.status_code == 404
+
+    def test_other_activities_stay_cached(self, client, reset_activities):
+        """Test that a signup only invalidates the activity it changed."""
+        chess_etag = client.get("/activities/Chess Club").headers["etag"]
+        gym_etag = client.get("/activities/Gym Class").headers["etag"]
+
+        client.post("/activities/Chess Club/signup?email=new@mergington.edu")
+
+        response = client.get("/activities/Gym Class", headers={"If-None-Match": gym_etag})
+        assert response.status_code == 304
+        response = client.get("/activities/Chess Club", headers={"If-None-Match": chess_etag})
+        assert response.status_code == 200
+        assert "new@mergington.edu" in response.json()["participants"]
+
+    def test_reload_invalidates_every_activity(self, client, reset_activities, initial_activities):
+        """Test that reloading the catalog changes every activity's ETag."""
+        etag = client.get("/activities/Gym Class").headers["etag"]
+        load_activities(initial_activities)
+        response = client.get("/activities/Gym Class", headers={"If-None-Match": etag})
+        assert response.status_code == 200
@@ -0,0 +1,77 @@
+"""Tests for reading and writing catalog files."""
+
+import json
+
+import pytest
+
+from catalog import COMPACT_FORMAT, read_catalog, write_catalog
+
+CATALOG = {
+    "Chess Club": {
+        "description": "Learn strategies and compete in chess tournaments",
+        "schedule": "Fridays, 3:30 PM - 5:00 PM",
+        "max_participants": 12,
+        "participants": ["michael@mergington.edu", "daniel@mergington.edu"]
+    },
+    "Programming Class": {
+        "description": "Learn programming fundamentals and build software projects",
+        "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+        "max_participants": 20,
+        "participants": ["daniel@mergington.edu"]
+    }
+}
+
+
+class TestCatalogFiles:
+    """Tests for the plain and compact catalog layouts."""
+
+    def test_compact_round_trip(self, tmp_path):
+        """Test that a compact file reads back as the same catalog, in order."""
+        path = tmp_path / "catalog.json"
+        write_catalog(CATALOG, path)
+        catalog = read_catalog(path)
+        assert catalog == CATALOG
+        assert list(catalog) == list(CATALOG)
+
+    def test_compact_stores_each_student_once(self, tmp_path):
+        """Test that emails are listed once and shared by the rosters read back."""
+        path = tmp_path / "catalog.json"
+        write_catalog(CATALOG, path)
+        data = json.loads(path.read_text())
+        assert data["format"] == COMPACT_FORMAT
+        assert data["students"] == ["michael@mergington.edu", "daniel@mergington.edu"]
+        catalog = read_catalog(path)
+        assert (
+            catalog["Chess Club"]["participants"][1]
+            is catalog["Programming Class"]["participants"][0]
+        )
+
+    def test_plain_round_trip(self, tmp_path):
+        """Test that the plain layout is the API's catalog as is."""
+        path = tmp_path / "catalog.json"
+        write_catalog(CATALOG, path, compact=False)
+        assert json.loads(path.read_text()) == CATALOG
+        assert read_catalog(path) == CATALOG
+
+    def test_write_replaces_existing_file(self, tmp_path):
+        """Test that rewriting a catalog leaves no temporary file behind."""
+        path = tmp_path / "catalog.json"
+        write_catalog(CATALOG, path)
+        write_catalog({"Chess Club": CATALOG["Chess Club"]}, path)
+        assert list(read_catalog(path)) == ["Chess Club"]
+        assert [entry.name for entry in tmp_path.iterdir()] == ["catalog.json"]
+
+    def test_rejects_malformed_files(self, tmp_path):
+        """Test that files which aren't catalogs raise ValueError."""
+        path = tmp_path / "catalog.json"
+        for data in (
+            [],
+            {"Chess Club": {"description": "Chess"}},
+            {"format": COMPACT_FORMAT, "students": [], "activities": [{"name": "Chess Club"}]}
+        ):
+            path.write_text(json.dumps(data))
+            with pytest.raises(ValueError):
+                read_catalog(path)
+        path.write_text("{")
+        with pytest.raises(ValueError):
+            read_catalog(path)
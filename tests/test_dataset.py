@@ -0,0 +1,53 @@
+"""Tests for the synthetic catalog generator."""
+
+from collections import defaultdict
+
+from catalog import read_catalog
+from dataset import MAX_ACTIVITIES_PER_STUDENT, generate_catalog, main
+from schedule import parse_schedule, schedules_overlap
+
+
+class TestGenerateCatalog:
+    """Tests for generated catalogs."""
+
+    def test_same_seed_same_catalog(self):
+        """Test that a seed makes the catalog reproducible."""
+        first = generate_catalog(3000, seed=7)
+        assert generate_catalog(3000, seed=7) == first
+        assert generate_catalog(3000, seed=8) != first
+
+    def test_enrollments_near_target(self):
+        """Test that the rosters add up to about the requested enrollments."""
+        catalog = generate_catalog(5000, seed=1)
+        enrolled = sum(len(details["participants"]) for details in catalog.values())
+        assert 0.9 * 5000 <= enrolled <= 5000
+
+    def test_rosters_are_valid(self):
+        """Test capacities, schedules and that no student has a conflict."""
+        catalog = generate_catalog(5000, seed=1)
+        held = defaultdict(list)
+        for details in catalog.values():
+            participants = details["participants"]
+            assert len(participants) <= details["max_participants"]
+            assert len(set(participants)) == len(participants)
+            intervals = parse_schedule(details["schedule"])
+            assert intervals
+            for email in participants:
+                held[email].append(intervals)
+        for schedules in held.values():
+            assert len(schedules) <= MAX_ACTIVITIES_PER_STUDENT
+            for i, first in enumerate(schedules):
+                assert not any(schedules_overlap(first, second) for second in schedules[i + 1:])
+
+    def test_explicit_sizes(self):
+        """Test that student and activity counts can be given."""
+        catalog = generate_catalog(500, students=100, activities=50, seed=1)
+        assert len(catalog) == 50
+        students = {email for details in catalog.values() for email in details["participants"]}
+        assert len(students) <= 100
+
+    def test_command_writes_compact_catalog(self, tmp_path):
+        """Test that the command line writes a catalog the app can read."""
+        path = tmp_path / "catalog.json"
+        assert main([str(path), "--enrollments", "1000", "--seed", "3"]) == 0
+        assert read_catalog(path) == generate_catalog(1000, seed=3)
@@ -0,0 +1,220 @@
+"""Tests for the Server-Sent Events broadcaster."""
+
+import asyncio
+import json
+
+from app import roster_hub
+from events import Broadcaster
+
+
+def add_broadcaster(store):
+    broadcaster = Broadcaster(queue_size=4)
+    store.add_listener(broadcaster.publish)
+    return broadcaster
+
+
+def parse_event(message):
+    fields = dict(line.split(": ", 1) for line in message.decode("utf-8").strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+class TestBroadcaster:
+    """Tests for streaming roster changes to SSE clients."""
+
+    def test_replays_changes_since_version(self, make_store):
+        """Test that a reconnecting client receives the changes it missed."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+        version = store.version
+        store.signup("Chess Club", "a@mergington.edu")
+
+        async def first_message():
+            stream = broadcaster.stream(store, since=version)
+            message = await anext(stream)
+            await stream.aclose()
+            return message
+
+        event, data = parse_event(asyncio.run(first_message()))
+        assert event == "change"
+        assert data["email"] == "a@mergington.edu"
+        assert data["version"] == version + 1
+
+    def test_replay_reads_off_the_event_loop(self, make_store):
+        """Test that the change log is read in the threadpool, not on the loop."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+        changes_since = store.changes_since
+        loops = []
+
+        def record_loop(version):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return changes_since(version)
+
+        store.changes_since = record_loop
+
+        async def first_message():
+            stream = broadcaster.stream(store)
+            message = await anext(stream)
+            await stream.aclose()
+            return message
+
+        assert asyncio.run(first_message()) == b": connected\n\n"
+        assert loops == [None]
+
+    def test_resync_when_version_evicted(self, make_store):
+        """Test that a client outside the change log is told to resync."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+
+        async def first_message():
+            stream = broadcaster.stream(store, since=0)
+            message = await anext(stream)
+            await stream.aclose()
+            return message
+
+        event, data = parse_event(asyncio.run(first_message()))
+        assert event == "resync"
+        assert data["version"] == store.version
+
+    def test_pushes_live_changes_from_threads(self, make_store):
+        """Test that a signup in a worker thread reaches a connected client."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+
+        async def live_message():
+            stream = broadcaster.stream(store)
+            assert await anext(stream) == b": connected\n\n"
+            await asyncio.to_thread(store.signup, "Chess Club", "a@mergington.edu")
+            message = await asyncio.wait_for(anext(stream), 5)
+            await stream.aclose()
+            return message
+
+        event, data = parse_event(asyncio.run(live_message()))
+        assert event == "change"
+        assert data == {
+            "version": store.version,
+            "activity": "Chess Club",
+            "op": "signup",
+            "email": "a@mergington.edu"
+        }
+        assert broadcaster.subscriber_count == 0
+
+    def test_reload_sends_resync(self, make_store):
+        """Test that a connected client is told to resync when the catalog is reloaded."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+
+        async def live_message():
+            stream = broadcaster.stream(store)
+            await anext(stream)
+            await asyncio.to_thread(store.load, store.snapshot())
+            message = await asyncio.wait_for(anext(stream), 5)
+            await stream.aclose()
+            return message
+
+        event, data = parse_event(asyncio.run(live_message()))
+        assert event == "resync"
+        assert data == {"version": store.version}
+
+    def test_drops_slow_consumer(self, make_store):
+        """Test that a client whose queue overflows is disconnected."""
+        store = make_store(12)
+        broadcaster = add_broadcaster(store)
+
+        async def overflow():
+            stream = broadcaster.stream(store)
+            await anext(stream)
+            for i in range(5):
+                await asyncio.to_thread(store.signup, "Chess Club", f"s{i}@mergington.edu")
+            await asyncio.sleep(0)
+            return [message async for message in stream]
+
+        assert asyncio.run(overflow()) == []
+        assert broadcaster.subscriber_count == 0
+
+
+class TestRosterHub:
+    """Tests for the per-activity WebSocket channel."""
+
+    def test_subscribe_sends_snapshot(self, client, reset_activities):
+        """Test that subscribing returns the activity's roster and seats."""
+        with client.websocket_connect("/activities/live") as websocket:
+            websocket.send_json({"subscribe": ["Chess Club"]})
+            message = websocket.receive_json()
+        assert message["type"] == "snapshot"
+        assert message["participants"] == ["michael@mergington.edu", "daniel@mergington.edu"]
+        assert message["seats_left"] == 10
+
+    def test_unknown_activity_reports_error(self, client, reset_activities):
+        """Test that subscribing to a missing activity is reported."""
+        with client.websocket_connect("/activities/live") as websocket:
+            websocket.send_json({"subscribe": ["Nonexistent Activity"]})
+            message = websocket.receive_json()
+        assert message == {
+            "type": "error",
+            "activity": "Nonexistent Activity",
+            "detail": "Activity not found"
+        }
+
+    def test_malformed_messages_report_errors(self, client, reset_activities):
+        """Test that invalid messages are answered with errors and subscribe to nothing."""
+        with client.websocket_connect("/activities/live") as websocket:
+            websocket.send_text("not json")
+            assert websocket.receive_json() == {"type": "error", "detail": "Messages must be JSON"}
+            websocket.send_json(["Chess Club"])
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"subscribe": "Chess Club"})
+            assert websocket.receive_json() == {
+                "type": "error", "detail": "subscribe must be a list of activity names"
+            }
+            websocket.send_json({"subscribe": [["Chess Club"]]})
+            assert websocket.receive_json()["type"] == "error"
+            websocket.send_json({"subscribe": ["Chess Club"]})
+            message = websocket.receive_json()
+        assert message["type"] == "snapshot"
+        assert roster_hub.subscriber_count("C") == 0
+
+    def test_only_subscribed_activities_are_sent(self, client, reset_activities):
+        """Test that deltas arrive only for subscribed activities."""
+        with client.websocket_connect("/activities/live") as websocket:
+            websocket.send_json({"subscribe": ["Chess Club"]})
+            websocket.receive_json()
+            client.post("/activities/Gym Class/signup?email=gym@mergington.edu")
+            client.post("/activities/Chess Club/signup?email=chess@mergington.edu")
+            message = websocket.receive_json()
+        assert message["type"] == "delta"
+        assert message["activity"] == "Chess Club"
+        assert [(c["op"], c["email"]) for c in message["changes"]] == [
+            ("signup", "chess@mergington.edu")
+        ]
+        assert message["seats_left"] == 9
+
+    def test_burst_is_batched(self, client, reset_activities):
+        """Test that changes within one batch window share a message."""
+        roster_hub.batch_interval = 0.2
+        try:
+            with client.websocket_connect("/activities/live") as websocket:
+                websocket.send_json({"subscribe": ["Art Club"]})
+                websocket.receive_json()
+                for i in range(3):
+                    client.post(f"/activities/Art Club/signup?email=s{i}@mergington.edu")
+                message = websocket.receive_json()
+        finally:
+            roster_hub.batch_interval = 0.005
+        assert len(message["changes"]) == 3
+        assert message["seats_left"] == 7
+
+    def test_reload_sends_fresh_snapshots(self, client, reset_activities):
+        """Test that subscribers get a new snapshot after the catalog is reloaded."""
+        client.post("/activities/Chess Club/signup?email=chess@mergington.edu")
+        with client.websocket_connect("/activities/live") as websocket:
+            websocket.send_json({"subscribe": ["Chess Club"]})
+            assert len(websocket.receive_json()["participants"]) == 3
+            client.post("/catalog/reload")
+            message = websocket.receive_json()
+        assert message["type"] == "snapshot"
+        assert message["participants"] == ["michael@mergington.edu", "daniel@mergington.edu"]
+        assert message["version"] == int(client.get("/activities").headers["X-Activities-Version"])
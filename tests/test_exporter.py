@@ -0,0 +1,69 @@
+"""Tests for the streaming export."""
+
+import json
+
+import pytest
+
+from exporter import export_lines
+from importer import RosterImport
+from store import ActivityStore
+
+
+@pytest.fixture
+def store(make_catalog):
+    """Create a store with a name that needs quoting between two others."""
+    catalog = make_catalog(10, {"Chess Club": ["a@mergington.edu", "b@mergington.edu"]})
+    return ActivityStore({
+        "Chess Club": catalog["Chess Club"],
+        'Debate, "Advanced"': {
+            "description": "Debate",
+            "schedule": "Mondays, 2:00 PM - 3:00 PM",
+            "max_participants": 10,
+            "participants": ["c@mergington.edu"]
+        },
+        "Gym Class": catalog["Gym Class"]
+    })
+
+
+class TestExport:
+    """Tests for NDJSON and CSV exports."""
+
+    def test_ndjson_has_one_activity_per_line(self, store):
+        """Test that each line is one activity with its participants."""
+        lines = b"".join(export_lines(store, "ndjson")).splitlines()
+        activities = [json.loads(line) for line in lines]
+        assert [activity["name"] for activity in activities] == [
+            "Chess Club", 'Debate, "Advanced"', "Gym Class"
+        ]
+        assert activities[0]["participants"] == ["a@mergington.edu", "b@mergington.edu"]
+        assert activities[0]["max_participants"] == 10
+
+    def test_csv_has_one_enrollment_per_line(self, store):
+        """Test that CSV rows are enrollments, quoted where needed."""
+        data = b"".join(export_lines(store, "csv")).decode("utf-8")
+        assert data.splitlines() == [
+            "activity,email",
+            "Chess Club,a@mergington.edu",
+            "Chess Club,b@mergington.edu",
+            '"Debate, ""Advanced""",c@mergington.edu'
+        ]
+
+    def test_csv_export_can_be_imported(self, store):
+        """Test that an exported CSV imports into an empty copy of the catalog."""
+        target = ActivityStore({
+            name: {**details, "participants": []}
+            for name, details in store.snapshot().items()
+        })
+        roster_import = RosterImport(target, "csv")
+        for chunk in export_lines(store, "csv"):
+            roster_import.feed(chunk)
+        assert roster_import.finish()["imported"] == 3
+        assert target.snapshot() == store.snapshot()
+
+    def test_export_is_lazy(self, store):
+        """Test that changes made after the export started can still show up."""
+        chunks = export_lines(store, "ndjson")
+        next(chunks)
+        store.signup("Gym Class", "late@mergington.edu")
+        last = json.loads(list(chunks)[-1])
+        assert last["participants"] == ["late@mergington.edu"]
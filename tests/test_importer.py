@@ -0,0 +1,97 @@
+"""Tests for the streaming enrollment import."""
+
+import pytest
+
+from errors import InvalidImport
+from importer import RosterImport, import_format
+
+
+def run_import(store, data, file_format="csv", block_size=7, **options):
+    """Feed the data in small blocks, so rows are split across them."""
+    roster_import = RosterImport(store, file_format, **options)
+    for start in range(0, len(data), block_size):
+        roster_import.feed(data[start:start + block_size])
+    return roster_import.finish()
+
+
+class TestRosterImport:
+    """Tests for parsing, validating and importing rows."""
+
+    def test_imports_csv(self, make_store):
+        """Test that CSV rows are signed up in file order."""
+        store = make_store(100)
+        report = run_import(store, (
+            b"email,activity\r\n"
+            b"a@mergington.edu,Chess Club\r\n"
+            b'b@mergington.edu,"Gym Class"\r\n'
+            b"c@mergington.edu,Chess Club"
+        ))
+        assert report == {"rows": 3, "imported": 3, "failed": 0, "errors": []}
+        assert store.get("Chess Club")["participants"] == ["a@mergington.edu", "c@mergington.edu"]
+        assert store.get("Gym Class")["participants"] == ["b@mergington.edu"]
+
+    def test_imports_ndjson(self, make_store):
+        """Test that NDJSON rows are signed up and blank lines skipped."""
+        store = make_store(100)
+        report = run_import(store, (
+            b'{"activity": "Chess Club", "email": "a@mergington.edu"}\n'
+            b"\n"
+            b'{"activity": "Gym Class", "email": "b@mergington.edu"}\n'
+        ), file_format="ndjson")
+        assert report["imported"] == 2
+        assert store.get("Gym Class")["participants"] == ["b@mergington.edu"]
+
+    def test_reports_errors_per_row(self, make_store):
+        """Test that invalid and rejected rows are reported with their line."""
+        store = make_store(1)
+        report = run_import(store, (
+            b"activity,email\n"
+            b"Chess Club,a@mergington.edu\n"
+            b"Chess Club,not-an-email\n"
+            b"Unknown Club,b@mergington.edu\n"
+            b"Chess Club\n"
+            b"Chess Club,c@mergington.edu\n"
+        ))
+        assert report["imported"] == 1
+        assert report["failed"] == 4
+        assert [(error["line"], error["detail"]) for error in report["errors"]] == [
+            (3, "Email is not valid"),
+            (4, "Activity not found"),
+            (5, "Row has too few columns"),
+            (6, "Activity is full")
+        ]
+
+    def test_reported_errors_are_capped(self, make_store):
+        """Test that only the first rejected rows are listed."""
+        store = make_store(100)
+        data = b"activity,email\n" + b"Chess Club,bad\n" * 50
+        report = run_import(store, data, block_size=64, max_errors=10)
+        assert report["failed"] == 50
+        assert len(report["errors"]) == 10
+
+    def test_imports_in_chunks(self, make_store):
+        """Test that rows are handed to the store before the file ends."""
+        store = make_store(100)
+        roster_import = RosterImport(store, chunk_size=2)
+        roster_import.feed(b"activity,email\nChess Club,a@mergington.edu\n")
+        assert store.get("Chess Club")["participants"] == []
+        roster_import.feed(b"Chess Club,b@mergington.edu\n")
+        assert len(store.get("Chess Club")["participants"]) == 2
+
+    def test_requires_csv_header(self, make_store):
+        """Test that a CSV file without the needed columns is refused."""
+        with pytest.raises(InvalidImport):
+            run_import(make_store(100), b"name,address\nChess Club,a@mergington.edu\n")
+
+    def test_rejects_overlong_line(self, make_store):
+        """Test that a line without an end is not buffered forever."""
+        roster_import = RosterImport(make_store(100))
+        with pytest.raises(InvalidImport):
+            roster_import.feed(b"x" * (1024 * 1024))
+
+    def test_format_from_content_type(self):
+        """Test that the format falls back to the Content-Type."""
+        assert import_format(None, "application/x-ndjson; charset=utf-8") == "ndjson"
+        assert import_format("csv", "application/x-ndjson") == "csv"
+        with pytest.raises(InvalidImport):
+            import_format(None, "application/json")
@@ -0,0 +1,212 @@
+"""Tests for the journaled in-memory backend."""
+
+import threading
+import time
+
+import pytest
+
+from errors import ActivityFull
+from journal import JournaledRepository
+
+
+@pytest.fixture
+def catalog(make_catalog):
+    """Return the test catalog, with one seat left in Chess Club."""
+    return make_catalog(
+        {"Chess Club": 2, "Gym Class": 100}, {"Chess Club": ["michael@mergington.edu"]}
+    )
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestJournaledRepository:
+    """Tests for journal replay, snapshots and fsync policies."""
+
+    @pytest.mark.parametrize("fsync", ["always", "batch", "interval", "off"])
+    def test_recovers_after_restart(self, tmp_path, fsync, catalog):
+        """Test that journaled changes are replayed on startup."""
+        repository = JournaledRepository(tmp_path, fsync=fsync)
+        repository.load(catalog)
+        repository.add_participant("Gym Class", "a@mergington.edu")
+        repository.add_participant("Gym Class", "b@mergington.edu")
+        repository.remove_participant("Chess Club", "michael@mergington.edu")
+        repository.close()
+
+        recovered = JournaledRepository(tmp_path, fsync=fsync)
+        assert recovered.get("Gym Class")["participants"] == [
+            "a@mergington.edu", "b@mergington.edu"
+        ]
+        assert recovered.get("Chess Club")["participants"] == []
+        assert recovered.student_activities("a@mergington.edu") == ["Gym Class"]
+        assert recovered.student_activities("michael@mergington.edu") == []
+
+    def test_recovers_batch_removal(self, tmp_path, catalog):
+        """Test that a batch removal is replayed from a single record."""
+        repository = JournaledRepository(tmp_path)
+        repository.load(catalog)
+        repository.add_participant("Gym Class", "a@mergington.edu")
+        repository.add_participant("Gym Class", "b@mergington.edu")
+        repository.remove_participants("Gym Class", ["a@mergington.edu", "c@mergington.edu"])
+        repository.clear_participants("Chess Club")
+        repository.close()
+
+        recovered = JournaledRepository(tmp_path)
+        assert recovered.get("Gym Class")["participants"] == ["b@mergington.edu"]
+        assert recovered.get("Chess Club")["participants"] == []
+
+    def test_recovers_waitlists(self, tmp_path, catalog):
+        """Test that waitlists are replayed from the journal and the snapshot."""
+        repository = JournaledRepository(tmp_path)
+        repository.load(catalog)
+        for email in ["a@mergington.edu", "b@mergington.edu", "c@mergington.edu"]:
+            repository.add_to_waitlist("Chess Club", email)
+        repository.compact()
+        repository.remove_from_waitlist("Chess Club", "b@mergington.edu")
+        assert repository.pop_waitlist("Chess Club") == "a@mergington.edu"
+        repository.add_to_waitlist("Chess Club", "d@mergington.edu")
+        repository.close()
+
+        recovered = JournaledRepository(tmp_path)
+        assert recovered.waitlist("Chess Club") == ["c@mergington.edu", "d@mergington.edu"]
+
+    def test_recovers_registration_window(self, tmp_path, catalog):
+        """Test that an open window and its preferences survive a restart and compaction."""
+        repository = JournaledRepository(tmp_path)
+        repository.load(catalog)
+        repository.open_registration({"picks": 2, "seed": None})
+        repository.set_preferences("a@mergington.edu", ["Chess Club"])
+        repository.compact()
+        repository.set_preferences("b@mergington.edu", ["Gym Class", "Chess Club"])
+        repository.close()
+
+        recovered = JournaledRepository(tmp_path)
+        assert recovered.registration() == {"picks": 2, "seed": None}
+        assert recovered.close_registration()[1] == {
+            "a@mergington.edu": ["Chess Club"],
+            "b@mergington.edu": ["Gym Class", "Chess Club"]
+        }
+        recovered.close()
+        assert JournaledRepository(tmp_path).registration() is None
+
+    def test_rejected_signup_is_not_journaled(self, tmp_path, catalog):
+        """Test that a failed signup leaves no record behind."""
+        repository = JournaledRepository(tmp_path)
+        repository.load(catalog)
+        repository.add_participant("Chess Club", "a@mergington.edu")
+        with pytest.raises(ActivityFull):
+            repository.add_participant("Chess Club", "b@mergington.edu")
+        repository.close()
+
+        assert JournaledRepository(tmp_path).get("Chess Club")["participants"] == [
+            "michael@mergington.edu", "a@mergington.edu"
+        ]
+
+    def test_snapshot_compacts_journal(self, tmp_path, catalog):
+        """Test that a snapshot replaces the journal written before it."""
+        repository = JournaledRepository(tmp_path, snapshot_every=1000)
+        repository.load(catalog)
+        for i in range(10):
+            repository.add_participant("Gym Class", f"s{i}@mergington.edu")
+        repository.compact()
+        repository.add_participant("Gym Class", "late@mergington.edu")
+        repository.close()
+
+        assert len(list(tmp_path.glob("snapshot-*.json"))) == 1
+        assert len(list(tmp_path.glob("journal-*.log"))) == 1
+        recovered = JournaledRepository(tmp_path)
+        assert len(recovered.get("Gym Class")["participants"]) == 11
+
+    def test_ignores_torn_final_record(self, tmp_path, catalog):
+        """Test that a partially written last line is skipped on replay."""
+        repository = JournaledRepository(tmp_path)
+        repository.load(catalog)
+        repository.add_participant("Gym Class", "a@mergington.edu")
+        repository.close()
+        segment = sorted(tmp_path.glob("journal-*.log"))[-1]
+        with open(segment, "ab") as journal:
+            journal.write(b'{"op":"signup","activity":"Gym')
+
+        recovered = JournaledRepository(tmp_path)
+        assert recovered.get("Gym Class")["participants"] == ["a@mergington.edu"]
+
+    def test_group_commit_under_concurrency(self, tmp_path, catalog):
+        """Test that concurrent batched writes are all durable."""
+        repository = JournaledRepository(tmp_path, fsync="batch", snapshot_every=50)
+        repository.load(catalog)
+
+        def signups(thread):
+            for i in range(25):
+                repository.add_participant("Gym Class", f"t{thread}-{i}@mergington.edu")
+
+        threads = [threading.Thread(target=signups, args=(t,)) for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        repository.compact()
+        repository.close()
+
+        assert len(JournaledRepository(tmp_path).get("Gym Class")["participants"]) == 100
+
+    def test_interval_policy_syncs_after_interval(self, tmp_path, catalog):
+        """Test that a lone write is fsynced once the interval has passed."""
+        repository = JournaledRepository(tmp_path, fsync="interval", fsync_interval=0.05)
+        repository.load(catalog)
+        repository.add_participant("Gym Class", "a@mergington.edu")
+        wait_until(lambda: repository._synced == repository._written)
+        repository.close()
+
+    def test_failed_compaction_is_retried(self, tmp_path, monkeypatch, catalog):
+        """Test that a background compaction that fails runs again on a later record."""
+        repository = JournaledRepository(tmp_path, snapshot_every=2)
+        repository.load(catalog)
+        snapshot = repository.snapshot
+        failures = [OSError("No space left on device")]
+
+        def failing_snapshot():
+            if failures:
+                raise failures.pop()
+            return snapshot()
+
+        monkeypatch.setattr(repository, "snapshot", failing_snapshot)
+        loaded = sorted(tmp_path.glob("snapshot-*.json"))
+        repository.add_participant("Gym Class", "a@mergington.edu")
+        repository.add_participant("Gym Class", "b@mergington.edu")
+        wait_until(lambda: not failures and not repository._compacting)
+        assert sorted(tmp_path.glob("snapshot-*.json")) == loaded
+
+        repository.add_participant("Gym Class", "c@mergington.edu")
+        wait_until(lambda: sorted(tmp_path.glob("snapshot-*.json")) != loaded)
+        wait_until(lambda: not repository._compacting)
+        repository.close()
+        assert len(JournaledRepository(tmp_path).get("Gym Class")["participants"]) == 3
+
+    @pytest.mark.filterwarnings("error::pytest.PytestUnhandledThreadExceptionWarning")
+    def test_compaction_during_waitlist_changes(self, tmp_path, catalog):
+        """Test that background compactions copy waitlists while they change."""
+        repository = JournaledRepository(tmp_path, fsync="off", snapshot_every=10)
+        repository.load(catalog)
+
+        def joins(thread):
+            for i in range(100):
+                repository.add_to_waitlist("Chess Club", f"t{thread}-{i}@mergington.edu")
+
+        threads = [threading.Thread(target=joins, args=(t,)) for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wait_until(lambda: not repository._compacting)
+        repository.close()
+
+        assert len(JournaledRepository(tmp_path).waitlist("Chess Club")) == 400
+
+    def test_rejects_unknown_fsync_policy(self, tmp_path):
+        """Test that an invalid fsync policy is reported."""
+        with pytest.raises(ValueError):
+            JournaledRepository(tmp_path, fsync="sometimes")
@@ -0,0 +1,58 @@
+"""Tests for the lottery seat allocation."""
+
+from lottery import allocate
+from schedule import parse_schedule
+
+
+class TestAllocate:
+    """Tests for random serial dictatorship."""
+
+    def test_everyone_gets_first_choice_when_seats_suffice(self):
+        """Test that uncontested preferences are all granted."""
+        won = allocate(
+            {"a@mergington.edu": ["Chess Club", "Gym Class"], "b@mergington.edu": ["Gym Class"]},
+            {"Chess Club": 1, "Gym Class": 1}
+        )
+        assert won == {"a@mergington.edu": ["Chess Club"], "b@mergington.edu": ["Gym Class"]}
+
+    def test_seats_are_never_oversubscribed(self):
+        """Test that a popular activity fills and the rest fall through to later choices."""
+        preferences = {f"{i}@mergington.edu": ["Chess Club", "Gym Class"] for i in range(10)}
+        won = allocate(preferences, {"Chess Club": 3, "Gym Class": 4}, seed=1)
+        assert sum(names == ["Chess Club"] for names in won.values()) == 3
+        assert sum(names == ["Gym Class"] for names in won.values()) == 4
+        assert len(won) == 7
+
+    def test_same_seed_same_draw(self):
+        """Test that a seed makes the draw reproducible, whatever the submission order."""
+        preferences = {f"{i}@mergington.edu": ["Chess Club"] for i in range(50)}
+        reordered = dict(reversed(list(preferences.items())))
+        first = allocate(preferences, {"Chess Club": 5}, seed=42)
+        assert allocate(reordered, {"Chess Club": 5}, seed=42) == first
+        assert allocate(preferences, {"Chess Club": 5}, seed=43) != first
+
+    def test_picks_are_made_in_rounds(self):
+        """Test that nobody gets a second activity before everyone had a first."""
+        preferences = {
+            "a@mergington.edu": ["Chess Club", "Gym Class"],
+            "b@mergington.edu": ["Chess Club", "Gym Class"]
+        }
+        won = allocate(preferences, {"Chess Club": 1, "Gym Class": 1}, picks=2)
+        assert sorted(won.values()) == [["Chess Club"], ["Gym Class"]]
+        won = allocate(preferences, {"Chess Club": 2, "Gym Class": 2}, picks=2)
+        assert all(names == ["Chess Club", "Gym Class"] for names in won.values())
+
+    def test_skips_held_and_conflicting_activities(self):
+        """Test that students only win activities they can attend."""
+        won = allocate(
+            {"a@mergington.edu": ["Chess Club", "Drama Club", "Gym Class"]},
+            {"Chess Club": 5, "Drama Club": 5, "Gym Class": 5},
+            picks=3,
+            schedules={
+                "Drama Club": parse_schedule("Fridays, 4:00 PM - 5:00 PM"),
+                "Art Club": parse_schedule("Fridays, 3:00 PM - 4:30 PM"),
+                "Gym Class": parse_schedule("Mondays, 4:00 PM - 5:00 PM")
+            },
+            held={"a@mergington.edu": ["Chess Club", "Art Club"]}
+        )
+        assert won == {"a@mergington.edu": ["Gym Class"]}
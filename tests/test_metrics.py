@@ -0,0 +1,56 @@
+"""Tests for request metrics and their text exposition."""
+
+import threading
+
+from metrics import RequestMetrics, render_gauge
+
+
+class TestRequestMetrics:
+    """Tests for recording and rendering request histograms."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that each bucket counts every request up to its bound."""
+        metrics = RequestMetrics(buckets=(0.01, 0.1))
+        for seconds in (0.005, 0.01, 0.05, 2.0):
+            metrics.observe("GET", "/activities", 200, seconds)
+        text = metrics.render()
+        labels = 'route="/activities",method="GET",status="200"'
+        assert f"http_requests_total{{{labels}}} 4" in text
+        assert f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 2' in text
+        assert f'http_request_duration_seconds_bucket{{{labels},le="0.1"}} 3' in text
+        assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in text
+        assert f"http_request_duration_seconds_count{{{labels}}} 4" in text
+        assert f"http_request_duration_seconds_sum{{{labels}}} 2.065" in text
+
+    def test_threads_are_merged(self):
+        """Test that every thread's shard is added up when scraped."""
+        metrics = RequestMetrics()
+
+        def record():
+            for _ in range(1000):
+                metrics.observe("POST", "/activities/{activity_name}/signup", 400, 0.001)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        totals = metrics.totals()
+        series = totals[("POST", "/activities/{activity_name}/signup", 400)]
+        assert sum(series[:-1]) == 4000
+
+    def test_separate_series_per_status(self):
+        """Test that status codes are labelled separately."""
+        metrics = RequestMetrics()
+        metrics.observe("GET", "/activities", 200, 0.001)
+        metrics.observe("GET", "/activities", 304, 0.001)
+        assert set(metrics.totals()) == {("GET", "/activities", 200), ("GET", "/activities", 304)}
+
+    def test_gauge_escapes_labels(self):
+        """Test that label values are escaped for the text format."""
+        text = render_gauge("activity_seats_left", "Seats", "activity", {'Say "Hi"\\Club': 3})
+        assert text == (
+            "# HELP activity_seats_left Seats\n"
+            "# TYPE activity_seats_left gauge\n"
+            'activity_seats_left{activity="Say \\"Hi\\"\\\\Club"} 3\n'
+        )
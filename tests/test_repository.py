@@ -0,0 +1,464 @@
+"""Tests shared by every storage backend."""
+
+import multiprocessing
+import queue
+import threading
+import time
+
+import pytest
+
+import repository as repository_module
+from changes import RESYNC
+from errors import (
+    ActivityFull, ActivityNotFound, AlreadySignedUp, AlreadyWaitlisted, NotRegistered,
+    NotWaitlisted, RegistrationClosed, RegistrationOpen, ScheduleConflict, SignupsByLottery
+)
+from journal import JournaledRepository
+from repository import MemoryRepository, SQLiteRepository
+from store import ActivityStore
+
+
+@pytest.fixture
+def catalog(make_catalog):
+    """Return the test catalog, with one seat left in Chess Club."""
+    return make_catalog(
+        {"Chess Club": 3, "Gym Class": 30},
+        {"Chess Club": ["michael@mergington.edu", "daniel@mergington.edu"]}
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite", "journal"])
+def repository(request, tmp_path, catalog):
+    """Create each storage backend loaded with the test catalog."""
+    if request.param == "memory":
+        repository = MemoryRepository()
+    elif request.param == "sqlite":
+        repository = SQLiteRepository(tmp_path / "activities.db")
+    else:
+        repository = JournaledRepository(tmp_path / "journal")
+    repository.load(catalog)
+    yield repository
+    if request.param != "memory":
+        repository.close()
+
+
+class TestRepository:
+    """Tests for the storage backend contract."""
+
+    def test_snapshot_matches_catalog(self, repository, catalog):
+        """Test that a loaded catalog reads back unchanged and in order."""
+        assert repository.snapshot() == catalog
+        assert list(repository.snapshot()) == ["Chess Club", "Gym Class"]
+        assert repository.names() == ["Chess Club", "Gym Class"]
+
+    def test_details_leave_out_rosters(self, repository, catalog):
+        """Test that details are the catalog without participants, in order."""
+        assert repository.details() == {
+            name: {key: value for key, value in details.items() if key != "participants"}
+            for name, details in catalog.items()
+        }
+
+    def test_seed_reads_catalog_only_when_empty(self, repository, catalog):
+        """Test that a catalog function is not called for a seeded backend."""
+        def unreadable():
+            raise AssertionError("catalog read")
+
+        assert repository.seed(unreadable) is False
+        repository.load({})
+        assert repository.seed(lambda: catalog) is True
+        assert repository.snapshot() == catalog
+
+    def test_add_keeps_signup_order(self, repository):
+        """Test that new participants are appended to the roster."""
+        repository.add_participant("Chess Club", "new@mergington.edu")
+        assert repository.get("Chess Club")["participants"] == [
+            "michael@mergington.edu", "daniel@mergington.edu", "new@mergington.edu"
+        ]
+        assert repository.seats_left("Chess Club") == 0
+
+    def test_add_errors(self, repository):
+        """Test duplicate, capacity and missing-activity errors."""
+        with pytest.raises(AlreadySignedUp):
+            repository.add_participant("Chess Club", "michael@mergington.edu")
+        repository.add_participant("Chess Club", "new@mergington.edu")
+        with pytest.raises(AlreadySignedUp):
+            repository.add_participant("Chess Club", "new@mergington.edu")
+        with pytest.raises(ActivityFull):
+            repository.add_participant("Chess Club", "late@mergington.edu")
+        with pytest.raises(ActivityNotFound):
+            repository.add_participant("Nonexistent Activity", "new@mergington.edu")
+
+    def test_remove(self, repository):
+        """Test removal and its errors."""
+        repository.remove_participant("Chess Club", "michael@mergington.edu")
+        assert repository.get("Chess Club")["participants"] == ["daniel@mergington.edu"]
+        assert repository.seats_left("Chess Club") == 2
+        with pytest.raises(NotRegistered):
+            repository.remove_participant("Chess Club", "michael@mergington.edu")
+        with pytest.raises(ActivityNotFound):
+            repository.remove_participant("Nonexistent Activity", "michael@mergington.edu")
+
+    def test_batch_keeps_successful_writes(self, repository):
+        """Test that a rejected write in a batch doesn't undo the others."""
+        with repository.batch():
+            repository.add_participant("Gym Class", "a@mergington.edu")
+            with pytest.raises(AlreadySignedUp):
+                repository.add_participant("Gym Class", "a@mergington.edu")
+            repository.add_participant("Gym Class", "b@mergington.edu")
+        assert repository.get("Gym Class")["participants"] == [
+            "a@mergington.edu", "b@mergington.edu"
+        ]
+
+    def test_remove_many(self, repository):
+        """Test that batch removal skips students who aren't signed up."""
+        removed = repository.remove_participants(
+            "Chess Club", ["daniel@mergington.edu", "nobody@mergington.edu"]
+        )
+        assert removed == ["daniel@mergington.edu"]
+        assert repository.get("Chess Club")["participants"] == ["michael@mergington.edu"]
+        assert repository.seats_left("Chess Club") == 2
+        assert repository.student_activities("daniel@mergington.edu") == []
+        with pytest.raises(ActivityNotFound):
+            repository.remove_participants("Nonexistent Activity", ["michael@mergington.edu"])
+
+    def test_clear(self, repository):
+        """Test that clearing a roster frees every seat."""
+        assert repository.clear_participants("Chess Club") == [
+            "michael@mergington.edu", "daniel@mergington.edu"
+        ]
+        assert repository.get("Chess Club")["participants"] == []
+        assert repository.seats_left("Chess Club") == 3
+        assert repository.student_activities("michael@mergington.edu") == []
+        assert repository.clear_participants("Chess Club") == []
+
+    def test_enrollment_counts(self, repository):
+        """Test that counts follow signups and unregisters."""
+        assert repository.enrollment_counts() == {"Chess Club": 2, "Gym Class": 0}
+        repository.add_participant("Gym Class", "new@mergington.edu")
+        repository.remove_participant("Chess Club", "michael@mergington.edu")
+        assert repository.enrollment_counts() == {"Chess Club": 1, "Gym Class": 1}
+
+    def test_waitlist(self, repository):
+        """Test waitlist order, positions and errors."""
+        assert repository.add_to_waitlist("Chess Club", "a@mergington.edu") == 1
+        assert repository.add_to_waitlist("Chess Club", "b@mergington.edu") == 2
+        assert repository.add_to_waitlist("Chess Club", "c@mergington.edu") == 3
+        with pytest.raises(AlreadyWaitlisted):
+            repository.add_to_waitlist("Chess Club", "a@mergington.edu")
+        with pytest.raises(AlreadySignedUp):
+            repository.add_to_waitlist("Chess Club", "michael@mergington.edu")
+
+        repository.remove_from_waitlist("Chess Club", "b@mergington.edu")
+        assert repository.waitlist_position("Chess Club", "c@mergington.edu") == 2
+        with pytest.raises(NotWaitlisted):
+            repository.remove_from_waitlist("Chess Club", "b@mergington.edu")
+        with pytest.raises(NotWaitlisted):
+            repository.waitlist_position("Chess Club", "b@mergington.edu")
+
+        assert repository.pop_waitlist("Chess Club") == "a@mergington.edu"
+        assert repository.waitlist("Chess Club") == ["c@mergington.edu"]
+        assert repository.pop_waitlist("Gym Class") is None
+        with pytest.raises(ActivityNotFound):
+            repository.waitlist("Nonexistent Activity")
+
+    def test_load_replaces_waitlists(self, repository, catalog):
+        """Test that loading a catalog resets the waitlists to its own."""
+        repository.add_to_waitlist("Chess Club", "a@mergington.edu")
+        reloaded = {name: dict(details) for name, details in catalog.items()}
+        reloaded["Gym Class"]["waitlist"] = ["b@mergington.edu"]
+        repository.load(reloaded)
+        assert repository.waitlist("Chess Club") == []
+        assert repository.waitlist("Gym Class") == ["b@mergington.edu"]
+
+    def test_registration_window(self, repository):
+        """Test collecting preferences, and that signups wait for the window to close."""
+        assert repository.registration() is None
+        with pytest.raises(RegistrationClosed):
+            repository.set_preferences("a@mergington.edu", ["Chess Club"])
+        repository.open_registration({"picks": 1, "seed": 7})
+        assert repository.registration() == {"picks": 1, "seed": 7}
+        with pytest.raises(RegistrationOpen):
+            repository.open_registration({"picks": 1, "seed": None})
+        with pytest.raises(SignupsByLottery):
+            repository.add_participant("Gym Class", "a@mergington.edu")
+
+        repository.set_preferences("a@mergington.edu", ["Chess Club"])
+        repository.set_preferences("a@mergington.edu", ["Gym Class", "Chess Club"])
+        repository.set_preferences("b@mergington.edu", ["Chess Club"])
+        assert repository.preferences("a@mergington.edu") == ["Gym Class", "Chess Club"]
+        assert repository.preferences("c@mergington.edu") is None
+
+        settings, preferences = repository.close_registration()
+        assert settings == {"picks": 1, "seed": 7}
+        assert preferences == {
+            "a@mergington.edu": ["Gym Class", "Chess Club"],
+            "b@mergington.edu": ["Chess Club"]
+        }
+        assert repository.registration() is None
+        with pytest.raises(RegistrationClosed):
+            repository.close_registration()
+        repository.add_participant("Gym Class", "a@mergington.edu")
+
+    def test_student_activities_follow_signups(self, repository):
+        """Test that the student index tracks signups and unregisters."""
+        assert repository.student_activities("michael@mergington.edu") == ["Chess Club"]
+        repository.add_participant("Gym Class", "michael@mergington.edu")
+        assert repository.student_activities("michael@mergington.edu") == [
+            "Chess Club", "Gym Class"
+        ]
+        repository.remove_participant("Chess Club", "michael@mergington.edu")
+        assert repository.student_activities("michael@mergington.edu") == ["Gym Class"]
+        assert repository.student_activities("nobody@mergington.edu") == []
+
+    def test_concurrent_signups_respect_capacity(self, repository):
+        """Test that concurrent signups through the store never overfill."""
+        store = ActivityStore(repository=repository)
+        results = []
+
+        def signup(i):
+            try:
+                store.signup("Chess Club", f"student{i}@mergington.edu")
+                results.append(True)
+            except ActivityFull:
+                results.append(False)
+
+        threads = [threading.Thread(target=signup, args=(i,)) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 1
+        assert len(repository.get("Chess Club")["participants"]) == 3
+
+
+class TestMemoryRepository:
+    """Tests specific to the in-memory backend."""
+
+    def test_signup_during_reload_stays_indexed(self, monkeypatch, catalog):
+        """Test that a signup racing a reload never leaves a roster entry unindexed."""
+        repository = MemoryRepository()
+        repository.load(catalog)
+        build_index = repository_module._State.reindex
+
+        def sign_up_while_indexing(state):
+            build_index(state)
+            repository.add_participant("Gym Class", "new@mergington.edu")
+
+        monkeypatch.setattr(repository_module._State, "reindex", sign_up_while_indexing)
+        repository.load(catalog)
+        monkeypatch.undo()
+
+        indexed = repository.student_activities("new@mergington.edu")
+        enrolled = "new@mergington.edu" in repository.get("Gym Class")["participants"]
+        assert indexed == (["Gym Class"] if enrolled else [])
+        repository.add_participant("Gym Class", "new@mergington.edu")
+        repository.remove_participant("Gym Class", "new@mergington.edu")
+        assert repository.student_activities("new@mergington.edu") == []
+
+
+class TestSQLiteRepository:
+    """Tests specific to the SQLite backend."""
+
+    def test_survives_reopen(self, tmp_path, catalog):
+        """Test that signups persist when the database is reopened."""
+        path = tmp_path / "activities.db"
+        SQLiteRepository(path).load(catalog)
+        SQLiteRepository(path).add_participant("Gym Class", "new@mergington.edu")
+        assert SQLiteRepository(path).get("Gym Class")["participants"] == ["new@mergington.edu"]
+
+    def test_uses_wal_mode(self, tmp_path):
+        """Test that the database is switched to write-ahead logging."""
+        repository = SQLiteRepository(tmp_path / "activities.db")
+        mode = repository._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+
+def signup_worker(path, worker, count):
+    """Sign up students from a separate worker process."""
+    store = ActivityStore(repository=SQLiteRepository(path))
+    for i in range(count):
+        try:
+            store.signup("Gym Class", f"worker{worker}-{i}@mergington.edu")
+        except ActivityFull:
+            pass
+
+
+def conflicting_signup_worker(path, activity_name, count):
+    """Sign students up for one of two overlapping activities from a worker process."""
+    store = ActivityStore(repository=SQLiteRepository(path))
+    for i in range(count):
+        try:
+            store.signup(activity_name, f"student{i}@mergington.edu")
+        except ScheduleConflict:
+            pass
+
+
+class TestSharedDatabase:
+    """Tests for several workers sharing one SQLite database."""
+
+    def test_workers_share_version_and_changes(self, tmp_path, catalog):
+        """Test that a change made by one worker is visible to another."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(repository=SQLiteRepository(path))
+        first.seed(catalog)
+        second = ActivityStore(repository=SQLiteRepository(path))
+        second.seed(catalog)
+
+        version = second.version
+        first.signup("Gym Class", "new@mergington.edu")
+        assert second.version == first.version == version + 1
+        assert second.epoch == first.epoch
+        current, changes = second.changes_since(version)
+        assert [(c.activity, c.op, c.email) for c in changes] == [
+            ("Gym Class", "signup", "new@mergington.edu")
+        ]
+        assert second.get("Gym Class")["participants"] == ["new@mergington.edu"]
+
+    def test_batch_removal_is_one_change(self, tmp_path, catalog):
+        """Test that a cleared roster is logged as a single change."""
+        store = ActivityStore(catalog, repository=SQLiteRepository(tmp_path / "activities.db"))
+        version = store.version
+        store.clear("Chess Club")
+        current, changes = store.changes_since(version)
+        assert current == version + 1
+        assert changes == [(current, "Chess Club", "unregister_many",
+                            ["michael@mergington.edu", "daniel@mergington.edu"])]
+
+    def test_activity_versions_are_shared(self, tmp_path, catalog):
+        """Test that every worker sees the same per-activity versions."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(catalog, repository=SQLiteRepository(path))
+        second = ActivityStore(repository=SQLiteRepository(path))
+        gym = second.activity_version("Gym Class")
+        first.signup("Chess Club", "new@mergington.edu")
+        assert second.activity_version("Chess Club") == first.version
+        assert second.activity_version("Gym Class") == gym
+
+    def test_reload_requires_resync(self, tmp_path, catalog):
+        """Test that changes before a reload cannot be replayed."""
+        store = ActivityStore(catalog, repository=SQLiteRepository(tmp_path / "activities.db"))
+        version = store.version
+        store.signup("Gym Class", "new@mergington.edu")
+        store.load(catalog)
+        assert store.changes_since(version) == (store.version, None)
+        assert store.changes_since(store.version) == (store.version, [])
+
+    def test_listeners_receive_other_workers_changes(self, tmp_path, catalog):
+        """Test that the poller delivers changes made through another store."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(catalog, repository=SQLiteRepository(path))
+        second = ActivityStore(repository=SQLiteRepository(path, poll_interval=0.01))
+        received = queue.Queue()
+        second.add_listener(received.put)
+
+        first.signup("Gym Class", "new@mergington.edu")
+        change = received.get(timeout=5)
+        second.repository.close()
+        assert (change.activity, change.op, change.email) == (
+            "Gym Class", "signup", "new@mergington.edu"
+        )
+
+    def test_listener_failure_does_not_stop_poller(self, tmp_path, catalog):
+        """Test that a listener raising doesn't end delivery to the others."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(catalog, repository=SQLiteRepository(path))
+        second = ActivityStore(repository=SQLiteRepository(path, poll_interval=0.01))
+        received = queue.Queue()
+        second.add_listener(lambda change: 1 / 0)
+        second.add_listener(received.put)
+
+        first.signup("Gym Class", "a@mergington.edu")
+        first.signup("Gym Class", "b@mergington.edu")
+        emails = [received.get(timeout=5).email for _ in range(2)]
+        second.repository.close()
+        assert emails == ["a@mergington.edu", "b@mergington.edu"]
+
+    def test_close_stops_poller(self, tmp_path, catalog):
+        """Test that closing the repository ends its change poller."""
+        path = tmp_path / "activities.db"
+        store = ActivityStore(catalog, repository=SQLiteRepository(path, poll_interval=0.01))
+        store.add_listener(lambda change: None)
+        poller = store.repository.change_log()._poller
+
+        store.repository.close()
+        assert not poller.is_alive()
+
+    def test_listeners_resync_after_other_workers_reload(self, tmp_path, catalog):
+        """Test that the poller reports a reload, which has no changes to replay."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(catalog, repository=SQLiteRepository(path))
+        second = ActivityStore(repository=SQLiteRepository(path, poll_interval=0.01))
+        received = queue.Queue()
+        second.add_listener(received.put)
+
+        first.load(catalog)
+        change = received.get(timeout=5)
+        second.repository.close()
+        assert change == (first.version, None, RESYNC, None)
+
+    def test_follows_other_workers_reload(self, tmp_path, catalog):
+        """Test that a worker rebuilds its catalog index when another reloads."""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(catalog, repository=SQLiteRepository(path))
+        second = ActivityStore(repository=SQLiteRepository(path, poll_interval=0.01))
+        second.follow_reloads()
+        chess = second.lock("Chess Club")
+
+        first.load({**catalog, "Art Club": {**catalog["Gym Class"], "participants": []}})
+        deadline = time.monotonic() + 5
+        while "Art Club" not in second.names():
+            assert time.monotonic() < deadline, "reload not picked up"
+            time.sleep(0.01)
+        assert second.lock("Chess Club") is chess
+        second.signup("Art Club", "new@mergington.edu")
+        second.repository.close()
+        assert first.get("Art Club")["participants"] == ["new@mergington.edu"]
+
+    def test_processes_never_sign_up_conflicts(self, tmp_path, catalog):
+        """Test that workers can't each give a student one of two overlapping activities."""
+        path = tmp_path / "activities.db"
+        gym = {**catalog["Gym Class"], "max_participants": 200}
+        repository = SQLiteRepository(path)
+        ActivityStore(repository=repository).seed({
+            "Gym Class": gym,
+            "Soccer Club": {**gym, "schedule": "Fridays, 2:30 PM - 3:30 PM"}
+        })
+        # A connection must not be open across the fork
+        repository.close()
+
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=conflicting_signup_worker, args=(path, name, 100))
+            for name in ("Gym Class", "Soccer Club")
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        store = ActivityStore(repository=SQLiteRepository(path))
+        gym_class = set(store.get("Gym Class")["participants"])
+        soccer_club = set(store.get("Soccer Club")["participants"])
+        assert not gym_class & soccer_club
+        assert len(gym_class | soccer_club) == 100
+
+    def test_processes_never_overfill(self, tmp_path, catalog):
+        """Test that concurrent worker processes respect capacity."""
+        path = tmp_path / "activities.db"
+        repository = SQLiteRepository(path)
+        ActivityStore(repository=repository).seed({"Gym Class": catalog["Gym Class"]})
+        # A connection must not be open across the fork
+        repository.close()
+
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=signup_worker, args=(path, w, 25)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        store = ActivityStore(repository=SQLiteRepository(path))
+        assert len(store.get("Gym Class")["participants"]) == 30
+        assert store.seats_left("Gym Class") == 0
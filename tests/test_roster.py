@@ -0,0 +1,44 @@
+"""Tests for the indexed participant roster."""
+
+from roster import Roster
+
+
+class TestRoster:
+    """Tests for Roster membership, ordering and removal."""
+
+    def test_preserves_signup_order(self):
+        """Test that a roster iterates in insertion order."""
+        roster = Roster(["a@mergington.edu", "b@mergington.edu"])
+        roster.add("c@mergington.edu")
+        assert roster.to_list() == ["a@mergington.edu", "b@mergington.edu", "c@mergington.edu"]
+
+    def test_add_rejects_duplicates(self):
+        """Test that adding an existing email is a no-op."""
+        roster = Roster(["a@mergington.edu"])
+        assert roster.add("a@mergington.edu") is False
+        assert len(roster) == 1
+
+    def test_remove_keeps_remaining_order(self):
+        """Test that removal leaves the other participants in order."""
+        roster = Roster(["a@mergington.edu", "b@mergington.edu", "c@mergington.edu"])
+        roster.remove("b@mergington.edu")
+        assert "b@mergington.edu" not in roster
+        assert roster.to_list() == ["a@mergington.edu", "c@mergington.edu"]
+
+    def test_discard_missing_email(self):
+        """Test that discarding an absent email reports no removal."""
+        roster = Roster()
+        assert roster.discard("a@mergington.edu") is False
+
+    def test_readd_after_remove_goes_to_end(self):
+        """Test that a re-registered student is appended at the end."""
+        roster = Roster(["a@mergington.edu", "b@mergington.edu"])
+        roster.remove("a@mergington.edu")
+        roster.add("a@mergington.edu")
+        assert roster.to_list() == ["b@mergington.edu", "a@mergington.edu"]
+
+    def test_clear_returns_removed(self):
+        """Test that clearing empties the roster and returns it in order."""
+        roster = Roster(["a@mergington.edu", "b@mergington.edu"])
+        assert roster.clear() == ["a@mergington.edu", "b@mergington.edu"]
+        assert len(roster) == 0
@@ -0,0 +1,76 @@
+"""Tests for schedule parsing and conflict detection."""
+
+from schedule import (
+    Interval, overlapping_weekdays, parse_schedule, parse_weekday, schedules_overlap
+)
+
+
+class TestParseSchedule:
+    """Tests for turning schedule text into weekly intervals."""
+
+    def test_single_day(self):
+        """Test a schedule on one weekday."""
+        assert parse_schedule("Fridays, 3:00 PM - 5:00 PM") == (Interval(4, 900, 1020),)
+
+    def test_days_joined_with_and(self):
+        """Test a schedule listing two days with 'and'."""
+        assert parse_schedule("Tuesdays and Thursdays, 3:30 PM - 4:30 PM") == (
+            Interval(1, 930, 990), Interval(3, 930, 990)
+        )
+
+    def test_comma_separated_days(self):
+        """Test a schedule listing several comma-separated days."""
+        intervals = parse_schedule("Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM")
+        assert [interval.weekday for interval in intervals] == [0, 2, 4]
+
+    def test_morning_and_noon_times(self):
+        """Test that AM times and 12 PM are converted correctly."""
+        assert parse_schedule("Saturday, 11:30 AM - 12:15 PM") == (Interval(5, 690, 735),)
+
+    def test_unparseable_schedule(self):
+        """Test that free text without a time range yields no intervals."""
+        assert parse_schedule("By arrangement") == ()
+        assert parse_schedule("Someday, 3:00 PM - 4:00 PM") == ()
+
+    def test_parse_weekday(self):
+        """Test that weekday names are matched in any case, singular or plural."""
+        assert parse_weekday("Tuesday") == 1
+        assert parse_weekday(" sundays ") == 6
+        assert parse_weekday("Someday") is None
+
+
+class TestOverlap:
+    """Tests for comparing parsed schedules."""
+
+    def test_touching_intervals_do_not_overlap(self):
+        """Test that back-to-back intervals don't overlap but crossing ones do."""
+        first = (Interval(0, 600, 660),)
+        assert not schedules_overlap(first, (Interval(0, 660, 720),))
+        assert schedules_overlap(first, (Interval(0, 650, 670),))
+        assert not schedules_overlap(first, (Interval(1, 600, 660),))
+        assert not schedules_overlap(first, ())
+
+    def test_builtin_catalog_conflicts(self, initial_activities):
+        """Test conflicts between activities of the built-in catalog."""
+        schedules = {
+            name: parse_schedule(details["schedule"])
+            for name, details in initial_activities.items()
+        }
+
+        def conflicts(name):
+            return {
+                other for other in schedules
+                if other != name and schedules_overlap(schedules[name], schedules[other])
+            }
+
+        assert conflicts("Math Club") == {"Programming Class"}
+        assert conflicts("Chess Club") == {"Art Club"}
+        assert "Gym Class" not in conflicts("Art Club")
+        assert conflicts("Drama Club") == {"Soccer Club", "Programming Class"}
+
+    def test_overlapping_weekdays(self):
+        """Test that only the weekdays with overlapping intervals are named."""
+        gym = parse_schedule("Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM")
+        other = parse_schedule("Mondays and Fridays, 2:30 PM - 3:30 PM")
+        assert overlapping_weekdays(gym, other) == ["Monday", "Friday"]
+        assert overlapping_weekdays(gym, parse_schedule("Fridays, 3:00 PM - 4:00 PM")) == []
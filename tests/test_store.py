@@ -0,0 +1,429 @@
+"""Tests for the activity store and seat reservation engine."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app import app, store as app_store
+from changes import RESYNC
+from store import (
+    ActivityFull, ActivityNotFound, ActivityStore, AlreadySignedUp, InvalidPreferences,
+    InvalidQuery, NotRegistered, NotWaitlisted, ScheduleConflict, SignupsByLottery
+)
+
+
+class TestActivityStore:
+    """Tests for signup and unregister in the store."""
+
+    def test_signup_rejects_when_full(self, make_store):
+        """Test that a full activity rejects further signups."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        with pytest.raises(ActivityFull):
+            store.signup("Chess Club", "b@mergington.edu")
+
+    def test_duplicate_checked_before_capacity(self, make_store):
+        """Test that a duplicate signup on a full activity reports the duplicate."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        with pytest.raises(AlreadySignedUp):
+            store.signup("Chess Club", "a@mergington.edu")
+
+    def test_unregister_frees_a_seat(self, make_store):
+        """Test that unregistering makes room for another student."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        store.unregister("Chess Club", "a@mergington.edu")
+        store.signup("Chess Club", "b@mergington.edu")
+        assert store.get("Chess Club")["participants"] == ["b@mergington.edu"]
+
+    def test_unregister_not_registered(self, make_store):
+        """Test that unregistering an absent student raises NotRegistered."""
+        store = make_store()
+        with pytest.raises(NotRegistered):
+            store.unregister("Chess Club", "a@mergington.edu")
+
+    def test_unregister_many_bumps_version_once(self, make_store):
+        """Test that a batch unregister is recorded as one change."""
+        store = make_store(5)
+        for email in ["a@mergington.edu", "b@mergington.edu", "c@mergington.edu"]:
+            store.signup("Chess Club", email)
+        version = store.version
+        removed = store.unregister_many(
+            "Chess Club", ["a@mergington.edu", "c@mergington.edu", "z@mergington.edu"]
+        )
+        assert removed == ["a@mergington.edu", "c@mergington.edu"]
+        assert store.version == version + 1
+        assert store.changes_since(version)[1][0].op == "unregister_many"
+        assert store.get("Chess Club")["participants"] == ["b@mergington.edu"]
+
+    def test_clear_without_participants_keeps_version(self, make_store):
+        """Test that clearing an empty roster changes nothing."""
+        store = make_store()
+        version = store.version
+        assert store.clear("Chess Club") == []
+        assert store.version == version
+
+    def test_locks_are_per_activity(self, make_store):
+        """Test that a held activity lock does not block other activities."""
+        store = make_store()
+        with store.lock("Chess Club"):
+            worker = threading.Thread(
+                target=store.signup, args=("Gym Class", "a@mergington.edu")
+            )
+            worker.start()
+            worker.join(timeout=5)
+            assert not worker.is_alive()
+        assert "a@mergington.edu" in store.get("Gym Class")["participants"]
+
+    def test_load_swaps_catalog_index(self, make_store):
+        """Test that a reload replaces locks, schedules and summaries together."""
+        store = make_store()
+        index = store.catalog_index
+        store.load({"Art Club": {
+            "description": "Art",
+            "schedule": "Fridays, 3:00 PM - 5:00 PM",
+            "max_participants": 10,
+            "participants": []
+        }})
+        assert store.catalog_index is not index
+        assert store.names() == ["Art Club"]
+        assert list(store.schedules) == list(store.summaries) == ["Art Club"]
+        with pytest.raises(ActivityNotFound):
+            store.lock("Chess Club")
+        # Readers holding the old index still see one whole catalog
+        assert list(index.locks) == list(index.summaries) == ["Chess Club", "Gym Class"]
+
+    def test_reload_keeps_locks_of_kept_activities(self, make_store, make_catalog):
+        """Test that a signup holding a lock from before a reload still excludes others."""
+        store = make_store(1)
+        chess = store.lock("Chess Club")
+        with chess:
+            store.load(make_catalog(1))
+            assert store.lock("Chess Club") is chess
+            worker = threading.Thread(
+                target=store.signup, args=("Chess Club", "a@mergington.edu")
+            )
+            worker.start()
+            worker.join(timeout=0.1)
+            assert worker.is_alive()
+        worker.join(timeout=5)
+        assert store.get("Chess Club")["participants"] == ["a@mergington.edu"]
+
+    def test_invalid_catalog_changes_nothing(self, make_store):
+        """Test that a catalog failing to index leaves the store as it was."""
+        store = make_store()
+        with pytest.raises(KeyError):
+            store.load({"Art Club": {"description": "Art", "participants": []}})
+        assert store.names() == ["Chess Club", "Gym Class"]
+        assert list(store.snapshot()) == ["Chess Club", "Gym Class"]
+
+    def test_signup_many_reports_each_item(self, make_store):
+        """Test that a bulk signup returns one result per pair, in input order."""
+        store = make_store(1)
+        results = store.signup_many([
+            ("Chess Club", "a@mergington.edu"),
+            ("Unknown Club", "b@mergington.edu"),
+            ("Chess Club", "c@mergington.edu"),
+            ("Gym Class", "a@mergington.edu")
+        ])
+        assert results[0] is None
+        assert results[1].status_code == 404
+        assert isinstance(results[2], ActivityFull)
+        assert results[3] is None
+        assert store.get("Chess Club")["participants"] == ["a@mergington.edu"]
+
+
+class TestWaitlist:
+    """Tests for waitlists and promotion to freed seats."""
+
+    def test_join_signs_up_while_seats_are_free(self, make_store):
+        """Test that joining the waitlist of an open activity is a signup."""
+        store = make_store(1)
+        assert store.join_waitlist("Chess Club", "a@mergington.edu") is None
+        assert store.join_waitlist("Chess Club", "b@mergington.edu") == 1
+        assert store.join_waitlist("Chess Club", "c@mergington.edu") == 2
+        assert store.get("Chess Club")["participants"] == ["a@mergington.edu"]
+        assert store.waitlist("Chess Club") == ["b@mergington.edu", "c@mergington.edu"]
+
+    def test_unregister_promotes_first_in_line(self, make_store):
+        """Test that a freed seat goes to the front of the waitlist as one signup."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        store.join_waitlist("Chess Club", "b@mergington.edu")
+        store.join_waitlist("Chess Club", "c@mergington.edu")
+        version = store.version
+        assert store.unregister("Chess Club", "a@mergington.edu") == "b@mergington.edu"
+        assert store.get("Chess Club")["participants"] == ["b@mergington.edu"]
+        assert store.waitlist_position("Chess Club", "c@mergington.edu") == 1
+        assert [(c.op, c.email) for c in store.changes_since(version)[1]] == [
+            ("unregister", "a@mergington.edu"), ("signup", "b@mergington.edu")
+        ]
+
+    def test_promotion_skips_conflicting_students(self):
+        """Test that a student who can no longer take the seat loses their place."""
+        store = ActivityStore({
+            "Chess Club": {
+                "description": "Chess",
+                "schedule": "Fridays, 3:30 PM - 5:00 PM",
+                "max_participants": 1,
+                "participants": ["a@mergington.edu"]
+            },
+            "Drama Club": {
+                "description": "Drama",
+                "schedule": "Fridays, 4:00 PM - 5:30 PM",
+                "max_participants": 5,
+                "participants": []
+            }
+        })
+        store.join_waitlist("Chess Club", "b@mergington.edu")
+        store.join_waitlist("Chess Club", "c@mergington.edu")
+        store.signup("Drama Club", "b@mergington.edu")
+        assert store.unregister("Chess Club", "a@mergington.edu") == "c@mergington.edu"
+        assert store.waitlist("Chess Club") == []
+
+    def test_clear_promotes_to_every_freed_seat(self, make_store):
+        """Test that clearing a roster fills it from the waitlist."""
+        store = make_store(2)
+        for i in range(5):
+            store.join_waitlist("Chess Club", f"{i}@mergington.edu")
+        store.clear("Chess Club")
+        assert store.get("Chess Club")["participants"] == [
+            "2@mergington.edu", "3@mergington.edu"
+        ]
+        assert store.waitlist("Chess Club") == ["4@mergington.edu"]
+
+    def test_leave_waitlist(self, make_store):
+        """Test that a student who leaves is no longer promoted."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        store.join_waitlist("Chess Club", "b@mergington.edu")
+        store.leave_waitlist("Chess Club", "b@mergington.edu")
+        with pytest.raises(NotWaitlisted):
+            store.leave_waitlist("Chess Club", "b@mergington.edu")
+        assert store.unregister("Chess Club", "a@mergington.edu") is None
+
+
+class TestRegistrationWindow:
+    """Tests for collecting preferences and allocating seats by lottery."""
+
+    def test_close_allocates_by_preference(self, make_store):
+        """Test that the draw fills seats from rankings and reports the result."""
+        store = make_store(2)
+        store.open_registration(seed=3)
+        for i in range(5):
+            store.submit_preferences(f"{i}@mergington.edu", ["Chess Club", "Gym Class"])
+        with pytest.raises(SignupsByLottery):
+            store.signup("Chess Club", "late@mergington.edu")
+
+        report = store.close_registration()
+        assert report == {"seed": 3, "students": 5, "placed": 4, "unplaced": 1,
+                          "signups": 4, "failed": 0, "promoted": 0}
+        assert len(store.get("Chess Club")["participants"]) == 2
+        assert len(store.get("Gym Class")["participants"]) == 2
+        assert store.registration() is None
+
+    def test_same_seed_same_result(self, make_store):
+        """Test that a seeded draw can be reproduced."""
+        rosters = []
+        for _ in range(2):
+            store = make_store(1)
+            store.open_registration(seed=11)
+            for i in range(10):
+                store.submit_preferences(f"{i}@mergington.edu", ["Chess Club"])
+            store.close_registration()
+            rosters.append(store.get("Chess Club")["participants"])
+        assert rosters[0] == rosters[1]
+
+    def test_invalid_preferences(self, make_store):
+        """Test that rankings must name distinct, existing activities."""
+        store = make_store()
+        store.open_registration()
+        with pytest.raises(InvalidPreferences):
+            store.submit_preferences("a@mergington.edu", [])
+        with pytest.raises(InvalidPreferences):
+            store.submit_preferences("a@mergington.edu", ["Chess Club", "Chess Club"])
+        with pytest.raises(ActivityNotFound):
+            store.submit_preferences("a@mergington.edu", ["Unknown Club"])
+        with pytest.raises(InvalidQuery):
+            store.open_registration(picks=0)
+
+    def test_freed_seats_wait_for_the_lottery(self, make_store):
+        """Test that the waitlist keeps its place during a window and gets leftover seats."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        store.join_waitlist("Chess Club", "b@mergington.edu")
+        store.open_registration()
+        assert store.unregister("Chess Club", "a@mergington.edu") is None
+        assert store.waitlist("Chess Club") == ["b@mergington.edu"]
+        assert store.close_registration()["promoted"] == 1
+        assert store.get("Chess Club")["participants"] == ["b@mergington.edu"]
+
+
+class TestScheduleConflicts:
+    """Tests for conflict checks under concurrency."""
+
+    def test_concurrent_conflicting_signups(self):
+        """Test that a student can't join two overlapping activities at once."""
+        store = ActivityStore({
+            name: {
+                "description": name,
+                "schedule": "Fridays, 3:00 PM - 5:00 PM",
+                "max_participants": 10,
+                "participants": []
+            }
+            for name in ("Art Club", "Chess Club")
+        })
+        barrier = threading.Barrier(2)
+        results = []
+
+        def signup(activity_name):
+            barrier.wait()
+            try:
+                store.signup(activity_name, "a@mergington.edu")
+                results.append(activity_name)
+            except ScheduleConflict:
+                pass
+
+        threads = [threading.Thread(target=signup, args=(name,)) for name in ("Art Club", "Chess Club")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 1
+        assert store.student_activities("a@mergington.edu") == results
+
+
+class TestListActivities:
+    """Tests for paginated, filtered and projected listings."""
+
+    def test_pages_follow_catalog_order(self, make_store):
+        """Test that cursors walk every activity exactly once."""
+        store = make_store()
+        page, cursor = store.list_activities(limit=1)
+        assert list(page) == ["Chess Club"]
+        page, cursor = store.list_activities(limit=1, cursor=cursor)
+        assert list(page) == ["Gym Class"]
+        assert cursor is None
+
+    def test_projection_skips_rosters(self, make_store):
+        """Test that a projected listing is built without reading any roster."""
+        store = make_store()
+        store.signup("Chess Club", "a@mergington.edu")
+        store.repository.get = None
+        page, _ = store.list_activities(fields=["seats_left", "participant_count"])
+        assert page == {
+            "Chess Club": {"seats_left": 1, "participant_count": 1},
+            "Gym Class": {"seats_left": 2, "participant_count": 0}
+        }
+
+    def test_filters(self, make_store):
+        """Test the open seats, weekday and name prefix filters."""
+        store = make_store(1)
+        store.signup("Chess Club", "a@mergington.edu")
+        assert list(store.list_activities(open_seats=True)[0]) == ["Gym Class"]
+        assert list(store.list_activities(open_seats=False)[0]) == ["Chess Club"]
+        assert list(store.list_activities(weekday="friday")[0]) == ["Chess Club", "Gym Class"]
+        assert list(store.list_activities(weekday="monday")[0]) == ["Gym Class"]
+        assert list(store.list_activities(prefix="gym")[0]) == ["Gym Class"]
+
+    def test_filtered_pages(self, make_store):
+        """Test that the limit counts only matching activities."""
+        store = make_store()
+        page, cursor = store.list_activities(limit=1, weekday="Monday")
+        assert list(page) == ["Gym Class"]
+        assert cursor is None
+
+    def test_invalid_queries(self, make_store):
+        """Test that unknown fields, weekdays and cursors are rejected."""
+        store = make_store()
+        with pytest.raises(InvalidQuery):
+            store.list_activities(fields=["email"])
+        with pytest.raises(InvalidQuery):
+            store.list_activities(weekday="Someday")
+        with pytest.raises(InvalidQuery):
+            store.list_activities(cursor="not a cursor")
+
+
+class TestChangeLog:
+    """Tests for the bounded change log."""
+
+    def test_changes_since_returns_deltas(self, make_store):
+        """Test that changes after a version are returned in order."""
+        store = make_store()
+        version = store.version
+        store.signup("Chess Club", "a@mergington.edu")
+        store.unregister("Chess Club", "a@mergington.edu")
+        current, changes = store.changes_since(version)
+        assert current == version + 2
+        assert [(c.version, c.op, c.email) for c in changes] == [
+            (version + 1, "signup", "a@mergington.edu"),
+            (version + 2, "unregister", "a@mergington.edu")
+        ]
+
+    def test_activity_version_moves_with_own_changes(self, make_store):
+        """Test that an activity's version ignores other activities' changes."""
+        store = make_store()
+        chess, gym = store.activity_version("Chess Club"), store.activity_version("Gym Class")
+        store.signup("Chess Club", "a@mergington.edu")
+        assert store.activity_version("Chess Club") == store.version > chess
+        assert store.activity_version("Gym Class") == gym
+        with pytest.raises(ActivityNotFound):
+            store.activity_version("Unknown Club")
+
+    def test_changes_since_current_is_empty(self, make_store):
+        """Test that an up-to-date caller gets no changes."""
+        store = make_store()
+        store.signup("Chess Club", "a@mergington.edu")
+        assert store.changes_since(store.version) == (store.version, [])
+
+    def test_evicted_version_needs_snapshot(self, make_store):
+        """Test that versions older than the log fall back to a snapshot."""
+        store = make_store(10, change_log_size=2)
+        version = store.version
+        for i in range(3):
+            store.signup("Chess Club", f"student{i}@mergington.edu")
+        assert store.changes_since(version) == (store.version, None)
+        assert len(store.changes_since(version + 1)[1]) == 2
+
+    def test_reload_needs_snapshot(self, make_store):
+        """Test that a reload cannot be bridged with deltas."""
+        store = make_store()
+        version = store.version
+        store.load(make_store().snapshot())
+        assert store.changes_since(version) == (store.version, None)
+
+    def test_reload_notifies_listeners(self, make_store):
+        """Test that listeners are told to resync after a reload."""
+        store = make_store()
+        received = []
+        store.add_listener(received.append)
+        store.load(make_store().snapshot())
+        assert received == [(store.version, None, RESYNC, None)]
+
+
+class TestSeatReservationStress:
+    """Concurrent signups through the ASGI app never overfill an activity."""
+
+    async def _signup_storm(self, activity_name, count):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post(
+                    f"/activities/{activity_name}/signup",
+                    params={"email": f"student{i}@mergington.edu"}
+                )
+                for i in range(count)
+            ))
+        return [response.status_code for response in responses]
+
+    def test_concurrent_signups_respect_capacity(self, reset_activities):
+        """Test that thousands of concurrent signups fill exactly max_participants seats."""
+        statuses = asyncio.run(self._signup_storm("Art Club", 2000))
+
+        max_participants = app_store.get("Art Club")["max_participants"]
+        assert statuses.count(200) == max_participants
+        assert statuses.count(400) == 2000 - max_participants
+        assert len(app_store.get("Art Club")["participants"]) == max_participants
@@ -0,0 +1,53 @@
+"""Tests for the waitlist queue."""
+
+from waitlist import Waitlist
+
+
+class TestWaitlist:
+    """Tests for queue order and positions."""
+
+    def test_first_come_first_served(self):
+        """Test that students leave the queue in the order they joined."""
+        waitlist = Waitlist(["a@mergington.edu", "b@mergington.edu"])
+        assert waitlist.add("c@mergington.edu") == 3
+        assert waitlist.pop() == "a@mergington.edu"
+        assert waitlist.to_list() == ["b@mergington.edu", "c@mergington.edu"]
+
+    def test_rejects_duplicates(self):
+        """Test that a student can only wait once."""
+        waitlist = Waitlist(["a@mergington.edu"])
+        assert waitlist.add("a@mergington.edu") is None
+        assert len(waitlist) == 1
+
+    def test_positions_after_leaving(self):
+        """Test that students behind one who leaves move up."""
+        waitlist = Waitlist(f"{i}@mergington.edu" for i in range(5))
+        assert waitlist.discard("1@mergington.edu")
+        assert not waitlist.discard("1@mergington.edu")
+        assert waitlist.position("0@mergington.edu") == 1
+        assert waitlist.position("2@mergington.edu") == 2
+        assert waitlist.position("4@mergington.edu") == 4
+        assert waitlist.position("1@mergington.edu") is None
+
+    def test_pop_skips_departed(self):
+        """Test that the front of the queue skips students who left."""
+        waitlist = Waitlist(["a@mergington.edu", "b@mergington.edu"])
+        waitlist.discard("a@mergington.edu")
+        assert waitlist.pop() == "b@mergington.edu"
+        assert waitlist.pop() is None
+
+    def test_positions_survive_rebuilds(self):
+        """Test that positions stay exact as the queue turns over many times."""
+        waitlist = Waitlist()
+        expected = []
+        for i in range(1000):
+            email = f"{i}@mergington.edu"
+            assert waitlist.add(email) == len(expected) + 1
+            expected.append(email)
+            if i % 3 == 0:
+                assert waitlist.pop() == expected.pop(0)
+            if i % 7 == 0 and expected:
+                waitlist.discard(expected.pop(len(expected) // 2))
+        assert waitlist.to_list() == expected
+        for position, email in enumerate(expected, start=1):
+            assert waitlist.position(email) == position